@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Benchmark fetching problems and building the deck against a local fake
+LeetCode GraphQL server.
+
+Every stage runs in a fresh process, so its peak RSS isn't affected by the
+stages that ran before it:
+
+- fetch:    stream all the problems from the server
+- generate: build the deck with generate.generate, reported in two rows:
+    - notes:   fetch the problems, build the notes and insert them into
+               the collection (up to closing the package)
+    - package: finish the collection and zip it into the .apkg file. It
+               runs in the same process, so its peak RSS includes the
+               notes
+
+Run from the repository root:
+
+    python -m benchmarks.run --problems 3000 30000 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+from unittest import mock
+
+from benchmarks.server import FakeLeetcodeServer
+
+STAGES = ("fetch", "generate")
+# Number of problems in the full Grind 75 list
+GRIND75_SIZE = 169
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parse command line arguments for the script
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--problems",
+        type=int,
+        nargs="+",
+        help="Number of problems served, one benchmark per number",
+        default=[3000],
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        help="Server latency per request in seconds",
+        default=0.05,
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        help="Share of requests failing with HTTP 502",
+        default=0.0,
+    )
+    parser.add_argument(
+        "--page-size", type=int, help="Problems per request", default=500
+    )
+    parser.add_argument(
+        "--concurrency", type=int, help="Requests in flight at once", default=4
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="Client side rate limit, requests per second",
+        default=1000,
+    )
+    parser.add_argument(
+        "--compression-level",
+        type=int,
+        help="Zip compression level of the package",
+        default=1,
+    )
+    parser.add_argument(
+        "--render-workers",
+        type=int,
+        help="Processes rendering the note fields, 0 to render them in the generate process",
+        default=0,
+    )
+    parser.add_argument(
+        "--no-description",
+        action="store_true",
+        help="Build a deck without problem descriptions",
+    )
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        choices=STAGES,
+        help="Stages to run",
+        default=list(STAGES),
+    )
+    parser.add_argument(
+        "--output", type=str, help="Also write the results to this JSON file"
+    )
+
+    return parser.parse_args()
+
+
+def peak_rss() -> int:
+    """
+    Peak resident set size of the current process in bytes
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def _api_client(url: str) -> Any:
+    """
+    Unauthenticated API client talking to the fake server
+    """
+    # pylint: disable=import-outside-toplevel
+    import leetcode.api.default_api  # type: ignore
+    import leetcode.api_client  # type: ignore
+    import leetcode.configuration  # type: ignore
+
+    configuration = leetcode.configuration.Configuration()
+    configuration.host = url
+    configuration.debug = False
+    return leetcode.api.default_api.DefaultApi(
+        leetcode.api_client.ApiClient(configuration)
+    )
+
+
+def _grind75_slugs(problems: int) -> List[str]:
+    step = max(problems // GRIND75_SIZE, 1)
+    slugs = [f"problem-{number + 1}" for number in range(0, problems, step)]
+    return slugs[:GRIND75_SIZE]
+
+
+async def _fetch(options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # pylint: disable=import-outside-toplevel
+    import leetcode_anki.helpers.leetcode
+    import leetcode_anki.helpers.query
+
+    selection = leetcode_anki.helpers.query.ALL_FIELDS
+    if options["no_description"]:
+        selection = tuple(field for field in selection if field != "content")
+
+    leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(
+        0,
+        2**64,
+        options["page_size"],
+        concurrency=options["concurrency"],
+        rate=options["rate"],
+        selection=selection,
+    )
+
+    started = time.perf_counter()
+    problems = 0
+    async for task_handles in leetcode_data.stream_problems_handles():
+        problems += len(task_handles)
+
+    return [
+        {
+            "stage": "fetch",
+            "wall": time.perf_counter() - started,
+            "items": problems,
+            "peak_rss": peak_rss(),
+        }
+    ]
+
+
+async def _generate(options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # pylint: disable=import-outside-toplevel
+    import generate
+    import leetcode_anki.helpers.apkg
+
+    writer_class = leetcode_anki.helpers.apkg.ApkgWriter
+    close = writer_class.close
+    marks: Dict[str, Any] = {}
+
+    def timed_close(writer: leetcode_anki.helpers.apkg.ApkgWriter) -> None:
+        marks["package_started"] = time.perf_counter()
+        marks["notes_peak_rss"] = peak_rss()
+        marks["notes"] = writer.notes_written
+        close(writer)
+
+    with tempfile.TemporaryDirectory() as directory, mock.patch.object(
+        writer_class, "close", timed_close
+    ):
+        started = time.perf_counter()
+        await generate.generate(
+            0,
+            2**64,
+            options["page_size"],
+            "",
+            os.path.join(directory, "benchmark.apkg"),
+            concurrency=options["concurrency"],
+            rate=options["rate"],
+            compression_level=options["compression_level"],
+            render_workers=options["render_workers"],
+            output_description=not options["no_description"],
+        )
+        finished = time.perf_counter()
+
+    return [
+        {
+            "stage": "notes",
+            "wall": marks["package_started"] - started,
+            "items": marks["notes"],
+            "peak_rss": marks["notes_peak_rss"],
+        },
+        {
+            "stage": "package",
+            "wall": finished - marks["package_started"],
+            "items": marks["notes"],
+            "peak_rss": peak_rss(),
+        },
+    ]
+
+
+def _run_stage(
+    stage: str,
+    url: str,
+    problems: int,
+    options: Dict[str, Any],
+    connection: multiprocessing.connection.Connection,
+) -> None:
+    """
+    Entry point of the stage process: runs the stage and sends its results
+    back through the connection
+    """
+    os.environ["TQDM_DISABLE"] = "1"
+
+    # pylint: disable=import-outside-toplevel
+    import generate
+    import leetcode_anki.helpers.leetcode
+
+    with mock.patch.object(
+        leetcode_anki.helpers.leetcode,
+        "_get_leetcode_api_client",
+        lambda *args: _api_client(url),
+    ), mock.patch.object(
+        generate,
+        "get_grind75_problem_slugs",
+        lambda *args: _grind75_slugs(problems),
+    ):
+        run = _fetch if stage == "fetch" else _generate
+        connection.send(asyncio.run(run(options)))
+    connection.close()
+
+
+def run_benchmark(
+    problems: int,
+    latency: float,
+    error_rate: float,
+    stages: List[str],
+    options: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    """
+    Run the stages against a fake server with `problems` problems
+    """
+    context = multiprocessing.get_context("spawn")
+    results: List[Dict[str, Any]] = []
+
+    with FakeLeetcodeServer(problems, latency, error_rate) as server:
+        for stage in stages:
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_run_stage,
+                args=(stage, server.url, problems, options, sender),
+            )
+            requests = server.requests
+            process.start()
+            sender.close()
+            try:
+                stage_results = receiver.recv()
+            except EOFError as exc:
+                raise RuntimeError(f"Stage {stage} failed") from exc
+            finally:
+                process.join()
+
+            for result in stage_results:
+                # All requests are made before the package is written
+                result["requests"] = (
+                    0 if result["stage"] == "package" else server.requests - requests
+                )
+                result["problems"] = problems
+                results.append(result)
+
+    return results
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """
+    Results as a table
+    """
+    header = (
+        f"{'problems':>9} {'stage':<8} {'wall s':>8} {'requests':>8} "
+        f"{'req/s':>8} {'notes/s':>10} {'peak RSS MiB':>12}"
+    )
+    lines = [header, "-" * len(header)]
+    for result in results:
+        wall = result["wall"]
+        lines.append(
+            f"{result['problems']:>9} {result['stage']:<8} {wall:>8.2f} "
+            f"{result['requests']:>8} {result['requests'] / wall:>8.1f} "
+            f"{result['items'] / wall:>10.0f} "
+            f"{result['peak_rss'] / 2**20:>12.1f}"
+        )
+
+    return "\n".join(lines)
+
+
+def main() -> None:
+    """
+    The main script logic
+    """
+    args = parse_args()
+    options = {
+        "page_size": args.page_size,
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "compression_level": args.compression_level,
+        "render_workers": args.render_workers,
+        "no_description": args.no_description,
+    }
+
+    results: List[Dict[str, Any]] = []
+    for problems in args.problems:
+        results.extend(
+            run_benchmark(problems, args.latency, args.error_rate, args.stages, options)
+        )
+
+    print(format_results(results))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
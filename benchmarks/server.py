@@ -0,0 +1,248 @@
+# pylint: disable=missing-module-docstring
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Collection, Dict, List, Mapping, Optional, Sequence, Type
+
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+TOPICS = (
+    "array",
+    "string",
+    "hash-table",
+    "dynamic-programming",
+    "math",
+    "sorting",
+    "greedy",
+    "depth-first-search",
+    "binary-search",
+    "tree",
+    "graph",
+    "two-pointers",
+)
+COMPANIES = (
+    "google",
+    "amazon",
+    "facebook",
+    "microsoft",
+    "apple",
+    "bloomberg",
+    "uber",
+    "adobe",
+)
+
+# Roughly the size of an average problem description
+_PARAGRAPH = "<p>" + "Given an array of integers, return the answer. " * 8 + "</p>"
+
+
+def synthetic_question(number: int) -> Dict[str, Any]:
+    """
+    Problem number `number` (0-based) as returned by the GraphQL API.
+    The same number always produces the same problem.
+    """
+    rng = random.Random(number)
+    slug = f"problem-{number + 1}"
+    topics = rng.sample(TOPICS, rng.randint(1, 3))
+    companies = rng.sample(COMPANIES, rng.randint(0, 4))
+    submissions = rng.randint(1000, 5_000_000)
+
+    return {
+        "questionFrontendId": str(number + 1),
+        "title": f"Problem {number + 1}",
+        "titleSlug": slug,
+        "categoryTitle": "Algorithms",
+        "freqBar": round(rng.random() * 100, 2) if rng.random() < 0.5 else None,
+        "content": _PARAGRAPH * rng.randint(2, 6),
+        "isPaidOnly": rng.random() < 0.15,
+        "difficulty": rng.choice(DIFFICULTIES),
+        "likes": rng.randint(0, 20000),
+        "dislikes": rng.randint(0, 2000),
+        "topicTags": [
+            {"name": topic.replace("-", " ").title(), "slug": topic} for topic in topics
+        ],
+        "stats": json.dumps(
+            {
+                "totalSubmissionRaw": submissions,
+                "totalAcceptedRaw": rng.randint(0, submissions),
+            }
+        ),
+        "hints": [f"Hint {i + 1}" for i in range(rng.randint(0, 3))],
+        "companyTagStats": json.dumps(
+            {
+                "1": [
+                    {
+                        "name": company.title(),
+                        "slug": company,
+                        "timesEncountered": rng.randint(1, 50),
+                    }
+                    for company in companies
+                ],
+                "2": [],
+                "3": [],
+            }
+        ),
+    }
+
+
+class FakeLeetcodeServer:
+    """
+    Local HTTP server answering `problemsetQuestionList` and `questionData`
+    GraphQL queries with synthetic problems, so fetching can be measured without the network.
+
+    Every request is delayed by `latency` seconds and fails with HTTP 502
+    with `error_rate` probability, like the real API under load.
+
+    `lists` are the problem lists the server knows about, the (0-based)
+    problem numbers of every list id. The empty list id is all problems.
+
+    `removed` problems are still listed, but `question` queries return null
+    for them, like for problems removed after they were listed.
+
+    Usable as a context manager: the server runs in a background thread
+    while the block executes.
+    """
+
+    def __init__(
+        self,
+        problems: int,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        lists: Optional[Mapping[str, Sequence[int]]] = None,
+        removed: Collection[int] = (),
+    ) -> None:
+        if not 0 <= error_rate < 1:
+            raise ValueError(f"Error rate must be in [0, 1): {error_rate}")
+
+        self.problems = problems
+        self.latency = latency
+        self.error_rate = error_rate
+        self.lists = lists or {}
+        self.removed = removed
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_port}"
+
+    @property
+    def requests(self) -> int:
+        with self._lock:
+            return self._requests
+
+    @property
+    def errors(self) -> int:
+        with self._lock:
+            return self._errors
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeLeetcodeServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    def _fail(self) -> bool:
+        with self._lock:
+            self._requests += 1
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self._errors += 1
+            return failed
+
+    def respond(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        GraphQL response for the request
+        """
+        variables = request.get("variables") or {}
+        # Like a GraphQL server, only return the fields named in the query
+        query = request.get("query")
+        selected = set(re.findall(r"\w+", query)) if query else None
+
+        def project(question: Dict[str, Any]) -> Dict[str, Any]:
+            if selected is None:
+                return question
+            return {key: value for key, value in question.items() if key in selected}
+
+        # Aliased `question` queries, one per problem
+        aliases = re.findall(r"(\w+): question\(titleSlug: \$(\w+)\)", query or "")
+        if aliases:
+            data: Dict[str, Any] = {}
+            for alias, variable in aliases:
+                number = int(str(variables[variable]).rsplit("-", 1)[-1]) - 1
+                data[alias] = (
+                    project(synthetic_question(number))
+                    if 0 <= number < self.problems and number not in self.removed
+                    else None
+                )
+            return {"data": data}
+
+        skip = max(int(variables.get("skip") or 0), 0)
+        limit = max(int(variables.get("limit") or 0), 0)
+        list_id = (variables.get("filters") or {}).get("listId") or ""
+        numbers: Sequence[int] = (
+            self.lists.get(list_id, ()) if list_id else range(self.problems)
+        )
+
+        questions: List[Dict[str, Any]] = [
+            project(synthetic_question(number))
+            for number in numbers[skip : skip + limit]
+        ]
+        return {
+            "data": {
+                "problemsetQuestionList": {
+                    "totalNum": len(numbers),
+                    "questions": questions,
+                }
+            }
+        }
+
+    def _handler(self) -> Type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep connections alive like the real API does
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:  # pylint: disable=invalid-name
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if server._fail():  # pylint: disable=protected-access
+                    self._send(502, b'{"error": "Bad Gateway"}')
+                    return
+
+                self._send(200, json.dumps(server.respond(request)).encode("utf8"))
+
+            def _send(self, status: int, body: bytes) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        return Handler
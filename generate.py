@@ -6,49 +6,159 @@ known.
 
 import argparse
 import asyncio
+import contextlib
 from doctest import debug_script
 import logging
 from pyclbr import Function
 import requests
-import re
 from collections import defaultdict
 from pathlib import Path
-from typing import Any, Awaitable, Callable, Coroutine, List, Optional, Dict
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Coroutine,
+    List,
+    Optional,
+    Dict,
+    Sequence,
+    Union,
+)
 import json
+import os
 
 # https://github.com/kerrickstaley/genanki
 import genanki  # type: ignore
 from tqdm import tqdm  # type: ignore
 
+import leetcode_anki.helpers.apkg
+import leetcode_anki.helpers.cache
+import leetcode_anki.helpers.checkpoint
+import leetcode_anki.helpers.columnar
+import leetcode_anki.helpers.export
+import leetcode_anki.helpers.index
 import leetcode_anki.helpers.leetcode
+import leetcode_anki.helpers.manifest
+import leetcode_anki.helpers.media
+import leetcode_anki.helpers.query
+import leetcode_anki.helpers.ratelimit
+import leetcode_anki.helpers.records
+import leetcode_anki.helpers.render
+import leetcode_anki.helpers.serve
+import leetcode_anki.helpers.subsets
+import leetcode_anki.helpers.sync
+import leetcode_anki.helpers.transport
 
 LEETCODE_ANKI_MODEL_ID = 4567610856
 LEETCODE_ANKI_DECK_ID = 8589798175
 OUTPUT_FILE = "leetcode.apkg"
 OUTPUT_JSON = "leetcode.json"
+MANIFEST_SUFFIX = ".manifest.json"
+# How many built notes may wait to be written to the deck
+NOTE_QUEUE_SIZE = 100
+# Index of the Frequency field of the note model
+FREQUENCY_FIELD = 12
 ALLOWED_EXTENSIONS = {".py", ".go"}
-GRIND75_URL = "https://www.techinterviewhandbook.org/grind75?mode=all&grouping=none&order=all_rounded"
+GRIND75_URL = leetcode_anki.helpers.subsets.GRIND75_URL
 GRIND75_NAME = "grind75"
+GRIND75_SLUG_PATTERN = 'https://leetcode.com/problems/(.*?)"'
+GRIND75_BASE_SIZE = leetcode_anki.helpers.subsets.GRIND75_BASE_SIZE
+# Modules making the deck, a change in any of them changes the deck
+BUILD_MODULES = (
+    leetcode_anki.helpers.apkg,
+    leetcode_anki.helpers.export,
+    leetcode_anki.helpers.media,
+    leetcode_anki.helpers.records,
+    leetcode_anki.helpers.render,
+)
+# How often (in seconds) the deck is rebuilt with --serve
+REFRESH_INTERVAL = 60 * 60
 
 
 logging.getLogger().setLevel(logging.INFO)
 
 
-def get_grind75_problem_slugs() -> List[str]:
+def get_grind75_problem_slugs(
+    record_dir: Optional[str] = None,
+    replay_dir: Optional[str] = None,
+    cache_dir: Optional[str] = None,
+) -> List[str]:
     """
     Get the problem slugs for all problems of the Grind 75 problem collection, in order.
 
     Note that there are more than 75 problems.
+
+    The list is stored in `cache_dir` and the page is only downloaded again
+    when it changes. The page is recorded to / replayed from a snapshot the
+    same way as the leetcode API responses.
     """
-    response = requests.get(GRIND75_URL)
-    response.raise_for_status()
-    return re.findall(b'https://leetcode.com/problems/(.*?)\"', response.content)
+    if replay_dir is not None:
+        store = leetcode_anki.helpers.transport.SnapshotStore(replay_dir)
+        recorded = store.get("GET", GRIND75_URL)
+        if recorded is None:
+            raise ValueError(
+                f"No recorded response for GET {GRIND75_URL} in {replay_dir}"
+            )
+        return leetcode_anki.helpers.subsets.extract_slugs(
+            recorded.data, GRIND75_SLUG_PATTERN
+        )
+
+    if record_dir is not None:
+        response = requests.get(
+            GRIND75_URL, timeout=leetcode_anki.helpers.subsets.REQUEST_TIMEOUT
+        )
+        response.raise_for_status()
+        leetcode_anki.helpers.transport.SnapshotStore(record_dir).put(
+            "GET",
+            GRIND75_URL,
+            None,
+            response.status_code,
+            response.reason,
+            dict(response.headers),
+            response.content,
+        )
+        return leetcode_anki.helpers.subsets.extract_slugs(
+            response.text, GRIND75_SLUG_PATTERN
+        )
 
-def get_grind75_lookup_table() -> Dict[str, int]:
+    return leetcode_anki.helpers.subsets.fetch_remote_slugs(
+        GRIND75_URL, GRIND75_SLUG_PATTERN, cache_dir
+    )
+
+
+def load_subsets(
+    subset_files: Optional[List[str]] = None,
+    record_dir: Optional[str] = None,
+    replay_dir: Optional[str] = None,
+    cache_dir: Optional[str] = None,
+) -> leetcode_anki.helpers.subsets.SubsetRegistry:
     """
-    Get the reverse lookup table to specify the order of each Grind 75 problem.
+    Build the registry of subsets, which defines the order, subset tags and
+    suspension of the cards.
+
+    Without subset files, this is the Grind 75 list: the first 75 problems
+    form the base subset and the rest the extended one, which is suspended.
+    Otherwise every file is a subset named after the file, ranked in the
+    order the files are given.
     """
-    return {slug.decode("utf8"):i for i,slug in enumerate(get_grind75_problem_slugs())}
+    registry = leetcode_anki.helpers.subsets.SubsetRegistry()
+
+    if not subset_files:
+        slugs = get_grind75_problem_slugs(record_dir, replay_dir, cache_dir)
+        registry.add(f"{GRIND75_NAME}::base", slugs[:GRIND75_BASE_SIZE])
+        registry.add(
+            f"{GRIND75_NAME}::extended", slugs[GRIND75_BASE_SIZE:], suspend=True
+        )
+        return registry
+
+    for subset_file in subset_files:
+        registry.add(
+            Path(subset_file).stem,
+            leetcode_anki.helpers.subsets.load_slug_file(subset_file),
+        )
+
+    return registry
+
 
 def parse_args() -> argparse.Namespace:
     """
@@ -64,21 +174,212 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--page-size",
         type=int,
-        help="Get at most this many problems (decrease if leetcode API times out)",
+        help="Get at most this many problems per request (smaller requests are used automatically if leetcode API times out)",
         default=500,
     )
     parser.add_argument(
         "--list-id",
         type=str,
-        help="Get all questions from a specific list id (https://leetcode.com/list?selectedList=<list_id>",
-        default="",
+        action="append",
+        dest="list_ids",
+        metavar="LIST_ID",
+        help="Get all questions from a specific list id (https://leetcode.com/list?selectedList=<list_id>. Can be given several times to get the questions of all the lists at once, tagged with their lists (an empty id is all questions)",
+        default=None,
     )
     parser.add_argument(
         "--output-file", type=str, help="Output filename", default=OUTPUT_FILE
     )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help="Directory to cache leetcode API responses in",
+        default=leetcode_anki.helpers.leetcode.CACHE_DIR,
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        help="Refetch cached API responses older than this many seconds",
+        default=leetcode_anki.helpers.cache.DEFAULT_TTL,
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always fetch problems from the leetcode API",
+    )
+    parser.add_argument(
+        "--checkpoint-dir",
+        type=str,
+        help="Directory to journal fetched pages in, so an interrupted run resumes where it stopped",
+        default=leetcode_anki.helpers.checkpoint.CHECKPOINT_DIR,
+    )
+    parser.add_argument(
+        "--no-checkpoint",
+        action="store_true",
+        help="Don't journal fetched pages, always fetch from the first page",
+    )
+    parser.add_argument(
+        "--build-cache-dir",
+        type=str,
+        help="Directory to remember the inputs of the previous build in, so a build with unchanged inputs is skipped",
+        default=leetcode_anki.helpers.manifest.BUILD_CACHE_DIR,
+    )
+    parser.add_argument(
+        "--no-build-cache",
+        action="store_true",
+        help="Always build the deck, even if nothing changed since the previous build",
+    )
+    parser.add_argument(
+        "--filter",
+        type=str,
+        help="Only include problems matching the expression, e.g. 'company:google AND difficulty:medium AND NOT paid AND likes>=1000'",
+        default=None,
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only write notes that changed since the previous incremental build",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help="Fetch at most this many pages at the same time",
+        default=leetcode_anki.helpers.leetcode.DEFAULT_CONCURRENCY,
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="Send at most this many requests per second to the leetcode API",
+        default=leetcode_anki.helpers.ratelimit.DEFAULT_RATE,
+    )
+    parser.add_argument(
+        "--subset",
+        type=str,
+        action="append",
+        metavar="FILE",
+        dest="subsets",
+        help="Use the problems listed in the file (one slug per line, in order) as a subset named after the file instead of the Grind 75 list. Can be given several times, subsets are ordered as given",
+        default=None,
+    )
+    parser.add_argument(
+        "--two-phase",
+        action="store_true",
+        help="List problems without descriptions, then fetch descriptions only for the problems in the deck",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        help="With --two-phase, fetch descriptions of this many problems with a single request",
+        default=leetcode_anki.helpers.leetcode.DEFAULT_BATCH_SIZE,
+    )
+    parser.add_argument(
+        "--no-description",
+        action="store_true",
+        help="Leave problem descriptions out of the cards (they aren't downloaded at all)",
+    )
+    parser.add_argument(
+        "--media-dir",
+        type=str,
+        help="Directory to store images from problem descriptions in",
+        default=leetcode_anki.helpers.media.MEDIA_DIR,
+    )
+    parser.add_argument(
+        "--no-images",
+        action="store_true",
+        help="Don't bundle images with the deck, cards load them from leetcode.com",
+    )
+    parser.add_argument(
+        "--render-workers",
+        type=int,
+        help="Render notes in this many processes (0 to render them in the main process)",
+        default=leetcode_anki.helpers.render.DEFAULT_RENDER_WORKERS,
+    )
+    parser.add_argument(
+        "--compression-level",
+        type=int,
+        choices=range(10),
+        metavar="{0..9}",
+        help="Zip compression level of the output file, 0 to store it uncompressed",
+        default=leetcode_anki.helpers.apkg.DEFAULT_COMPRESSION_LEVEL,
+    )
+    parser.add_argument(
+        "--sync",
+        type=str,
+        metavar="COLLECTION",
+        help="Instead of writing a package, update the notes of this Anki collection (collection.anki2 in the Anki profile folder, close Anki first) keeping the review history. The deck must have been imported into it once",
+        default=None,
+    )
+    parser.add_argument(
+        "--sync-output",
+        type=str,
+        metavar="FILE",
+        help="With --sync, write the updated collection to this file and leave the original one unchanged",
+        default=None,
+    )
+    parser.add_argument(
+        "--json-output",
+        type=str,
+        metavar="FILE",
+        help=f"Also export the notes to this JSON file (with --serve, {OUTPUT_JSON} by default)",
+        default=None,
+    )
+    parser.add_argument(
+        "--problems-output",
+        type=str,
+        metavar="FILE",
+        help="Also export the problems of the deck to this newline-delimited JSON file, one problem per line, as they are fetched. Compressed if the name ends with .gz, or with .zst (needs the zstandard package)",
+        default=None,
+    )
+    parser.add_argument(
+        "--columnar-dir",
+        type=str,
+        metavar="DIR",
+        help=f"Save every fetch of the problems as a dated columnar snapshot in this directory (e.g. {leetcode_anki.helpers.columnar.COLUMNAR_DIR}), for get_tag_stats.py. Needs the pyarrow package",
+        default=None,
+    )
+    parser.add_argument(
+        "--serve",
+        type=int,
+        metavar="PORT",
+        help="Keep running: refresh the problems every --refresh-interval seconds, rebuild the deck and the JSON export when they change and serve them over HTTP on this port",
+        default=None,
+    )
+    parser.add_argument(
+        "--serve-host",
+        type=str,
+        help="With --serve, listen on this address",
+        default=leetcode_anki.helpers.serve.DEFAULT_HOST,
+    )
+    parser.add_argument(
+        "--refresh-interval",
+        type=float,
+        help="With --serve, refresh the problems this often (in seconds)",
+        default=REFRESH_INTERVAL,
+    )
+    snapshot = parser.add_mutually_exclusive_group()
+    snapshot.add_argument(
+        "--record",
+        type=str,
+        metavar="DIR",
+        help="Record all responses to a snapshot in this directory",
+        default=None,
+    )
+    snapshot.add_argument(
+        "--replay",
+        type=str,
+        metavar="DIR",
+        help="Serve all responses from a snapshot recorded with --record, without network access",
+        default=None,
+    )
 
     args = parser.parse_args()
 
+    if args.serve is not None and (
+        args.sync or args.incremental or args.record or args.replay
+    ):
+        parser.error(
+            "--serve can't be used with --sync, --incremental, --record or --replay"
+        )
+
     return args
 
 
@@ -94,72 +395,49 @@ class LeetcodeNote(genanki.Note):
         return genanki.guid_for(self.fields[0])
 
 
-async def generate_anki_note(
-    leetcode_data: leetcode_anki.helpers.leetcode.LeetcodeData,
+def make_anki_note(
     leetcode_model: genanki.Model,
-    leetcode_task_handle: str,
-    output_description: bool = True,
-    subsets: Optional[Dict[str, str]] = None,
-    suspend: Optional[Function] = None,
+    record: leetcode_anki.helpers.records.ProblemRecord,
+    fields: Sequence[str],
+    subsets: Optional[leetcode_anki.helpers.subsets.SubsetRegistry] = None,
+    suspend: Optional[Callable[[str], bool]] = None,
 ) -> LeetcodeNote:
     """
-    Generate a single Anki flashcard
+    Build the Anki flashcard from the rendered fields of the problem
+    (see leetcode_anki.helpers.render.note_fields())
     """
+
     def get_subsets(slug):
-        return list(sorted(subsets[slug]))
+        if subsets is None:
+            return []
+        return subsets.tags(slug)
 
     def paid_tag(paid):
         if paid:
             return "LeetCode::access::paid"
         return "LeetCode::access::free"
 
-    is_paid = await leetcode_data.paid(leetcode_task_handle)
-
     suspend = suspend or (lambda x: False)
 
     note = LeetcodeNote(
         model=leetcode_model,
-        fields=[
-            leetcode_task_handle,
-            str(await leetcode_data.problem_id(leetcode_task_handle)),
-            str(await leetcode_data.title(leetcode_task_handle)),
-            str(await leetcode_data.category(leetcode_task_handle)),
-            await leetcode_data.description(leetcode_task_handle) if output_description else "",
-            await leetcode_data.difficulty(leetcode_task_handle),
-            "yes" if is_paid else "no",
-            str(await leetcode_data.likes(leetcode_task_handle)),
-            str(await leetcode_data.dislikes(leetcode_task_handle)),
-            str(await leetcode_data.submissions_total(leetcode_task_handle)),
-            str(await leetcode_data.submissions_accepted(leetcode_task_handle)),
-            str(
-                int(
-                    await leetcode_data.submissions_accepted(leetcode_task_handle)
-                    / await leetcode_data.submissions_total(leetcode_task_handle)
-                    * 100
-                )
-            ),
-            str(await leetcode_data.freq_bar(leetcode_task_handle)),
-            str(await leetcode_data.total_times_encountered(leetcode_task_handle)),
-            json.dumps(await leetcode_data.company_stats(leetcode_task_handle)),
-        ],
-        tags=await leetcode_data.tags(leetcode_task_handle) + get_subsets(leetcode_task_handle) + [paid_tag(is_paid)],
+        fields=list(fields),
+        tags=list(record.tags) + get_subsets(record.slug) + [paid_tag(record.paid)],
         # FIXME: sort field doesn't work
-        sort_field=str(await leetcode_data.freq_bar(leetcode_task_handle)).zfill(3),
+        sort_field=fields[FREQUENCY_FIELD].zfill(3),
     )
-    if suspend(leetcode_task_handle):
+    if suspend(record.slug):
         for card in note.cards:
             card.suspend = True
     return note
 
 
-async def generate(
-    start: int, stop: int, page_size: int, list_id: str, output_file: str, grind75_only=False, allow_premium=True, output_description=True,
-) -> None:
+def make_leetcode_model(output_description: bool = True) -> genanki.Model:
     """
-    Generate an Anki deck
+    Anki note model of the problems
     """
     description_header = "" if not output_description else "<h3>Description</h3>"
-    leetcode_model = genanki.Model(
+    return genanki.Model(
         LEETCODE_ANKI_MODEL_ID,
         "LeetCode model",
         fields=[
@@ -222,70 +500,546 @@ async def generate(
             }
         ],
     )
-    leetcode_deck = genanki.Deck(LEETCODE_ANKI_DECK_ID, Path(output_file).stem)
 
-    leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(
-        start, stop, page_size, list_id
+
+def make_leetcode_data(
+    start: int,
+    stop: int,
+    page_size: int,
+    list_id: Union[str, Sequence[str]],
+    output_description: bool = True,
+    **options: Any,
+) -> leetcode_anki.helpers.leetcode.LeetcodeData:
+    """
+    Problem data for the notes, `options` are passed to LeetcodeData
+    """
+    return leetcode_anki.helpers.leetcode.LeetcodeData(
+        start,
+        stop,
+        page_size,
+        list_id,
+        # Only what the notes are made of is downloaded, e.g. no descriptions
+        # for a deck without them
+        selection=leetcode_anki.helpers.query.selection_for_model(
+            make_leetcode_model(output_description).fields, output_description
+        ),
+        **options,
     )
 
-    note_generators: List[Awaitable[LeetcodeNote]] = []
 
-    task_handles = await leetcode_data.all_problems_handles()
+async def generate_anki_note(
+    leetcode_data: leetcode_anki.helpers.leetcode.LeetcodeData,
+    leetcode_model: genanki.Model,
+    leetcode_task_handle: str,
+    output_description: bool = True,
+    subsets: Optional[leetcode_anki.helpers.subsets.SubsetRegistry] = None,
+    suspend: Optional[Callable[[str], bool]] = None,
+) -> LeetcodeNote:
+    """
+    Generate a single Anki flashcard
+    """
+    record = await leetcode_data.record(leetcode_task_handle)
+    return make_anki_note(
+        leetcode_model,
+        record,
+        leetcode_anki.helpers.render.note_fields(record, output_description),
+        subsets,
+        suspend,
+    )
+
+
+async def generate(
+    start: int, stop: int, page_size: int, list_id: Union[str, Sequence[str]], output_file: str, grind75_only=False, allow_premium=True, output_description=True,
+    cache_dir: Optional[str] = None,
+    cache_ttl: float = leetcode_anki.helpers.cache.DEFAULT_TTL,
+    concurrency: int = leetcode_anki.helpers.leetcode.DEFAULT_CONCURRENCY,
+    rate: float = leetcode_anki.helpers.ratelimit.DEFAULT_RATE,
+    incremental: bool = False,
+    problem_filter: Optional[str] = None,
+    record_dir: Optional[str] = None,
+    replay_dir: Optional[str] = None,
+    subset_files: Optional[List[str]] = None,
+    compression_level: int = leetcode_anki.helpers.apkg.DEFAULT_COMPRESSION_LEVEL,
+    sync_collection: Optional[str] = None,
+    sync_output: Optional[str] = None,
+    render_workers: int = leetcode_anki.helpers.render.DEFAULT_RENDER_WORKERS,
+    media_dir: Optional[str] = None,
+    two_phase: bool = False,
+    batch_size: int = leetcode_anki.helpers.leetcode.DEFAULT_BATCH_SIZE,
+    checkpoint_dir: Optional[str] = None,
+    json_file: Optional[str] = None,
+    problems_file: Optional[str] = None,
+    only_if_changed: bool = False,
+    leetcode_data: Optional[leetcode_anki.helpers.leetcode.LeetcodeData] = None,
+    build_cache_dir: Optional[str] = None,
+    columnar_dir: Optional[str] = None,
+) -> bool:
+    """
+    Generate an Anki deck, return whether it was written
+
+    `list_id` is a leetcode list or several of them. Problems of several
+    lists are fetched once and tagged with the lists they're in (see
+    leetcode_anki.helpers.leetcode.LeetcodeData).
+
+    In incremental mode only notes that were added or changed since the
+    previous incremental build are written to the output file, and the file
+    isn't written at all if nothing changed. Importing such a deck into Anki
+    updates the changed notes and keeps the rest.
+
+    `problem_filter` is an expression selecting problems for the deck, e.g.
+    `company:google AND difficulty:medium AND NOT paid`.
+
+    With `record_dir` all the responses are recorded to a snapshot, with
+    `replay_dir` the deck is built from a recorded snapshot offline.
+
+    `subset_files` are files with ordered problem slugs, one per line, used
+    as subsets instead of the Grind 75 list (see load_subsets()).
+
+    `compression_level` is the zlib level of the package (0 to 9, 0 stores
+    it uncompressed).
+
+    With `sync_collection` no package is written. Instead, notes of the
+    Anki collection (a `collection.anki2` file) are updated in place, or in
+    its copy at `sync_output`, keeping the review history (see
+    leetcode_anki.helpers.sync.CollectionSync).
+
+    Note fields are rendered by `render_workers` processes, or in this
+    process if it's 0 (see leetcode_anki.helpers.render.NoteRenderer).
+
+    With `media_dir`, images in the descriptions are downloaded into the
+    media store there (see leetcode_anki.helpers.media.MediaStore) and
+    bundled with the notes, so cards don't need the network to show them.
 
-    # TODO: Add a way to specify subsets (in order) from the command line
-    # (probably from a set of files where each slug is on a separate line,
-    # and the filename determines the subset name and tag).
-    # Provide a separate script to generate a grind75.txt file that can be
-    # used as a subset.
-    grind75_subset = get_grind75_lookup_table()
+    With `two_phase`, problems are listed without their descriptions first,
+    and the descriptions are fetched one by one only for the problems that
+    go into the deck (and cached until the listed problem changes). This is
+    much faster for a filtered or Grind 75 only deck. Descriptions of up to
+    `batch_size` problems are fetched with a single request.
 
-    # Sort problems by their location in the Grind 75 list.
-    # This order is a good order to prioritize problems.
-    # See https://www.techinterviewhandbook.org/grind75/faq for why.
-    # All problems not in the subset will sort after these in their original order
-    # due to Python using a stable sort algorithm.
-    task_handles.sort(key=lambda x: grind75_subset.get(x, len(grind75_subset)))
+    With `checkpoint_dir`, fetched pages are journaled there and an
+    interrupted run resumes from the first missing page.
 
-    if grind75_only:
-        task_handles = [x for x in task_handles if x in grind75_subset]
-    
+    With `json_file`, the notes are also exported there as JSON (see
+    leetcode_anki.helpers.export.JsonExport).
+
+    With `problems_file`, the problems of the deck are exported there as
+    newline-delimited JSON as they are fetched, compressed when the file
+    name ends with .gz or .zst (see leetcode_anki.helpers.export.ProblemExport).
+
+    With `only_if_changed`, the whole deck is built, but the output files
+    are only written if a note was added, changed or removed since the
+    previous such build (or the files are missing).
+
+    `leetcode_data` is the problem data to build the deck from, e.g. kept
+    between builds by serve(). The fetch parameters aren't used then.
+
+    With `build_cache_dir`, the hash of all the inputs (the fetched problems,
+    the subsets, the note model, the options and the code building the
+    notes) is kept there with the hashes of the written files. If the inputs
+    and the files haven't changed since, nothing is built again (see
+    leetcode_anki.helpers.manifest.BuildCache). The problems are hashed from
+    the disk cache when all of them are there, so such a build is skipped
+    before fetching, rendering and packaging the notes. Otherwise they are
+    hashed as they are streamed and only the output files are not written
+    again.
+
+    With `columnar_dir`, every fetch of the problems is saved there as a
+    dated columnar snapshot, which get_tag_stats.py computes the stats from
+    (see leetcode_anki.helpers.columnar).
+    """
+    if sync_collection is not None and incremental:
+        raise ValueError(
+            "Incremental builds can't be synced, sync only updates changed notes anyway"
+        )
+
+    if sync_output is not None and sync_collection is None:
+        raise ValueError("Sync output is set, but there is no collection to sync")
+
+    if only_if_changed and incremental:
+        raise ValueError("Incremental builds only write changed notes anyway")
+
+    leetcode_model = make_leetcode_model(output_description)
+    leetcode_deck = genanki.Deck(LEETCODE_ANKI_DECK_ID, Path(output_file).stem)
+
+    if leetcode_data is None:
+        leetcode_data = make_leetcode_data(
+            start,
+            stop,
+            page_size,
+            list_id,
+            output_description,
+            cache_dir=cache_dir,
+            cache_ttl=cache_ttl,
+            concurrency=concurrency,
+            rate=rate,
+            record_dir=record_dir,
+            replay_dir=replay_dir,
+            two_phase=two_phase,
+            batch_size=batch_size,
+            checkpoint_dir=checkpoint_dir,
+            columnar_dir=columnar_dir,
+        )
+
+    subsets = load_subsets(subset_files, record_dir, replay_dir, cache_dir)
+
+    # Hashed before the build, writing the model adds to its fields and
+    # templates
+    model_hash = leetcode_anki.helpers.manifest.content_hash(
+        LEETCODE_ANKI_DECK_ID,
+        leetcode_model.model_id,
+        leetcode_model.fields,
+        leetcode_model.templates,
+    )
+
+    manifest: Optional[leetcode_anki.helpers.manifest.BuildManifest] = None
+    if incremental or only_if_changed:
+        manifest = leetcode_anki.helpers.manifest.BuildManifest(
+            output_file + MANIFEST_SUFFIX, model_hash
+        )
+
+    filters = [f"({problem_filter})"] if problem_filter else []
     if not allow_premium:
-        task_handles = [x for x in task_handles if not await leetcode_data.paid(x)]
-
-    subsets = defaultdict(lambda: {"LeetCode::subset::all"})
-    for slug,i in grind75_subset.items():
-        if i < 75:
-            subsets[slug].add(f"LeetCode::subset::{GRIND75_NAME}::base")
-        else:
-            subsets[slug].add(f"LeetCode::subset::{GRIND75_NAME}::extended")
-
-    unsuspended_subsets = {
-        f"LeetCode::subset::{GRIND75_NAME}::base"
-    }
-
-    def suspend(slug):
-        # Suspend any cards that are not in an unsuspended subset.
-        # Note that if they are in one subset that is unsuspended and
-        # another that is not unsuspended, they won't be suspended.
-        return len(subsets[slug] & unsuspended_subsets) == 0
-        
-    logging.info("Generating flashcards")
-    for leetcode_task_handle in task_handles:
-        note_generators.append(
-            generate_anki_note(
-                    leetcode_data,
-                    leetcode_model,
-                    leetcode_task_handle,
-                    output_description,
-                    subsets,
-                    suspend = suspend
+        filters.append("NOT paid")
+    filter_expression = " AND ".join(filters)
+    if filter_expression:
+        # Fail on a malformed expression before fetching anything
+        leetcode_anki.helpers.index.parse_filter(filter_expression)
+
+    outputs = [
+        path for path in (output_file, json_file, problems_file) if path is not None
+    ]
+    build_cache: Optional[leetcode_anki.helpers.manifest.BuildCache] = None
+    if (
+        build_cache_dir is not None
+        and not incremental
+        and sync_collection is None
+        and record_dir is None
+    ):
+        build_cache = leetcode_anki.helpers.manifest.BuildCache(
+            build_cache_dir, *outputs
+        )
+
+    def build_key(problems_hash: str) -> str:
+        """
+        Hash of all the inputs of the build, from the hash of the problems
+        """
+        return leetcode_anki.helpers.manifest.content_hash(
+            problems_hash,
+            subsets.snapshot(),
+            model_hash,
+            [start, stop, page_size, list_id, grind75_only, filter_expression],
+            [two_phase, output_description, media_dir is not None, compression_level],
+            [
+                leetcode_anki.helpers.manifest.file_hash(path)
+                for path in (
+                    __file__,
+                    *(module.__file__ for module in BUILD_MODULES),
+                )
+                if path is not None
+            ],
+        )
+
+    if build_cache is not None:
+        # If every page of the problems is in the disk cache, the build is
+        # skipped before anything is fetched, rendered or packaged
+        stored_hash = leetcode_data.stored_snapshot_hash()
+        if stored_hash is not None and build_cache.hit(build_key(stored_hash)):
+            logging.info(
+                "Nothing changed since the previous build, %s is up to date",
+                ", ".join(outputs),
             )
+            return False
+
+    # Notes are built and written while problems are still being fetched,
+    # with bounded queues between the stages, so only a few pages of
+    # problems are in memory at any time.
+    note_queue: "asyncio.Queue[Optional[LeetcodeNote]]" = asyncio.Queue(
+        maxsize=NOTE_QUEUE_SIZE
+    )
+    # Notes that were added or changed since the previous build
+    notes_changed = 0
+
+    async def build_notes(
+        renderer: leetcode_anki.helpers.render.NoteRenderer,
+        writer: Union[
+            leetcode_anki.helpers.apkg.ApkgWriter,
+            leetcode_anki.helpers.sync.CollectionSync,
+        ],
+    ) -> None:
+        nonlocal notes_changed
+        # Problems are ordered by their rank in the subsets (by default,
+        # their location in the Grind 75 list).
+        # This order is a good order to prioritize problems.
+        # See https://www.techinterviewhandbook.org/grind75/faq for why.
+        # All problems not in the subsets go after these in their original
+        # order. Instead of sorting all the problems, each note gets its
+        # position in the deck (the due number of its new cards) right away.
+        position = len(subsets)
+
+        try:
+            async for task_handles in leetcode_data.stream_problems_handles(
+                hash_snapshot=build_cache is not None
+            ):
+                if filter_expression:
+                    task_handles = await leetcode_data.select(
+                        filter_expression, task_handles
+                    )
+
+                ordered = []
+                for leetcode_task_handle in task_handles:
+                    order = subsets.rank(leetcode_task_handle)
+                    if order is None:
+                        if grind75_only:
+                            continue
+                        order = position
+                        position += 1
+                    ordered.append((leetcode_task_handle, order))
+
+                # Second phase of a two-phase fetch, only for the problems
+                # that go into the deck
+                await leetcode_data.fetch_details(
+                    leetcode_task_handle for leetcode_task_handle, _ in ordered
+                )
+
+                # The whole page is looked up at once
+                page_records = await leetcode_data.records(
+                    leetcode_task_handle for leetcode_task_handle, _ in ordered
+                )
+                if problems is not None:
+                    for record in page_records:
+                        problems.add(
+                            record, record.tags + tuple(subsets.tags(record.slug))
+                        )
+
+                selected = []
+                for record, (leetcode_task_handle, order) in zip(page_records, ordered):
+                    if manifest is not None and not manifest.changed(
+                        leetcode_task_handle,
+                        leetcode_anki.helpers.manifest.content_hash(
+                            # Same as leetcode_data.content_hash()
+                            leetcode_anki.helpers.manifest.content_hash(*record),
+                            subsets.tags(leetcode_task_handle),
+                            subsets.suspended(leetcode_task_handle),
+                            output_description,
+                            media is not None,
+                        ),
+                    ):
+                        if incremental:
+                            continue
+                    else:
+                        notes_changed += 1
+
+                    selected.append((record, order))
+
+                records = [record for record, _ in selected]
+                if media is not None:
+                    records, media_names = await media.localize(records)
+                    for name in media_names:
+                        writer.add_media(media.path(name))
+
+                # The whole page is rendered in parallel by the worker
+                # processes, the notes are then put together here
+                rendered = await renderer.render(records)
+                for record, (_, order), fields in zip(records, selected, rendered):
+                    leetcode_note = make_anki_note(
+                        leetcode_model,
+                        record,
+                        fields,
+                        subsets,
+                        suspend=subsets.suspended,
+                    )
+                    leetcode_note.due = order
+                    await note_queue.put(leetcode_note)
+        finally:
+            await note_queue.put(None)
+
+    async def write_notes(
+        writer: Union[
+            leetcode_anki.helpers.apkg.ApkgWriter,
+            leetcode_anki.helpers.sync.CollectionSync,
+        ],
+    ) -> None:
+        with tqdm(unit="flashcard") as progress:
+            while True:
+                leetcode_note = await note_queue.get()
+                if leetcode_note is None:
+                    return
+
+                writer.add(leetcode_note)
+                if export is not None:
+                    export.add(leetcode_note)
+                progress.update()
+
+    logging.info("Generating flashcards")
+    # Notes go to the package (or the collection) as soon as they are built,
+    # the deck object only describes the deck and doesn't hold any notes
+    writer: Union[
+        leetcode_anki.helpers.apkg.ApkgWriter,
+        leetcode_anki.helpers.sync.CollectionSync,
+    ]
+    if sync_collection is not None:
+        writer = leetcode_anki.helpers.sync.CollectionSync(
+            sync_collection, leetcode_model, output=sync_output
+        )
+    else:
+        writer = leetcode_anki.helpers.apkg.ApkgWriter(
+            output_file,
+            leetcode_deck,
+            [leetcode_model],
+            compression_level=compression_level,
         )
 
-    for leetcode_note in tqdm(note_generators, unit="flashcard"):
-        leetcode_deck.add_note(await leetcode_note)
+    export = (
+        leetcode_anki.helpers.export.JsonExport(json_file)
+        if json_file is not None
+        else None
+    )
+    problems = (
+        leetcode_anki.helpers.export.ProblemExport(problems_file)
+        if problems_file is not None
+        else None
+    )
+
+    media: Optional[leetcode_anki.helpers.media.MediaStore] = None
+    if media_dir is not None and output_description:
+        # A replayed build stays offline and uses only the stored images
+        media = leetcode_anki.helpers.media.MediaStore(
+            media_dir, offline=replay_dir is not None
+        )
 
-    genanki.Package(leetcode_deck).write_to_file(output_file)
+    renderer = leetcode_anki.helpers.render.NoteRenderer(
+        render_workers, output_description
+    )
+
+    written = True
+    key = ""
+    with contextlib.ExitStack() as stack:
+        for context in (writer, export, problems, renderer, media):
+            if context is not None:
+                stack.enter_context(context)
+
+        await asyncio.gather(build_notes(renderer, writer), write_notes(writer))
+
+        if build_cache is not None:
+            # Without all the problems in the disk cache, the build can only
+            # be skipped here, from the hash of the streamed problems
+            key = build_key(leetcode_data.snapshot_hash())
+            written = not build_cache.hit(key)
+            if not written:
+                logging.info(
+                    "Nothing changed since the previous build, %s is up to date",
+                    ", ".join(outputs),
+                )
+
+        if written and manifest is not None:
+            removed = len(manifest.removed())
+            logging.info(
+                "%s notes added or changed, %s removed", notes_changed, removed
+            )
+            if incremental:
+                written = writer.notes_written > 0
+            else:
+                written = bool(
+                    notes_changed
+                    or removed
+                    or not all(os.path.exists(path) for path in outputs)
+                )
+            if not written:
+                logging.info("Nothing changed, not writing %s", output_file)
+
+        if not written:
+            writer.discard()
+            if export is not None:
+                export.discard()
+            if problems is not None:
+                problems.discard()
+
+    if manifest is not None:
+        manifest.save()
+
+    if build_cache is not None and written:
+        build_cache.save(key)
+
+    return written
+
+
+async def serve(
+    port: int,
+    start: int,
+    stop: int,
+    page_size: int,
+    list_id: Union[str, Sequence[str]],
+    output_file: str,
+    json_file: str = OUTPUT_JSON,
+    problems_file: Optional[str] = None,
+    host: str = leetcode_anki.helpers.serve.DEFAULT_HOST,
+    interval: float = REFRESH_INTERVAL,
+    output_description: bool = True,
+    cache_dir: Optional[str] = None,
+    cache_ttl: float = leetcode_anki.helpers.cache.DEFAULT_TTL,
+    concurrency: int = leetcode_anki.helpers.leetcode.DEFAULT_CONCURRENCY,
+    rate: float = leetcode_anki.helpers.ratelimit.DEFAULT_RATE,
+    two_phase: bool = False,
+    batch_size: int = leetcode_anki.helpers.leetcode.DEFAULT_BATCH_SIZE,
+    checkpoint_dir: Optional[str] = None,
+    columnar_dir: Optional[str] = None,
+    **options: Any,
+) -> None:
+    """
+    Keep the deck up to date and serve it, never returns.
+
+    The problem data (with the authenticated API client and the rate
+    limiter) is kept between builds. Every `interval` seconds the problems
+    are fetched again, the deck and its JSON export are rebuilt and the
+    output files are only replaced if a note changed (see generate()'s
+    `only_if_changed`). The latest files are served over HTTP at
+    http://`host`:`port`/<file name> with ETags, so clients polling them
+    only download a new deck (see leetcode_anki.helpers.serve.DeckServer).
+
+    `options` are passed to generate().
+    """
+    leetcode_data = make_leetcode_data(
+        start,
+        stop,
+        page_size,
+        list_id,
+        output_description,
+        cache_dir=cache_dir,
+        # Every refresh fetches the pages again
+        cache_ttl=min(cache_ttl, interval),
+        concurrency=concurrency,
+        rate=rate,
+        two_phase=two_phase,
+        batch_size=batch_size,
+        checkpoint_dir=checkpoint_dir,
+        columnar_dir=columnar_dir,
+    )
+
+    with leetcode_anki.helpers.serve.DeckServer(host, port) as server:
+        while True:
+            try:
+                await generate(
+                    start,
+                    stop,
+                    page_size,
+                    list_id,
+                    output_file,
+                    output_description=output_description,
+                    cache_dir=cache_dir,
+                    json_file=json_file,
+                    problems_file=problems_file,
+                    only_if_changed=True,
+                    leetcode_data=leetcode_data,
+                    **options,
+                )
+                for path in (output_file, json_file, problems_file):
+                    if path is not None:
+                        server.publish(path)
+            except Exception:  # pylint: disable=broad-except
+                logging.exception("Building the deck failed, serving the previous one")
+
+            await asyncio.sleep(interval)
+            leetcode_data.refresh()
 
 
 async def main() -> None:
@@ -294,15 +1048,65 @@ async def main() -> None:
     """
     args = parse_args()
 
-    start, stop, page_size, list_id, output_file = (
+    start, stop, page_size, list_ids, output_file = (
         args.start,
         args.stop,
         args.page_size,
-        args.list_id,
+        args.list_ids or [""],
         args.output_file,
     )
     # TODO: Add CLI parameters for subset and premium
-    await generate(start, stop, page_size, list_id, output_file, grind75_only=False, allow_premium=True, output_description=True)
+    options: Dict[str, Any] = dict(
+        grind75_only=False,
+        allow_premium=True,
+        output_description=not args.no_description,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        cache_ttl=args.cache_ttl,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        incremental=args.incremental,
+        problem_filter=args.filter,
+        record_dir=args.record,
+        replay_dir=args.replay,
+        subset_files=args.subsets,
+        compression_level=args.compression_level,
+        sync_collection=args.sync,
+        sync_output=args.sync_output,
+        render_workers=args.render_workers,
+        media_dir=None if args.no_images else args.media_dir,
+        two_phase=args.two_phase,
+        batch_size=args.batch_size,
+        checkpoint_dir=None if args.no_checkpoint else args.checkpoint_dir,
+        build_cache_dir=None if args.no_build_cache else args.build_cache_dir,
+        columnar_dir=args.columnar_dir,
+    )
+
+    if args.serve is not None:
+        await serve(
+            args.serve,
+            start,
+            stop,
+            page_size,
+            list_ids,
+            output_file,
+            json_file=args.json_output or OUTPUT_JSON,
+            problems_file=args.problems_output,
+            host=args.serve_host,
+            interval=args.refresh_interval,
+            **options,
+        )
+        return
+
+    await generate(
+        start,
+        stop,
+        page_size,
+        list_ids,
+        output_file,
+        json_file=args.json_output,
+        problems_file=args.problems_output,
+        **options,
+    )
 
 
 if __name__ == "__main__":
@@ -12,11 +12,22 @@ by Dona M. Wong  (Author)
 (Note: Dona Wong was a PhD student of Edward Tufte)
 
 A nice place to generate pie charts: https://chart-studio.plotly.com/
+
+The problems come from a CSV exported from the deck, or with --snapshots from
+the columnar snapshots saved by `generate.py --columnar-dir`, which needs
+neither Anki nor a new fetch.
 """
 
-import yaml
+import argparse
+from typing import Sequence
+
 import pandas as pd
- 
+import yaml
+
+import leetcode_anki.helpers.columnar
+import leetcode_anki.helpers.leetcode
+import leetcode_anki.helpers.subsets
+
 # Exported to CSV from Anki deck from https://github.com/alexbowe/leetcode-anki-with-grind75
 # using https://ankiweb.net/shared/info/1478130872
 # Could also load an Anki deck in SQLite instead -
@@ -87,32 +98,139 @@ CSV_COLUMNS = [
     "tags",
 ]
 
-df = pd.read_csv(CSV_PATH, names=CSV_COLUMNS)
-
-# Add grind75 column
-df["grind75"] = df.tags.str.contains(GRIND_75_BASE_TAG)
-
-# Split tags column
-df["tags"] = df.tags.str.split(" ").tolist()
-df = df.explode("tags")
-
-# Filter out non-topic tags
-df = df[df.tags.str.startswith(TOPIC_TAG_PREFIX)]
-
-# Remove tag prefix
-df["tag"] = df.tags.str[len(TOPIC_TAG_PREFIX):]
-del df["tags"] # We don't need the plural column anymore
-
-df["company_stats"] = df.company_stats.apply(get_company_stats_dict)
-df = df.explode("company_stats")
+# Columns of the problems table of a columnar snapshot, by their CSV names
+SNAPSHOT_COLUMNS = {
+    "slug": "slug",
+    "problem_id": "id",
+    "title": "title",
+    "category": "topic",
+    "difficulty": "difficulty",
+    "paid": "paid",
+    "likes": "likes",
+    "dislikes": "dislikes",
+    "submissions_total": "submissions_total",
+    "submissions_accepted": "submissions_accepted",
+    "freq_bar": "frequency",
+    "total_times_encountered": "total_times_encountered",
+    "topic_tags": "tag",
+}
+
+
+def load_csv() -> pd.DataFrame:
+    df = pd.read_csv(CSV_PATH, names=CSV_COLUMNS)
+
+    # Add grind75 column
+    df["grind75"] = df.tags.str.contains(GRIND_75_BASE_TAG)
+
+    # Split tags column
+    df["tags"] = df.tags.str.split(" ").tolist()
+    df = df.explode("tags")
+
+    # Filter out non-topic tags
+    df = df[df.tags.str.startswith(TOPIC_TAG_PREFIX)]
+
+    # Remove tag prefix
+    df["tag"] = df.tags.str[len(TOPIC_TAG_PREFIX) :]
+    del df["tags"]  # We don't need the plural column anymore
+
+    df["company_stats"] = df.company_stats.apply(get_company_stats_dict)
+    df = df.explode("company_stats")
+
+    # Remove questions that don't have any company stats
+    df = df[~df.company_stats.isnull()]
+
+    # Split company_stats into company and times_encountered fields
+    df["company"] = df.company_stats.apply(lambda x: x["company"])
+    df["times_encountered"] = df.company_stats.apply(lambda x: x["times_encountered"])
+    del df["company_stats"]  # We don't need the dict column anymore
+    return df
+
+
+def join_company_stats(
+    problems: pd.DataFrame, company_stats: pd.DataFrame, keys: Sequence[str]
+) -> pd.DataFrame:
+    # One row per topic of a problem
+    problems = problems.explode("tag")
+    problems = problems[~problems.tag.isnull()]
+
+    # Company stats are already a long table, one row per problem and company.
+    # The inner join removes questions that don't have any company stats
+    company_stats = company_stats[company_stats.times_encountered > 0]
+    return problems.merge(company_stats, on=list(keys))
+
+
+def load_grind75_base(cache_dir: str) -> Sequence[str]:
+    # The Grind 75 list as cached by generate.py, never downloaded here
+    slugs = leetcode_anki.helpers.subsets.stored_remote_slugs(
+        leetcode_anki.helpers.subsets.GRIND75_URL, cache_dir
+    )
+    if slugs is None:
+        raise ValueError(
+            f"No Grind 75 list cached in {cache_dir}, run generate.py with it once"
+        )
+    return slugs[: leetcode_anki.helpers.subsets.GRIND75_BASE_SIZE]
+
+
+def load_snapshot(
+    store: leetcode_anki.helpers.columnar.ColumnarStore, cache_dir: str
+) -> pd.DataFrame:
+    problems = store.read(leetcode_anki.helpers.columnar.PROBLEMS_TABLE).to_pandas()
+    problems = problems[list(SNAPSHOT_COLUMNS)].rename(columns=SNAPSHOT_COLUMNS)
+
+    # Integer percent like the rate of the notes, 0 without submissions
+    rate = problems.submissions_accepted / problems.submissions_total * 100
+    problems["submission_accept_rate"] = rate.where(
+        problems.submissions_total > 0, 0
+    ).astype(int)
+
+    # Add grind75 column
+    problems["grind75"] = problems.slug.isin(load_grind75_base(cache_dir))
+
+    company_stats = store.read(leetcode_anki.helpers.columnar.COMPANY_STATS_TABLE)
+    return join_company_stats(problems, company_stats.to_pandas(), ["slug"])
+
+
+def get_tag_stats_history(
+    store: leetcode_anki.helpers.columnar.ColumnarStore,
+) -> pd.DataFrame:
+    # Topics and company stats of the problems in all the snapshots
+    problems = store.history(leetcode_anki.helpers.columnar.PROBLEMS_TABLE)
+    problems = problems.select(["taken_at", "slug", "topic_tags"]).to_pandas()
+    problems = problems.rename(columns={"topic_tags": "tag"})
+    company_stats = store.history(leetcode_anki.helpers.columnar.COMPANY_STATS_TABLE)
+    df = join_company_stats(problems, company_stats.to_pandas(), ["taken_at", "slug"])
+
+    new_df = df.groupby(["taken_at", "tag"]).times_encountered.sum().reset_index()
+    new_df["freq"] = new_df.times_encountered / new_df.groupby(
+        "taken_at"
+    ).times_encountered.transform("sum")
+    return new_df
 
-# Remove questions that don't have any company stats
-df = df[~df.company_stats.isnull()]
 
-# Split company_stats into company and times_encountered fields
-df["company"] = df.company_stats.apply(lambda x: x["company"])
-df["times_encountered"] = df.company_stats.apply(lambda x: x["times_encountered"])
-del df["company_stats"] # We don't need the dict column anymore
+parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+parser.add_argument(
+    "--snapshots",
+    type=str,
+    metavar="DIR",
+    help=f"Use the latest columnar snapshot in this directory instead of {CSV_PATH}, and write the stats of every topic over all the snapshots",
+    default=None,
+)
+parser.add_argument(
+    "--cache-dir",
+    type=str,
+    help="With --snapshots, directory the Grind 75 list is cached in",
+    default=leetcode_anki.helpers.leetcode.CACHE_DIR,
+)
+args = parser.parse_args()
+
+if args.snapshots is None:
+    df = load_csv()
+else:
+    store = leetcode_anki.helpers.columnar.ColumnarStore(args.snapshots)
+    df = load_snapshot(store, args.cache_dir)
+    get_tag_stats_history(store).to_csv(
+        "global_leetcode_tag_stats_history.csv", index=False
+    )
 
 # Get total times encountered for each tag
 global_total_times_encountered_df = get_sorted_tag_total_times_encountered(df)
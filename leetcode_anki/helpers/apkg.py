@@ -0,0 +1,261 @@
+# pylint: disable=missing-module-docstring
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+import zipfile
+from typing import Any, List, Optional, Sequence, Tuple
+
+import genanki  # type: ignore
+from genanki.apkg_col import APKG_COL  # type: ignore
+from genanki.apkg_schema import APKG_SCHEMA  # type: ignore
+
+DEFAULT_BATCH_SIZE = 1000
+# zlib compression level of the package, 0 stores the collection uncompressed
+DEFAULT_COMPRESSION_LEVEL = 1
+
+# The collection is a throwaway file until it is zipped, so durability
+# guarantees are not needed while it is being written
+_PRAGMAS = (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA locking_mode = EXCLUSIVE",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",
+)
+
+_NOTE_SQL = "INSERT INTO notes VALUES(?,?,?,?,?,?,?,?,?,?,?)"
+_CARD_SQL = "INSERT INTO cards VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)"
+
+
+class ApkgWriter:
+    """
+    Writes notes of a single deck into an .apkg file as they are produced.
+
+    This is a faster alternative to `genanki.Package.write_to_file()`, which
+    needs all the notes in memory and inserts them one by one. Here rows are
+    inserted in batches with `executemany()` inside a single transaction of
+    a collection tuned for bulk writes, and the notes are not kept after
+    they are written. The rows are the same as genanki would write, including
+    the note GUIDs, so the deck is imported by Anki the same way.
+
+    The package is written by close() (atomically, so an existing file is
+    replaced only by a complete package). discard() drops everything written
+    so far. Used as a context manager, the package is written on success and
+    discarded on an exception.
+    """
+
+    def __init__(
+        self,
+        output_file: str,
+        deck: genanki.Deck,
+        models: Sequence[genanki.Model],
+        media_files: Optional[List[str]] = None,
+        timestamp: Optional[float] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+    ) -> None:
+        if batch_size < 1:
+            raise ValueError(f"Batch size must be at least 1: {batch_size}")
+
+        if not 0 <= compression_level <= 9:
+            raise ValueError(
+                f"Compression level must be between 0 and 9: {compression_level}"
+            )
+
+        self._output_file = output_file
+        self._deck = deck
+        self._models = {model.model_id: model for model in models}
+        # Media files by their name in the package
+        self._media_files = {os.path.basename(path): path for path in media_files or []}
+        self._timestamp = time.time() if timestamp is None else timestamp
+        self._batch_size = batch_size
+        self._compression_level = compression_level
+        self._ids = itertools.count(int(self._timestamp * 1000))
+        self._notes: List[Tuple[Any, ...]] = []
+        self._cards: List[Tuple[Any, ...]] = []
+        self.notes_written = 0
+
+        fd, self._db_path = tempfile.mkstemp(suffix=".anki2")
+        os.close(fd)
+        self._connection: Optional[sqlite3.Connection] = sqlite3.connect(
+            self._db_path, isolation_level=None
+        )
+        try:
+            self._create_collection()
+        except BaseException:
+            self.discard()
+            raise
+
+    def _create_collection(self) -> None:
+        connection = self._connection
+        assert connection is not None
+
+        for pragma in _PRAGMAS:
+            connection.execute(pragma)
+        connection.executescript(APKG_SCHEMA)
+        connection.executescript(APKG_COL)
+
+        deck_id = self._deck.deck_id
+        (decks_json,) = connection.execute("SELECT decks FROM col").fetchone()
+        decks = json.loads(decks_json)
+        decks[str(deck_id)] = self._deck.to_json()
+
+        (models_json,) = connection.execute("SELECT models FROM col").fetchone()
+        models = json.loads(models_json)
+        models.update(
+            {
+                str(model_id): model.to_json(self._timestamp, deck_id)
+                for model_id, model in self._models.items()
+            }
+        )
+
+        connection.execute(
+            "UPDATE col SET decks = ?, models = ?",
+            (json.dumps(decks), json.dumps(models)),
+        )
+        connection.execute("BEGIN")
+
+    def add(self, note: genanki.Note) -> None:
+        """
+        Add the note with its cards to the deck
+        """
+        if note.model.model_id not in self._models:
+            raise ValueError(f"Unknown note model: {note.model.model_id}")
+
+        if len(note.model.fields) != len(note.fields):
+            raise ValueError(
+                f"Number of fields in the model ({len(note.model.fields)}) doesn't "
+                f"match the number of fields in the note ({len(note.fields)})"
+            )
+
+        timestamp = int(self._timestamp)
+        note_id = next(self._ids)
+        self._notes.append(
+            (
+                note_id,
+                note.guid,
+                note.model.model_id,
+                timestamp,
+                -1,  # usn
+                " " + " ".join(note.tags) + " ",
+                "\x1f".join(note.fields),
+                note.sort_field,
+                0,  # csum
+                0,  # flags
+                "",  # data
+            )
+        )
+        for card in note.cards:
+            self._cards.append(
+                (
+                    next(self._ids),
+                    note_id,
+                    self._deck.deck_id,
+                    card.ord,
+                    timestamp,
+                    -1,  # usn
+                    0,  # type, new
+                    -1 if card.suspend else 0,  # queue
+                    note.due,
+                    0,  # ivl
+                    0,  # factor
+                    0,  # reps
+                    0,  # lapses
+                    0,  # left
+                    0,  # odue
+                    0,  # odid
+                    0,  # flags
+                    "",  # data
+                )
+            )
+
+        self.notes_written += 1
+        if len(self._notes) >= self._batch_size:
+            self._flush()
+
+    def add_media(self, path: str) -> None:
+        """
+        Add the media file to the package, notes refer to it by its file name
+        """
+        self._media_files.setdefault(os.path.basename(path), path)
+
+    def _flush(self) -> None:
+        connection = self._connection
+        if connection is None:
+            raise ValueError("The package has already been closed")
+
+        connection.executemany(_NOTE_SQL, self._notes)
+        connection.executemany(_CARD_SQL, self._cards)
+        self._notes.clear()
+        self._cards.clear()
+
+    def close(self) -> None:
+        """
+        Finish the collection and write the package
+        """
+        self._flush()
+        connection = self._connection
+        assert connection is not None
+        connection.execute("COMMIT")
+        connection.close()
+        self._connection = None
+
+        tmp_path = self._output_file + ".tmp"
+        try:
+            with zipfile.ZipFile(
+                tmp_path,
+                "w",
+                compression=(
+                    zipfile.ZIP_DEFLATED
+                    if self._compression_level
+                    else zipfile.ZIP_STORED
+                ),
+                compresslevel=self._compression_level or None,
+            ) as package:
+                package.write(self._db_path, "collection.anki2")
+                package.writestr(
+                    "media",
+                    json.dumps(
+                        {str(i): name for i, name in enumerate(self._media_files)}
+                    ),
+                )
+                for i, path in enumerate(self._media_files.values()):
+                    package.write(path, str(i))
+            os.replace(tmp_path, self._output_file)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        finally:
+            os.unlink(self._db_path)
+
+        logging.info("Wrote %s notes to %s", self.notes_written, self._output_file)
+
+    def discard(self) -> None:
+        """
+        Drop the collection without writing the package
+        """
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+        try:
+            os.unlink(self._db_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "ApkgWriter":
+        return self
+
+    def __exit__(self, exc_type: Any, *args: Any) -> None:
+        if self._connection is None:
+            return
+
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
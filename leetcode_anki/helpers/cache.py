@@ -0,0 +1,148 @@
+# pylint: disable=missing-module-docstring
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from typing import List, Optional, Tuple, Union
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+
+_SUFFIX = ".json"
+
+
+def atomic_write(path: str, data: Union[str, bytes]) -> None:
+    """
+    Write the text or bytes to the file atomically: readers see either the old
+    or the new content, never a partially written file
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    if isinstance(data, str):
+        data = data.encode("utf8")
+
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(data)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class DiskCache:
+    """
+    Persistent key-value cache for API responses.
+
+    Every entry is stored as a separate file named after the hash of its key.
+    Entries older than `ttl` seconds are treated as missing. When the total
+    size of the cache grows over `max_size` bytes, the oldest entries are
+    evicted.
+
+    Writes are atomic: the value is written to a temporary file first and then
+    renamed over the target, so an interrupted run never leaves a partially
+    written entry behind.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ttl: float = DEFAULT_TTL,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ) -> None:
+        if ttl < 0:
+            raise ValueError(f"TTL must be non-negative: {ttl}")
+
+        if max_size <= 0:
+            raise ValueError(f"Max size must be greater than 0: {max_size}")
+
+        self._directory = directory
+        self._ttl = ttl
+        self._max_size = max_size
+        self._size: Optional[int] = None
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf8")).hexdigest()
+        return os.path.join(self._directory, digest + _SUFFIX)
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """
+        (mtime, size, path) for every entry, oldest first
+        """
+        entries = []
+        with os.scandir(self._directory) as it:
+            for entry in it:
+                if not entry.name.endswith(_SUFFIX) or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        entries.sort()
+        return entries
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[str]:
+        """
+        Return the cached value for the key or None if it is missing or expired
+        (older than `ttl` seconds if it's set, instead of the cache TTL)
+        """
+        path = self._path(key)
+
+        try:
+            if time.time() - os.path.getmtime(path) > (
+                self._ttl if ttl is None else ttl
+            ):
+                return None
+
+            with open(path, "r", encoding="utf8") as cache_file:
+                return cache_file.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Atomically store the value under the key and evict old entries if the
+        cache is over its size limit
+        """
+        path = self._path(key)
+
+        try:
+            old_size = os.path.getsize(path)
+        except FileNotFoundError:
+            old_size = 0
+
+        atomic_write(path, value)
+
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        else:
+            self._size += os.path.getsize(path) - old_size
+
+        if self._size > self._max_size:
+            self._evict(keep=path)
+
+    def _evict(self, keep: str) -> None:
+        """
+        Remove the oldest entries until the cache fits into its size limit.
+        The entry that has just been written is never evicted.
+        """
+        entries = self._entries()
+        size = sum(size for _, size, _ in entries)
+
+        for _, entry_size, path in entries:
+            if size <= self._max_size:
+                break
+            if path == keep:
+                continue
+
+            logging.debug("Evicting cache entry %s", path)
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+        self._size = size
@@ -0,0 +1,61 @@
+# pylint: disable=missing-module-docstring
+import logging
+import os
+import shutil
+from typing import Optional
+
+from leetcode_anki.helpers.cache import atomic_write
+from leetcode_anki.helpers.manifest import content_hash
+
+CHECKPOINT_DIR = os.path.join("cache", "checkpoints")
+
+_PAGE_SUFFIX = ".json"
+
+
+class PageJournal:
+    """
+    Journal of the pages completed by a fetch, so an interrupted fetch can
+    be resumed instead of starting over.
+
+    Every completed page is written to its own file atomically, so a crash
+    leaves only complete pages behind. A journal belongs to a single fetch:
+    it lives in a directory named after the hash of `parameters` (the list,
+    range, page size, number of problems, etc.), so a fetch with different
+    parameters never reads pages of another one. Once every page has been
+    processed the journal is cleared.
+    """
+
+    def __init__(self, directory: str, *parameters: object) -> None:
+        self._directory = os.path.join(directory, content_hash(*parameters)[:32])
+        os.makedirs(self._directory, exist_ok=True)
+
+        self.resumed = sum(
+            1 for name in os.listdir(self._directory) if name.endswith(_PAGE_SUFFIX)
+        )
+        if self.resumed:
+            logging.info("Resuming the fetch, %s pages are already done", self.resumed)
+
+    def _path(self, page: int) -> str:
+        return os.path.join(self._directory, f"{page:06d}{_PAGE_SUFFIX}")
+
+    def get(self, page: int) -> Optional[str]:
+        """
+        Data of the page if it has been completed
+        """
+        try:
+            with open(self._path(page), "r", encoding="utf8") as page_file:
+                return page_file.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, page: int, data: str) -> None:
+        """
+        Record the completed page
+        """
+        atomic_write(self._path(page), data)
+
+    def clear(self) -> None:
+        """
+        Remove the journal after the fetch has finished
+        """
+        shutil.rmtree(self._directory, ignore_errors=True)
@@ -0,0 +1,264 @@
+# pylint: disable=missing-module-docstring
+import datetime
+import logging
+import os
+import shutil
+import tempfile
+from typing import Any, Iterable, List, Optional
+
+from leetcode_anki.helpers.records import ProblemRecord
+
+COLUMNAR_DIR = os.path.join("cache", "columnar")
+
+PROBLEMS_TABLE = "problems"
+COMPANY_STATS_TABLE = "company_stats"
+TABLES = (PROBLEMS_TABLE, COMPANY_STATS_TABLE)
+
+# Snapshots are named after the UTC time of the fetch, so they sort by time
+_NAME_FORMAT = "%Y%m%dT%H%M%S.%fZ"
+_TABLE_SUFFIX = ".arrow"
+
+
+def _pyarrow() -> Any:
+    """
+    The pyarrow module, an optional dependency
+    """
+    try:
+        import pyarrow  # type: ignore  # pylint: disable=import-outside-toplevel
+    except ImportError as error:
+        raise ValueError(
+            "Columnar snapshots need the pyarrow package (pip install pyarrow)"
+        ) from error
+
+    return pyarrow
+
+
+def _schemas(pa: Any) -> Any:
+    """
+    Schemas of the tables. Descriptions and hints are not stored, only what
+    the stats are computed from.
+    """
+    return {
+        PROBLEMS_TABLE: pa.schema(
+            [
+                ("slug", pa.string()),
+                ("problem_id", pa.string()),
+                ("title", pa.string()),
+                ("category", pa.string()),
+                ("difficulty", pa.string()),
+                ("paid", pa.bool_()),
+                ("likes", pa.int64()),
+                ("dislikes", pa.int64()),
+                ("submissions_total", pa.int64()),
+                ("submissions_accepted", pa.int64()),
+                ("freq_bar", pa.float64()),
+                ("total_times_encountered", pa.int64()),
+                ("topic_tags", pa.list_(pa.string())),
+                ("tags", pa.list_(pa.string())),
+                ("lists", pa.list_(pa.string())),
+            ]
+        ),
+        # Company stats of the problems normalized into a long table, one
+        # row per problem and company
+        COMPANY_STATS_TABLE: pa.schema(
+            [
+                ("slug", pa.string()),
+                ("company", pa.string()),
+                ("times_encountered", pa.int64()),
+            ]
+        ),
+    }
+
+
+class ColumnarSnapshot:
+    """
+    Writes the problems of a single fetch into a dated snapshot in
+    `directory`, with the tables in Arrow IPC files that are read back with
+    memory mapping (see ColumnarStore).
+
+    Problems are added page by page and written as record batches, so they
+    are not kept in memory. The snapshot is written to a temporary directory
+    that is renamed on close(), so a fetch that fails or is interrupted
+    never leaves a partial snapshot behind. discard() drops it. Used as a
+    context manager, the snapshot is written on success and discarded on an
+    exception.
+    """
+
+    def __init__(
+        self, directory: str, taken_at: Optional[datetime.datetime] = None
+    ) -> None:
+        pa = _pyarrow()
+        self._pa = pa
+        self._schemas = _schemas(pa)
+
+        taken_at = taken_at or datetime.datetime.now(datetime.timezone.utc)
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, taken_at.strftime(_NAME_FORMAT))
+        # Names starting with a dot are not listed as snapshots
+        self._tmp_dir = tempfile.mkdtemp(dir=directory, prefix=".")
+        self._writers: Optional[List[Any]] = [
+            pa.ipc.new_file(
+                os.path.join(self._tmp_dir, table + _TABLE_SUFFIX), self._schemas[table]
+            )
+            for table in TABLES
+        ]
+        self.problems_written = 0
+        self._written = False
+
+    def add(self, records: Iterable[ProblemRecord]) -> None:
+        """
+        Add a page of problems to the snapshot
+        """
+        if self._writers is None:
+            raise ValueError("The snapshot has already been closed")
+
+        records = list(records)
+        problems = self._pa.RecordBatch.from_pydict(
+            {
+                name: [getattr(record, name) for record in records]
+                for name in self._schemas[PROBLEMS_TABLE].names
+            },
+            schema=self._schemas[PROBLEMS_TABLE],
+        )
+        entries = [
+            (record.slug, entry) for record in records for entry in record.company_stats
+        ]
+        company_stats = self._pa.RecordBatch.from_pydict(
+            {
+                "slug": [slug for slug, _ in entries],
+                "company": [entry["slug"] for _, entry in entries],
+                "times_encountered": [
+                    entry["timesEncountered"] for _, entry in entries
+                ],
+            },
+            schema=self._schemas[COMPANY_STATS_TABLE],
+        )
+
+        problems_writer, company_stats_writer = self._writers
+        problems_writer.write_batch(problems)
+        company_stats_writer.write_batch(company_stats)
+        self.problems_written += len(records)
+
+    def close(self) -> None:
+        """
+        Finish and write the snapshot
+        """
+        writers = self._writers
+        assert writers is not None
+        self._writers = None
+
+        try:
+            for writer in writers:
+                writer.close()
+            os.replace(self._tmp_dir, self.path)
+            self._written = True
+        except BaseException:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            raise
+
+        logging.info(
+            "Saved a snapshot of %s problems to %s", self.problems_written, self.path
+        )
+
+    def discard(self) -> None:
+        """
+        Drop the snapshot without writing it, nothing happens if it's
+        already written
+        """
+        if self._written:
+            return
+
+        if self._writers is not None:
+            for writer in self._writers:
+                writer.close()
+            self._writers = None
+
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+    def __enter__(self) -> "ColumnarSnapshot":
+        return self
+
+    def __exit__(self, exc_type: Any, *args: Any) -> None:
+        if self._writers is None:
+            return
+
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class ColumnarStore:
+    """
+    Reads the snapshots written by ColumnarSnapshot into `directory`.
+
+    Tables are memory mapped rather than read: columns are used right from
+    the page cache without parsing or copying, so reading many historical
+    snapshots takes about as long as touching the columns that are used.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self._directory = directory
+
+    def snapshots(self) -> List[str]:
+        """
+        Names of the snapshots, oldest first
+        """
+        try:
+            names = os.listdir(self._directory)
+        except FileNotFoundError:
+            return []
+
+        return sorted(name for name in names if not name.startswith("."))
+
+    @staticmethod
+    def taken_at(name: str) -> datetime.datetime:
+        """
+        Time of the fetch the snapshot was taken from
+        """
+        return datetime.datetime.strptime(name, _NAME_FORMAT).replace(
+            tzinfo=datetime.timezone.utc
+        )
+
+    def read(self, table: str, name: Optional[str] = None) -> Any:
+        """
+        Table of the snapshot (the latest one by default) as a pyarrow.Table
+        """
+        if table not in TABLES:
+            raise ValueError(f"Unknown table: {table}")
+
+        pa = _pyarrow()
+        if name is None:
+            names = self.snapshots()
+            if not names:
+                raise ValueError(f"No snapshots in {self._directory}")
+            name = names[-1]
+
+        path = os.path.join(self._directory, name, table + _TABLE_SUFFIX)
+        with pa.memory_map(path) as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def history(self, table: str) -> Any:
+        """
+        Table of all the snapshots with the time of their fetch in the
+        `taken_at` column
+        """
+        pa = _pyarrow()
+        tables = []
+        for name in self.snapshots():
+            snapshot = self.read(table, name)
+            tables.append(
+                snapshot.add_column(
+                    0,
+                    pa.field("taken_at", pa.timestamp("us", tz="UTC")),
+                    pa.repeat(
+                        pa.scalar(self.taken_at(name), pa.timestamp("us", tz="UTC")),
+                        snapshot.num_rows,
+                    ),
+                )
+            )
+
+        if not tables:
+            raise ValueError(f"No snapshots in {self._directory}")
+
+        return pa.concat_tables(tables)
@@ -0,0 +1,219 @@
+# pylint: disable=missing-module-docstring
+import gzip
+import json
+import logging
+import os
+import tempfile
+from typing import IO, Any, Dict, Iterable, Optional, Union
+
+import genanki  # type: ignore
+
+from leetcode_anki.helpers.records import ProblemRecord
+
+# Compression levels of the exports, fast enough to keep up with the fetch
+GZIP_COMPRESSION_LEVEL = 6
+ZSTD_COMPRESSION_LEVEL = 3
+
+# Record fields that are only used to render the notes
+_RENDERING_FIELDS = ("difficulty_html",)
+
+
+def note_json(note: genanki.Note) -> Dict[str, Any]:
+    """
+    Note as a JSON object, fields by their names in the note model
+    """
+    return {
+        "guid": note.guid,
+        "fields": {
+            field["name"]: value for field, value in zip(note.model.fields, note.fields)
+        },
+        "tags": list(note.tags),
+        "due": note.due,
+        "suspended": any(card.suspend for card in note.cards),
+    }
+
+
+def problem_json(record: ProblemRecord, tags: Iterable[str]) -> Dict[str, Any]:
+    """
+    Problem as a JSON object with the record fields, `tags` are all the tags
+    of its note
+    """
+    problem = record._asdict()
+    for field in _RENDERING_FIELDS:
+        del problem[field]
+    problem["tags"] = list(tags)
+    return problem
+
+
+def _compressed(path: str, raw_file: IO[bytes]) -> Union[IO[bytes], gzip.GzipFile]:
+    """
+    Stream writing to `raw_file` compressed as the extension of `path` says:
+    gzip for .gz, zstd for .zst (needs the zstandard package), none otherwise
+    """
+    extension = os.path.splitext(path)[1]
+    if extension == ".gz":
+        # No file name and time in the header, so the same content is
+        # always compressed to the same bytes
+        return gzip.GzipFile(
+            filename="",
+            mode="wb",
+            compresslevel=GZIP_COMPRESSION_LEVEL,
+            fileobj=raw_file,
+            mtime=0,
+        )
+
+    if extension == ".zst":
+        try:
+            import zstandard  # type: ignore  # pylint: disable=import-outside-toplevel
+        except ImportError as error:
+            raise ValueError(
+                f"Writing {path} needs the zstandard package (pip install zstandard)"
+            ) from error
+
+        return zstandard.ZstdCompressor(level=ZSTD_COMPRESSION_LEVEL).stream_writer(
+            raw_file, closefd=False
+        )
+
+    return raw_file
+
+
+class _Export:
+    """
+    File written as it's produced, compressed by its extension.
+
+    Like leetcode_anki.helpers.apkg.ApkgWriter, nothing is kept in memory:
+    the content goes to a temporary file, which replaces the output file on
+    close(). discard() drops it. Used as a context manager, the file is
+    written on success and discarded on an exception.
+    """
+
+    def __init__(self, output_file: str) -> None:
+        self._output_file = output_file
+        fd, self._tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(output_file) or ".", suffix=".tmp"
+        )
+        self._raw_file: Optional[IO[bytes]] = os.fdopen(fd, "wb")
+        self._file: Union[IO[bytes], gzip.GzipFile] = self._raw_file
+        try:
+            self._file = _compressed(output_file, self._raw_file)
+        except BaseException:
+            self.discard()
+            raise
+
+    def _write(self, text: str) -> None:
+        if self._raw_file is None:
+            raise ValueError("The export has already been closed")
+
+        self._file.write(text.encode("utf8"))
+
+    def _finish(self) -> None:
+        """
+        Write the end of the file before it's closed
+        """
+
+    def close(self) -> None:
+        """
+        Finish and write the export
+        """
+        raw_file = self._raw_file
+        assert raw_file is not None
+
+        try:
+            self._finish()
+            self._raw_file = None
+            if self._file is not raw_file:
+                self._file.close()
+            raw_file.flush()
+            os.fsync(raw_file.fileno())
+            raw_file.close()
+            os.replace(self._tmp_path, self._output_file)
+        except BaseException:
+            self._raw_file = raw_file
+            self.discard()
+            raise
+
+    def discard(self) -> None:
+        """
+        Drop the export without writing it
+        """
+        if self._raw_file is not None:
+            if self._file is not self._raw_file:
+                # Otherwise the compressor would try to finish the stream
+                # when it's garbage collected
+                self._file.close()
+            self._raw_file.close()
+            self._raw_file = None
+
+        try:
+            os.unlink(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "_Export":
+        return self
+
+    def __exit__(self, exc_type: Any, *args: Any) -> None:
+        if self._raw_file is None:
+            return
+
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class JsonExport(_Export):
+    """
+    Writes notes into a JSON file (an array of note_json() objects) as they
+    are produced, so the deck can be used without Anki.
+    """
+
+    def __init__(self, output_file: str) -> None:
+        super().__init__(output_file)
+        self._write("[")
+        self.notes_written = 0
+
+    def add(self, note: genanki.Note) -> None:
+        """
+        Add the note to the export
+        """
+        self._write((",\n" if self.notes_written else "") + json.dumps(note_json(note)))
+        self.notes_written += 1
+
+    def _finish(self) -> None:
+        self._write("]\n")
+
+    def close(self) -> None:
+        super().close()
+        logging.info("Wrote %s notes to %s", self.notes_written, self._output_file)
+
+    def __enter__(self) -> "JsonExport":
+        return self
+
+
+class ProblemExport(_Export):
+    """
+    Writes problems into a newline-delimited JSON file (a problem_json()
+    object per line) as they are fetched, so other tools can read them one
+    by one in constant memory.
+    """
+
+    def __init__(self, output_file: str) -> None:
+        super().__init__(output_file)
+        self.problems_written = 0
+
+    def add(self, record: ProblemRecord, tags: Iterable[str]) -> None:
+        """
+        Add the problem to the export
+        """
+        self._write(json.dumps(problem_json(record, tags)) + "\n")
+        self.problems_written += 1
+
+    def close(self) -> None:
+        super().close()
+        logging.info(
+            "Wrote %s problems to %s", self.problems_written, self._output_file
+        )
+
+    def __enter__(self) -> "ProblemExport":
+        return self
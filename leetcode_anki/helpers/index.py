@@ -0,0 +1,389 @@
+# pylint: disable=missing-module-docstring
+import array
+import functools
+import operator
+import re
+from typing import Callable, Dict, Iterable, List, NoReturn, Optional, Sequence
+
+from leetcode_anki.helpers.records import ProblemRecord
+
+FILTER_FIELDS = ("topic", "company", "difficulty", "list")
+# Numeric fields compared in range filters, e.g. `likes>=1000`
+RANGE_FIELDS = (
+    "likes",
+    "dislikes",
+    "submissions_total",
+    "submissions_accepted",
+    "total_times_encountered",
+    "freq_bar",
+)
+
+_TOKEN_RE = re.compile(r"\s*(?:(\()|(\))|([^\s()]+))")
+_RANGE_RE = re.compile(r"^(\w+)(>=|<=|!=|>|<|=)(.+)$")
+_OPERATORS: Dict[str, Callable[[float, float], bool]] = {
+    ">=": operator.ge,
+    "<=": operator.le,
+    "!=": operator.ne,
+    ">": operator.gt,
+    "<": operator.lt,
+    "=": operator.eq,
+}
+
+
+def _clear_bit(bitset: bytearray, row: int) -> None:
+    byte = row >> 3
+    if byte < len(bitset):
+        bitset[byte] &= ~(1 << (row & 7)) & 0xFF
+
+
+def _gather(bitset: bytearray, rows: Sequence[int]) -> int:
+    # Bit N of the result is the bit of the Nth row
+    result = bytearray((len(rows) + 7) // 8)
+    size = len(bitset)
+    for position, row in enumerate(rows):
+        byte = row >> 3
+        if byte < size and bitset[byte] >> (row & 7) & 1:
+            result[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(result, "little")
+
+
+class ProblemIndex:
+    """
+    Columnar in-memory index over problems.
+
+    Numeric fields are stored in compact typed arrays, one per field, and
+    every row is addressed by its position. Range filters scan these arrays.
+    Topics, companies, difficulties and the paid flag are indexed with
+    bitsets (bytearrays with bit N set for row N), so adding a row costs
+    the same however big the index is. A filter turns the bitsets it uses
+    into Python ints once and is evaluated with a few bitwise operations
+    instead of a pass over all the problems. A filter over a few rows (e.g.
+    a streamed page) only reads these rows, so it costs the same however
+    big the index is.
+
+    Only metadata is indexed, problem descriptions are not kept here.
+    """
+
+    def __init__(self) -> None:
+        self._rows: Dict[str, int] = {}
+        self.slugs: List[str] = []
+        self.likes = array.array("q")
+        self.dislikes = array.array("q")
+        self.submissions_total = array.array("q")
+        self.submissions_accepted = array.array("q")
+        self.total_times_encountered = array.array("q")
+        self.freq_bar = array.array("d")
+        self._paid = bytearray()
+        self._bitmaps: Dict[str, Dict[str, bytearray]] = {
+            field: {} for field in FILTER_FIELDS
+        }
+
+    def __len__(self) -> int:
+        return len(self.slugs)
+
+    def __contains__(self, slug: object) -> bool:
+        return slug in self._rows
+
+    def add(self, record: ProblemRecord) -> None:
+        """
+        Add the problem to the index or update it if it's already there
+        """
+        row = self._rows.get(record.slug)
+
+        if row is None:
+            row = len(self.slugs)
+            self._rows[record.slug] = row
+            self.slugs.append(record.slug)
+            for column in self._columns():
+                column.append(0)
+        else:
+            # Updates are rare, the row is cleared in every bitset
+            _clear_bit(self._paid, row)
+            for bitmaps in self._bitmaps.values():
+                for bitset in bitmaps.values():
+                    _clear_bit(bitset, row)
+
+        self.likes[row] = record.likes or 0
+        self.dislikes[row] = record.dislikes or 0
+        self.submissions_total[row] = record.submissions_total
+        self.submissions_accepted[row] = record.submissions_accepted
+        self.total_times_encountered[row] = record.total_times_encountered
+        self.freq_bar[row] = record.freq_bar
+
+        bitsets = [self._bitset("difficulty", record.difficulty.lower())]
+        bitsets.extend(self._bitset("topic", topic) for topic in record.topic_tags)
+        bitsets.extend(
+            self._bitset("company", entry["slug"]) for entry in record.company_stats
+        )
+        bitsets.extend(self._bitset("list", name.lower()) for name in record.lists)
+        if record.paid:
+            bitsets.append(self._paid)
+
+        byte = row >> 3
+        bit = 1 << (row & 7)
+        for bitset in bitsets:
+            if len(bitset) <= byte:
+                bitset.extend(bytes(byte + 1 - len(bitset)))
+            bitset[byte] |= bit
+
+    @property
+    def all_rows(self) -> int:
+        """
+        Bitmap with every row of the index set
+        """
+        return (1 << len(self.slugs)) - 1
+
+    def rows_bitmap(self, rows: Optional[Sequence[int]]) -> int:
+        """
+        Bitmap with every row set, of the given rows only if `rows` is given
+        """
+        return self.all_rows if rows is None else (1 << len(rows)) - 1
+
+    def _columns(self) -> List[array.array]:
+        return [
+            self.likes,
+            self.dislikes,
+            self.submissions_total,
+            self.submissions_accepted,
+            self.total_times_encountered,
+            self.freq_bar,
+        ]
+
+    def _bitset(self, field: str, value: str) -> bytearray:
+        bitmaps = self._bitmaps[field]
+        bitset = bitmaps.get(value)
+        if bitset is None:
+            bitset = bitmaps[value] = bytearray()
+        return bitset
+
+    def bitmap(
+        self, field: str, value: str, rows: Optional[Sequence[int]] = None
+    ) -> int:
+        """
+        Rows having the value in the field.
+
+        If `rows` is given, only these rows are tested and bit N of the
+        result is set if the Nth of them has the value.
+        """
+        if field == "paid":
+            bitset = self._paid
+        elif field in self._bitmaps:
+            bitset = self._bitmaps[field].get(value.lower(), bytearray())
+        else:
+            raise ValueError(
+                f"Unknown filter field: {field} "
+                f"(expected one of: {', '.join(FILTER_FIELDS)})"
+            )
+
+        if rows is not None:
+            return _gather(bitset, rows)
+        return int.from_bytes(bitset, "little")
+
+    def compare(
+        self,
+        field: str,
+        comparison: str,
+        value: float,
+        rows: Optional[Sequence[int]] = None,
+    ) -> int:
+        """
+        Rows where the numeric field compares to the value, e.g. the rows
+        with likes >= 1000 for ("likes", ">=", 1000).
+
+        If `rows` is given, only these rows are tested, as in `bitmap()`.
+        """
+        if field not in RANGE_FIELDS:
+            raise ValueError(
+                f"Unknown range field: {field} "
+                f"(expected one of: {', '.join(RANGE_FIELDS)})"
+            )
+
+        compare = _OPERATORS[comparison]
+        column = getattr(self, field)
+        if rows is None:
+            rows = range(len(self.slugs))
+        bitset = bytearray((len(rows) + 7) // 8)
+        for position, row in enumerate(rows):
+            if compare(column[row], value):
+                bitset[position >> 3] |= 1 << (position & 7)
+
+        return int.from_bytes(bitset, "little")
+
+    def select(
+        self, expression: str, problem_slugs: Optional[Iterable[str]] = None
+    ) -> List[str]:
+        """
+        Slugs of the problems matching the filter expression, in index order.
+
+        If `problem_slugs` is given, only these problems are considered and
+        the result keeps their order. Only their rows are read, so selecting
+        from a page of problems doesn't depend on the size of the index.
+        """
+        if problem_slugs is None:
+            slugs = self.slugs
+            matching = parse_filter(expression)(self, None)
+        else:
+            slugs = [slug for slug in problem_slugs if slug in self._rows]
+            matching = parse_filter(expression)(
+                self, [self._rows[slug] for slug in slugs]
+            )
+
+        # Testing a bit of a big int is O(size of the int), so the bitmap is
+        # converted to bytes once and every row is tested in O(1)
+        bits = matching.to_bytes((len(slugs) + 7) // 8, "little")
+        return [
+            slug
+            for position, slug in enumerate(slugs)
+            if bits[position >> 3] >> (position & 7) & 1
+        ]
+
+
+# Bitmap of the matching rows, of the given rows only if there are any
+_Filter = Callable[[ProblemIndex, Optional[Sequence[int]]], int]
+
+
+class _FilterParser:
+    """
+    Recursive descent parser for filter expressions like
+    `company:google AND difficulty:medium AND NOT paid`.
+
+    Grammar (keywords are case-insensitive, NOT binds tighter than AND,
+    which binds tighter than OR):
+
+        expression := term ("OR" term)*
+        term       := factor ("AND" factor)*
+        factor     := "NOT" factor | "(" expression ")" | "paid" | field:value
+                    | field comparison number
+        comparison := ">=" | "<=" | "!=" | ">" | "<" | "="
+    """
+
+    def __init__(self, expression: str) -> None:
+        self._expression = expression
+        self._tokens: List[str] = []
+        position = 0
+        expression = expression.rstrip()
+        while position < len(expression):
+            match = _TOKEN_RE.match(expression, position)
+            if match is None:
+                raise ValueError(f"Invalid filter expression: {self._expression}")
+            self._tokens.append(match.group(match.lastindex or 0))
+            position = match.end()
+        self._position = 0
+
+    def parse(self) -> _Filter:
+        if not self._tokens:
+            raise ValueError("Empty filter expression")
+
+        result = self._parse_expression()
+        if self._position != len(self._tokens):
+            self._fail(f"unexpected {self._tokens[self._position]!r}")
+
+        return result
+
+    def _fail(self, message: str) -> NoReturn:
+        raise ValueError(f"Invalid filter expression {self._expression!r}: {message}")
+
+    def _peek(self) -> Optional[str]:
+        if self._position < len(self._tokens):
+            return self._tokens[self._position]
+        return None
+
+    def _accept(self, keyword: str) -> bool:
+        token = self._peek()
+        if token is not None and token.upper() == keyword:
+            self._position += 1
+            return True
+        return False
+
+    def _parse_expression(self) -> _Filter:
+        terms = [self._parse_term()]
+        while self._accept("OR"):
+            terms.append(self._parse_term())
+
+        if len(terms) == 1:
+            return terms[0]
+
+        def union(index: ProblemIndex, rows: Optional[Sequence[int]]) -> int:
+            result = 0
+            for term in terms:
+                result |= term(index, rows)
+            return result
+
+        return union
+
+    def _parse_term(self) -> _Filter:
+        factors = [self._parse_factor()]
+        while self._accept("AND"):
+            factors.append(self._parse_factor())
+
+        if len(factors) == 1:
+            return factors[0]
+
+        def intersection(index: ProblemIndex, rows: Optional[Sequence[int]]) -> int:
+            result = index.rows_bitmap(rows)
+            for factor in factors:
+                result &= factor(index, rows)
+            return result
+
+        return intersection
+
+    def _parse_factor(self) -> _Filter:
+        if self._accept("NOT"):
+            factor = self._parse_factor()
+            return lambda index, rows: index.rows_bitmap(rows) & ~factor(index, rows)
+
+        if self._accept("("):
+            expression = self._parse_expression()
+            if not self._accept(")"):
+                self._fail("missing ')'")
+            return expression
+
+        token = self._peek()
+        if token is None or token == ")" or token.upper() in ("AND", "OR"):
+            self._fail("expected a filter")
+        self._position += 1
+
+        if token.lower() == "paid":
+            return lambda index, rows: index.bitmap("paid", "", rows)
+
+        comparison = _RANGE_RE.match(token)
+        if comparison is not None:
+            return self._range_filter(token, *comparison.groups())
+
+        field, separator, value = token.partition(":")
+        if not separator or not value:
+            self._fail(f"expected field:value, got {token!r}")
+
+        field = field.lower()
+        if field not in FILTER_FIELDS:
+            self._fail(
+                f"unknown field {field!r} (expected one of: {', '.join(FILTER_FIELDS)})"
+            )
+
+        return lambda index, rows: index.bitmap(field, value, rows)
+
+    def _range_filter(
+        self, token: str, field: str, comparison: str, value: str
+    ) -> _Filter:
+        field = field.lower()
+        if field not in RANGE_FIELDS:
+            self._fail(
+                f"unknown range field {field!r} "
+                f"(expected one of: {', '.join(RANGE_FIELDS)})"
+            )
+
+        try:
+            number = float(value)
+        except ValueError:
+            self._fail(f"expected a number, got {token!r}")
+
+        return lambda index, rows: index.compare(field, comparison, number, rows)
+
+
+@functools.lru_cache(maxsize=32)
+def parse_filter(expression: str) -> _Filter:
+    """
+    Parse the filter expression into a function returning the bitmap of
+    matching rows of an index, or of the given rows of it
+    """
+    return _FilterParser(expression).parse()
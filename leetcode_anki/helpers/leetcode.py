@@ -1,84 +1,399 @@
 # pylint: disable=missing-module-docstring
+import asyncio
+import collections
+import email.utils
 import functools
+import hashlib
+import itertools
 import json
 import logging
 import math
 import os
+import random
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import cached_property
-from typing import Any, Callable, Dict, List, Tuple, Type, TypeVar
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    overload,
+)
 
 # https://github.com/prius/python-leetcode
 import leetcode.api.default_api  # type: ignore
 import leetcode.api_client  # type: ignore
-import leetcode.auth  # type: ignore
 import leetcode.configuration  # type: ignore
 import leetcode.models.graphql_query  # type: ignore
 import leetcode.models.graphql_query_get_question_detail_variables  # type: ignore
 import leetcode.models.graphql_query_problemset_question_list_variables  # type: ignore
 import leetcode.models.graphql_query_problemset_question_list_variables_filter_input  # type: ignore
 import leetcode.models.graphql_question_detail  # type: ignore
+import leetcode.rest  # type: ignore
 import urllib3  # type: ignore
 from tqdm import tqdm  # type: ignore
 
-CACHE_DIR = "cache"
-
+from leetcode_anki.helpers.cache import DEFAULT_TTL, DiskCache
+from leetcode_anki.helpers.checkpoint import PageJournal
+from leetcode_anki.helpers.columnar import ColumnarSnapshot
+from leetcode_anki.helpers.index import ProblemIndex
+from leetcode_anki.helpers.manifest import content_hash
+from leetcode_anki.helpers.query import (
+    ALL_FIELDS,
+    DETAIL_FIELDS,
+    normalize_selection,
+    problemset_query,
+    questions_query,
+)
+from leetcode_anki.helpers.ratelimit import DEFAULT_RATE, TokenBucket
+from leetcode_anki.helpers.records import ProblemRecord, to_record, with_lists
+from leetcode_anki.helpers.session import (
+    ACCEPT_ENCODING,
+    forget_csrf_token,
+    get_csrf_token,
+)
+from leetcode_anki.helpers.transport import (
+    RecordingRESTClient,
+    ReplayRESTClient,
+    SnapshotStore,
+)
 
-def _get_leetcode_api_client() -> leetcode.api.default_api.DefaultApi:
+CACHE_DIR = "cache"
+DEFAULT_CONCURRENCY = 4
+# How many fetched pages may wait for the consumer of a stream
+DEFAULT_QUEUE_SIZE = 2
+# (connect, read) timeouts for a single API request in seconds
+REQUEST_TIMEOUT = (10, 120)
+# Details of a problem are refetched this often (in seconds) even if the
+# listed problem hasn't changed, unless the cache TTL is longer
+DETAIL_TTL = 7 * 24 * 60 * 60
+# Problems whose details are requested at once with a two-phase fetch
+DEFAULT_BATCH_SIZE = 25
+# How many times a single problem request may time out before giving up
+MAX_TIMEOUTS = 5
+# Fields requested for the membership of a list when several lists are fetched
+_MEMBER_SELECTION = ("titleSlug",)
+
+
+def _get_leetcode_api_client(
+    record_dir: Optional[str] = None,
+    replay_dir: Optional[str] = None,
+    pool_size: int = DEFAULT_CONCURRENCY,
+    cache_dir: Optional[str] = None,
+) -> leetcode.api.default_api.DefaultApi:
     """
     Leetcode API instance constructor.
 
     This is a singleton, because we don't need to create a separate client
-    each time
+    each time.
+
+    If `record_dir` is set, every response is recorded to a snapshot in this
+    directory. If `replay_dir` is set, responses are served from a snapshot
+    and the network (including authentication) isn't used at all.
+
+    The client keeps up to `pool_size` connections alive, one per thread
+    sending requests, and asks for compressed responses. The CSRF token of
+    the session is cached in `cache_dir` if it's set.
     """
 
     configuration = leetcode.configuration.Configuration()
 
-    session_id = os.environ["LEETCODE_SESSION_ID"]
-    csrf_token = leetcode.auth.get_csrf_cookie(session_id)
+    if replay_dir is not None:
+        session_id = os.environ.get("LEETCODE_SESSION_ID", "")
+        csrf_token = ""
+    else:
+        session_id = os.environ["LEETCODE_SESSION_ID"]
+        csrf_token = get_csrf_token(session_id, cache_dir)
 
     configuration.api_key["x-csrftoken"] = csrf_token
     configuration.api_key["csrftoken"] = csrf_token
     configuration.api_key["LEETCODE_SESSION"] = session_id
     configuration.api_key["Referer"] = "https://leetcode.com"
     configuration.debug = False
-    api_instance = leetcode.api.default_api.DefaultApi(
-        leetcode.api_client.ApiClient(configuration)
-    )
+    # Connections beyond the pool size would be closed after every request
+    configuration.connection_pool_maxsize = pool_size
+    api_client = leetcode.api_client.ApiClient(configuration)
+    api_client.set_default_header("Accept-Encoding", ACCEPT_ENCODING)
+
+    if replay_dir is not None:
+        api_client.rest_client = ReplayRESTClient(SnapshotStore(replay_dir))
+    elif record_dir is not None:
+        api_client.rest_client = RecordingRESTClient(
+            api_client.rest_client, SnapshotStore(record_dir)
+        )
+
+    api_instance = leetcode.api.default_api.DefaultApi(api_client)
 
     return api_instance
 
 
+class _CachedResponse:
+    """
+    Minimal stand-in for a REST response, so cached JSON can be deserialized
+    by the API client the same way as a live response
+    """
+
+    def __init__(self, data: str) -> None:
+        self.data = data
+
+
+@functools.lru_cache(maxsize=None)
+def _get_model_codec() -> leetcode.api_client.ApiClient:
+    """
+    API client used only to convert models to JSON and back.
+
+    It is never used to send requests, so it doesn't need credentials and
+    doesn't touch the network.
+    """
+    return leetcode.api_client.ApiClient()
+
+
+def _dump_questions(
+    questions: List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail],
+) -> str:
+    return json.dumps(_get_model_codec().sanitize_for_serialization(questions))
+
+
+def _load_questions(
+    data: str,
+) -> List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]:
+    return _get_model_codec().deserialize(
+        _CachedResponse(data), "list[GraphqlQuestionDetail]"
+    )
+
+
 _T = TypeVar("_T")
 
+# Fields of a problem record taken from the listing in a two-phase fetch
+_COUNTER_FIELDS = (
+    "likes",
+    "dislikes",
+    "submissions_total",
+    "submissions_accepted",
+    "freq_bar",
+)
+
+
+class _BatchError(ValueError):
+    """
+    The API didn't return details for some problems of a batch
+    """
+
+
+def _detail_marker(record: ProblemRecord) -> str:
+    """
+    Hash of the listed problem without its counters, which change all the
+    time. Cached details are only used for the same marker.
+    """
+    return content_hash(
+        *(
+            value
+            for name, value in record._asdict().items()
+            if name not in _COUNTER_FIELDS
+        )
+    )
+
+
+def _field_indices(fields: Sequence[str]) -> List[int]:
+    """
+    Positions of the named fields in a ProblemRecord
+    """
+    unknown = [field for field in fields if field not in ProblemRecord._fields]
+    if unknown:
+        raise ValueError(
+            f"Unknown record fields: {', '.join(unknown)} "
+            f"(expected some of: {', '.join(ProblemRecord._fields)})"
+        )
+    return [ProblemRecord._fields.index(field) for field in fields]
+
+
+def _graphql_post_raw(
+    api_instance: leetcode.api.default_api.DefaultApi,
+    body: leetcode.models.graphql_query.GraphqlQuery,
+) -> Dict[str, Any]:
+    """
+    Same request as `api_instance.graphql_post()`, but the response JSON is
+    returned as is. The generated models drop everything they don't know,
+    e.g. aliased fields.
+    """
+    api_client = api_instance.api_client
+    return api_client.call_api(
+        "/graphql",
+        "POST",
+        {},
+        [],
+        {"Accept": "application/json", "Content-Type": "application/json"},
+        body=body,
+        post_params=[],
+        files={},
+        response_type="object",
+        auth_settings=["cookieCSRF", "cookieSession", "headerCSRF", "referer"],
+        _return_http_data_only=True,
+        _preload_content=True,
+        _request_timeout=REQUEST_TIMEOUT,
+        collection_formats={},
+    )
+
+
+# HTTP statuses worth retrying: rate limiting and temporary server errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503})
+# HTTP statuses meaning the server gave up on a request that was too heavy
+TIMEOUT_STATUSES = frozenset({408, 504})
+# HTTP statuses meaning the server refused the credentials, e.g. an expired
+# CSRF token
+AUTH_STATUSES = frozenset({401, 403})
+TIMEOUT_EXCEPTIONS = (
+    urllib3.exceptions.TimeoutError,
+    urllib3.exceptions.ProtocolError,
+)
+TRANSIENT_EXCEPTIONS = (
+    leetcode.rest.ApiException,
+    urllib3.exceptions.MaxRetryError,
+) + TIMEOUT_EXCEPTIONS
+
+
+def _is_timeout(exc: BaseException) -> bool:
+    """
+    Whether the request failed because it took the server too long to answer
+    """
+    if isinstance(exc, leetcode.rest.ApiException):
+        return exc.status in TIMEOUT_STATUSES
+
+    return isinstance(exc, TIMEOUT_EXCEPTIONS)
+
+
+def _is_transient(exc: BaseException) -> bool:
+    """
+    Whether the request may succeed if it is sent again later. Client errors,
+    like a bad query or an expired session, are not transient.
+    """
+    if isinstance(exc, leetcode.rest.ApiException):
+        return exc.status in RETRY_STATUSES or exc.status in TIMEOUT_STATUSES
+
+    return True
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    """
+    Delay requested by the server with the Retry-After header (in seconds or
+    as an HTTP date), if any
+    """
+    headers = getattr(exc, "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def backoff_delay(
+    attempt: int, delay: float, max_delay: float, exc: Optional[BaseException] = None
+) -> float:
+    """
+    Delay before retry number `attempt` (starting from 0).
+
+    Grows exponentially from `delay` up to `max_delay`, with a random jitter
+    so that concurrent clients don't retry in lockstep. A Retry-After header
+    sent by the server takes precedence if it asks to wait longer.
+    """
+    exponential = min(max_delay, delay * 2**attempt)
+    jittered = exponential / 2 + random.uniform(0, exponential / 2)
+
+    retry_after = _retry_after(exc) if exc is not None else None
+    if retry_after is not None:
+        return max(jittered, retry_after)
+
+    return jittered
+
 
 class _RetryDecorator:
     _times: int
-    _exceptions: Tuple[Type[Exception]]
+    _exceptions: Tuple[Type[Exception], ...]
     _delay: float
+    _max_delay: float
+    _retry_if: Callable[[BaseException], bool]
 
     def __init__(
-        self, times: int, exceptions: Tuple[Type[Exception]], delay: float
+        self,
+        times: int,
+        exceptions: Tuple[Type[Exception], ...],
+        delay: float,
+        max_delay: float,
+        retry_if: Callable[[BaseException], bool],
     ) -> None:
         self._times = times
         self._exceptions = exceptions
         self._delay = delay
+        self._max_delay = max_delay
+        self._retry_if = retry_if
 
     def __call__(self, func: Callable[..., _T]) -> Callable[..., _T]:
         times: int = self._times
-        exceptions: Tuple[Type[Exception]] = self._exceptions
+        exceptions: Tuple[Type[Exception], ...] = self._exceptions
         delay: float = self._delay
+        max_delay: float = self._max_delay
+        retry_if: Callable[[BaseException], bool] = self._retry_if
+
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                for attempt in range(times - 1):
+                    try:
+                        return await func(*args, **kwargs)
+                    except exceptions as exc:
+                        if not retry_if(exc):
+                            raise
+                        logging.exception(
+                            "Exception occured, try %s/%s", attempt + 1, times
+                        )
+                        await asyncio.sleep(
+                            backoff_delay(attempt, delay, max_delay, exc)
+                        )
+
+                logging.error("Last try")
+                return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore  # pyre-ignore[7]
 
         @functools.wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> _T:
             for attempt in range(times - 1):
                 try:
                     return func(*args, **kwargs)
-                except exceptions:
+                except exceptions as exc:
+                    if not retry_if(exc):
+                        raise
                     logging.exception(
                         "Exception occured, try %s/%s", attempt + 1, times
                     )
-                    time.sleep(delay)
+                    time.sleep(backoff_delay(attempt, delay, max_delay, exc))
 
             logging.error("Last try")
             return func(*args, **kwargs)
@@ -87,30 +402,132 @@ class _RetryDecorator:
 
 
 def retry(
-    times: int, exceptions: Tuple[Type[Exception]], delay: float
+    times: int,
+    exceptions: Tuple[Type[Exception], ...],
+    delay: float,
+    max_delay: float = 60,
+    retry_if: Callable[[BaseException], bool] = lambda exc: True,
 ) -> _RetryDecorator:
     """
     Retry Decorator
     Retries the wrapped function/method `times` times if the exceptions listed
-    in `exceptions` are thrown
+    in `exceptions` are thrown and `retry_if` accepts them.
+
+    Waits between tries grow exponentially from `delay` up to `max_delay` and
+    honor Retry-After. Coroutine functions are awaited and wait with
+    asyncio.sleep, so they don't block the event loop.
     """
 
-    return _RetryDecorator(times, exceptions, delay)
+    return _RetryDecorator(times, exceptions, delay, max_delay, retry_if)
+
+
+class _AdaptivePageSize:
+    """
+    Page (or batch) size shared by all the threads fetching problems.
+
+    Starts at the maximum. Every timeout halves it, and after `grow_after`
+    successful requests in a row it doubles again, up to the maximum. This way
+    pages stay as large as the API can handle at the moment.
+    """
+
+    def __init__(
+        self, maximum: int, grow_after: int = 3, name: str = "page size"
+    ) -> None:
+        self._name = name
+        self._maximum = maximum
+        self._grow_after = grow_after
+        self._size = maximum
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def success(self) -> None:
+        with self._lock:
+            self._successes += 1
+            if self._successes >= self._grow_after and self._size < self._maximum:
+                self._size = min(self._maximum, self._size * 2)
+                self._successes = 0
+                logging.info("Increasing %s to %s", self._name, self._size)
+
+    def timeout(self, size: int) -> None:
+        """
+        Report a timeout of a request for `size` problems
+        """
+        with self._lock:
+            self._successes = 0
+            # Concurrent requests may time out at the same time, shrink once
+            if size <= self._size:
+                self._size = max(1, size // 2)
+                logging.info("Decreasing %s to %s", self._name, self._size)
 
 
 class LeetcodeData:
     """
     Retrieves and caches the data for problems, acquired from the leetcode API.
 
-    This data can be later accessed using provided methods with corresponding
-    names.
+    The data of many problems is read at once with records() or columns().
+    The methods named after single fields (title(), likes(), ...) read one
+    field of one problem and are kept for compatibility.
     """
 
     def __init__(
-        self, start: int, stop: int, page_size: int = 1000, list_id: str = ""
+        self,
+        start: int,
+        stop: int,
+        page_size: int = 1000,
+        list_id: Union[str, Sequence[str]] = "",
+        cache_dir: Optional[str] = None,
+        cache_ttl: float = DEFAULT_TTL,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        rate: float = DEFAULT_RATE,
+        record_dir: Optional[str] = None,
+        replay_dir: Optional[str] = None,
+        selection: Sequence[str] = ALL_FIELDS,
+        two_phase: bool = False,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        checkpoint_dir: Optional[str] = None,
+        columnar_dir: Optional[str] = None,
     ) -> None:
         """
-        Initialize leetcode API and disk cache for API responses
+        Initialize leetcode API and disk cache for API responses.
+
+        API responses are cached on disk only if `cache_dir` is set.
+
+        `list_id` is a list of problems (the empty id is all problems) or
+        several of them. The membership of several lists is fetched
+        concurrently first, then every problem in any of them is fetched
+        once by its slug, so the number of requests depends on the number
+        of unique problems. Problems are ordered as in the first list they
+        appear in, the lists are given in the order, and their records tell
+        which of the lists they belong to.
+
+        Up to `concurrency` pages are fetched at the same time, while all the
+        requests together are limited to `rate` requests per second.
+
+        With `record_dir` every API response is recorded to a snapshot, with
+        `replay_dir` the responses are served from a recorded snapshot
+        without any network access or rate limiting. The disk cache isn't
+        used in either case, so that every request goes through the snapshot.
+
+        Only the problem fields in `selection` (GraphQL field names, see
+        leetcode_anki.helpers.query) are requested, the rest are None.
+
+        With `two_phase`, pages list only the light fields of the problems,
+        and the heavy ones (descriptions and hints) are requested problem by
+        problem with fetch_details(), e.g. only for the problems that passed
+        the filters. Details of up to `batch_size` problems are requested
+        at once.
+
+        If `checkpoint_dir` is set, every fetched page is recorded in a
+        journal there, and an interrupted fetch with the same parameters
+        resumes from the pages that are still missing.
+
+        If `columnar_dir` is set, every complete fetch of the problems is
+        saved there as a dated columnar snapshot (see
+        leetcode_anki.helpers.columnar), e.g. for the stats over time.
         """
         if start < 0:
             raise ValueError(f"Start must be non-negative: {start}")
@@ -124,29 +541,200 @@ class LeetcodeData:
         if start > stop:
             raise ValueError(f"Start (){start}) must be not greater than stop ({stop})")
 
+        if concurrency < 1:
+            raise ValueError(f"Concurrency must be at least 1: {concurrency}")
+
+        if batch_size < 1:
+            raise ValueError(f"Batch size must be at least 1: {batch_size}")
+
+        list_ids = (
+            (list_id,) if isinstance(list_id, str) else tuple(dict.fromkeys(list_id))
+        )
+        if not list_ids:
+            raise ValueError("At least one list id is required")
+
+        if record_dir is not None and replay_dir is not None:
+            raise ValueError("Can't record and replay a snapshot at the same time")
+
         self._start = start
         self._stop = stop
         self._page_size = page_size
-        self._list_id = list_id
+        self._list_ids = list_ids
+        self._list_id = list_ids[0]
+        # Lists of every problem when several lists are fetched, in the order
+        # the problems are fetched
+        self._members: Optional[Dict[str, Tuple[str, ...]]] = None
+        self._member_slugs: List[str] = []
+        self._disk_cache: Optional[DiskCache] = (
+            DiskCache(cache_dir, cache_ttl)
+            if cache_dir and record_dir is None and replay_dir is None
+            else None
+        )
+        self._detail_ttl = max(cache_ttl, DETAIL_TTL)
+        self._cache_dir = cache_dir
+        self._checkpoint_dir = (
+            checkpoint_dir if record_dir is None and replay_dir is None else None
+        )
+        self._columnar_dir = columnar_dir
+        self._concurrency = concurrency
+        self._rate_limiter: Optional[TokenBucket] = (
+            None if replay_dir is not None else TokenBucket(rate)
+        )
+        self._record_dir = record_dir
+        self._replay_dir = replay_dir
+        self._selection = normalize_selection(selection)
+        # Fields requested by the pages, the rest are requested by
+        # fetch_details() in the second phase
+        self._page_selection = (
+            normalize_selection(set(self._selection) - DETAIL_FIELDS)
+            if two_phase
+            else self._selection
+        )
+        # Problems of the two-phase fetch that already have their details
+        self._detailed: Set[str] = set()
+        self._page_sizer = _AdaptivePageSize(page_size)
+        self._batch_sizer = _AdaptivePageSize(batch_size, name="batch size")
+        # Page being processed by stream_problems_handles() consumer
+        self._window: Dict[str, ProblemRecord] = {}
+        # Metadata of every problem seen, either fetched at once or streamed
+        self._index = ProblemIndex()
+        # Hash of the problems of the last complete stream that hashed them
+        self._snapshot_hash: Optional[str] = None
+        self._api_instance_lock = threading.Lock()
+        self._api_instance_singleton: Optional[leetcode.api.default_api.DefaultApi] = (
+            None
+        )
 
-    @cached_property
+    @property
     def _api_instance(self) -> leetcode.api.default_api.DefaultApi:
-        return _get_leetcode_api_client()
-
-    @cached_property
-    def _cache(
-        self,
-    ) -> Dict[str, leetcode.models.graphql_question_detail.GraphqlQuestionDetail]:
         """
-        Cached method to return dict (problem_slug -> question details)
+        API client, created on first use. Pages are fetched from several
+        threads, so the creation is guarded by a lock to authenticate once.
         """
-        problems = self._get_problems_data()
-        return {problem.title_slug: problem for problem in problems}
+        with self._api_instance_lock:
+            api_instance = self._api_instance_singleton
+            if api_instance is None:
+                api_instance = _get_leetcode_api_client(
+                    self._record_dir,
+                    self._replay_dir,
+                    # Pages and details may be fetched at the same time
+                    2 * self._concurrency,
+                    self._cache_dir,
+                )
+                self._api_instance_singleton = api_instance
+
+            return api_instance
+
+    def _reauthenticate(self, refused: leetcode.api.default_api.DefaultApi) -> None:
+        """
+        Drop the API client whose credentials were refused, and its cached
+        CSRF token, so the next request authenticates again. Other threads
+        may have done it already for the same client.
+        """
+        with self._api_instance_lock:
+            if self._api_instance_singleton is not refused:
+                return
+
+            if self._cache_dir is not None:
+                forget_csrf_token(os.environ["LEETCODE_SESSION_ID"], self._cache_dir)
+            self._api_instance_singleton = None
 
-    @retry(times=3, exceptions=(urllib3.exceptions.ProtocolError,), delay=5)
-    def _get_problems_count(self) -> int:
+    def _send(self, request: Callable[[leetcode.api.default_api.DefaultApi], _T]) -> _T:
+        """
+        Send the request with the API client. If the server refuses the
+        credentials (HTTP 401 or 403), the cached CSRF token may be stale:
+        it's dropped and the request is sent once more with a new one.
+        """
         api_instance = self._api_instance
+        try:
+            return request(api_instance)
+        except leetcode.rest.ApiException as exc:
+            if exc.status not in AUTH_STATUSES or self._replay_dir is not None:
+                raise
+            logging.warning(
+                "Credentials refused (HTTP %s), getting a new CSRF token", exc.status
+            )
+
+        self._reauthenticate(api_instance)
+        return request(self._api_instance)
 
+    def refresh(self) -> None:
+        """
+        Forget the problems fetched so far, so they are fetched again (from
+        the disk cache, unless it's older than its TTL), e.g. to rebuild a
+        deck periodically in a long-running process. The authenticated API
+        client, the rate limiter and the adaptive page sizes are kept.
+        """
+        self.__dict__.pop("_cache", None)
+        self._window = {}
+        self._index = ProblemIndex()
+        self._detailed.clear()
+        self._snapshot_hash = None
+        self._members = None
+        self._member_slugs = []
+
+    def _throttle(self) -> None:
+        """
+        Wait before a request to stay under the API rate limit
+        """
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire()  # Leetcode has a rate limiter
+
+    def _new_snapshot(self) -> Optional[ColumnarSnapshot]:
+        """
+        Columnar snapshot of the fetch, if they are saved
+        """
+        if self._columnar_dir is None:
+            return None
+        return ColumnarSnapshot(self._columnar_dir)
+
+    @cached_property
+    def _cache(self) -> Dict[str, ProblemRecord]:
+        """
+        Cached method to return dict (problem_slug -> problem record)
+        """
+        snapshot = self._new_snapshot()
+        try:
+            records = [
+                self._to_record(problem) for problem in self._get_problems_data()
+            ]
+            if snapshot is not None:
+                snapshot.add(records)
+                snapshot.close()
+        finally:
+            if snapshot is not None:
+                snapshot.discard()
+
+        for record in records:
+            self._index.add(record)
+        return {record.slug: record for record in records}
+
+    def _to_record(
+        self, question: leetcode.models.graphql_question_detail.GraphqlQuestionDetail
+    ) -> ProblemRecord:
+        record = to_record(question)
+        if self._members is None:
+            return record
+        return with_lists(record, self._members.get(record.slug, ()))
+
+    def _get_problems_count(self, list_id: Optional[str] = None) -> int:
+        list_id = self._list_id if list_id is None else list_id
+
+        disk_cache = self._disk_cache
+        if disk_cache is None:
+            return self._fetch_problems_count(list_id)
+
+        key = f"count:{list_id}"
+        cached = disk_cache.get(key)
+        if cached is not None:
+            return int(cached)
+
+        count = self._fetch_problems_count(list_id)
+        disk_cache.set(key, str(count))
+        return count
+
+    @retry(times=3, exceptions=TRANSIENT_EXCEPTIONS, delay=5, retry_if=_is_transient)
+    def _fetch_problems_count(self, list_id: str) -> int:
         graphql_request = leetcode.models.graphql_query.GraphqlQuery(
             query="""
             query problemsetQuestionList($categorySlug: String, $limit: Int, $skip: Int, $filters: QuestionListFilterInput) {
@@ -166,7 +754,7 @@ class LeetcodeData:
                 skip=0,
                 filters=leetcode.models.graphql_query_problemset_question_list_variables_filter_input.GraphqlQueryProblemsetQuestionListVariablesFilterInput(
                     tags=[],
-                    list_id=self._list_id
+                    list_id=list_id,
                     # difficulty="MEDIUM",
                     # status="NOT_STARTED",
                     # list_id="7p5x763",  # Top Amazon Questions
@@ -176,96 +764,488 @@ class LeetcodeData:
             operation_name="problemsetQuestionList",
         )
 
-        time.sleep(2)  # Leetcode has a rate limiter
-        data = api_instance.graphql_post(body=graphql_request).data
+        self._throttle()
+        data = self._send(
+            lambda api_instance: api_instance.graphql_post(
+                body=graphql_request, _request_timeout=REQUEST_TIMEOUT
+            )
+        ).data
 
         return data.problemset_question_list.total_num or 0
 
-    @retry(times=3, exceptions=(urllib3.exceptions.ProtocolError,), delay=5)
+    def _get_checkpointed_page(
+        self, offset: int, page_size: int, page: int, journal: Optional[PageJournal]
+    ) -> List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]:
+        """
+        Page from the journal of the interrupted fetch, or fetched and
+        recorded in the journal
+        """
+        if journal is None:
+            return self._get_problems_data_page(offset, page_size, page)
+
+        completed = journal.get(page)
+        if completed is not None:
+            return _load_questions(completed)
+
+        data = self._get_problems_data_page(offset, page_size, page)
+        journal.put(page, _dump_questions(data))
+        return data
+
+    def _get_list_slugs(self, list_id: str) -> List[str]:
+        """
+        Slugs of all the problems in the list, in order
+        """
+        disk_cache = self._disk_cache
+        key = f"members:{list_id}"
+        if disk_cache is not None:
+            cached = disk_cache.get(key)
+            if cached is not None:
+                return json.loads(cached)
+
+        count = self._get_problems_count(list_id)
+        slugs = [
+            problem.title_slug
+            for problem in self._fetch_problems_range(
+                0, count, list_id, _MEMBER_SELECTION
+            )
+        ]
+
+        if disk_cache is not None:
+            disk_cache.set(key, json.dumps(slugs))
+        return slugs
+
+    def _get_members(self) -> Dict[str, Tuple[str, ...]]:
+        """
+        Lists of every problem in any of the lists, fetching the lists
+        concurrently. Only the slugs are fetched here.
+        """
+        with ThreadPoolExecutor(max_workers=self._concurrency) as executor:
+            lists = list(executor.map(self._get_list_slugs, self._list_ids))
+
+        return self._merge_members(lists)
+
+    def _merge_members(self, lists: List[List[str]]) -> Dict[str, Tuple[str, ...]]:
+        """
+        Lists of every problem, from the slugs of every list
+        """
+        members: Dict[str, List[str]] = {}
+        for list_id, slugs in zip(self._list_ids, lists):
+            for slug in slugs:
+                members.setdefault(slug, []).append(list_id)
+
+        logging.info(
+            "%s unique problems in %s lists of %s problems",
+            len(members),
+            len(lists),
+            sum(len(slugs) for slugs in lists),
+        )
+        return {slug: tuple(list_ids) for slug, list_ids in members.items()}
+
+    def _get_questions(
+        self, problem_slugs: Sequence[str]
+    ) -> List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]:
+        """
+        Problems by their slugs. The disk cache keeps every problem once,
+        no matter how many lists it's in, and only the missing ones are
+        fetched.
+        """
+        disk_cache = self._disk_cache
+        questions: Dict[
+            str, leetcode.models.graphql_question_detail.GraphqlQuestionDetail
+        ] = {}
+
+        if disk_cache is not None:
+            for slug in problem_slugs:
+                cached = disk_cache.get(self._problem_key(slug))
+                if cached is not None:
+                    questions[slug] = _load_questions(cached)[0]
+
+        missing = [slug for slug in problem_slugs if slug not in questions]
+        for slug, question in zip(
+            missing, self._fetch_questions(missing, self._page_selection)
+        ):
+            # Problems the API has no data for are left out of the page
+            if question is None:
+                continue
+            questions[slug] = question
+            if disk_cache is not None:
+                disk_cache.set(self._problem_key(slug), _dump_questions([question]))
+
+        return [questions[slug] for slug in problem_slugs if slug in questions]
+
+    def _page_key(self, skip: int, page_size: int) -> str:
+        fields = ",".join(self._page_selection)
+        return f"page:{self._list_id}:{skip}:{page_size}:{fields}"
+
+    def _problem_key(self, problem_slug: str) -> str:
+        return f"problem:{problem_slug}:{','.join(self._page_selection)}"
+
     def _get_problems_data_page(
         self, offset: int, page_size: int, page: int
     ) -> List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]:
-        api_instance = self._api_instance
+        skip = offset + page * page_size
+
+        if self._members is not None:
+            return self._get_questions(self._member_slugs[skip : skip + page_size])
+
+        disk_cache = self._disk_cache
+        if disk_cache is None:
+            return self._fetch_problems_range(skip, page_size)
+
+        key = self._page_key(skip, page_size)
+        cached = disk_cache.get(key)
+        if cached is not None:
+            return _load_questions(cached)
+
+        data = self._fetch_problems_range(skip, page_size)
+        disk_cache.set(key, _dump_questions(data))
+        return data
+
+    def _fetch_problems_range(
+        self,
+        skip: int,
+        limit: int,
+        list_id: Optional[str] = None,
+        selection: Optional[Sequence[str]] = None,
+    ) -> List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]:
+        """
+        Fetch `limit` problems starting from `skip`, of the list and with
+        the fields of the pages unless given.
+
+        The range is split into as many requests as needed to keep every
+        request under the current adaptive page size. If a request times out,
+        the page size is reduced and the rest of the range is fetched with
+        smaller requests.
+        """
+        list_id = self._list_id if list_id is None else list_id
+        selection = self._page_selection if selection is None else selection
+        problems: List[
+            leetcode.models.graphql_question_detail.GraphqlQuestionDetail
+        ] = []
+        end = skip + limit
+        timeouts = 0
+
+        while skip < end:
+            size = min(self._page_sizer.size, end - skip)
+
+            try:
+                data = self._fetch_problems_chunk(skip, size, list_id, selection)
+            except TRANSIENT_EXCEPTIONS as exc:
+                if not _is_timeout(exc):
+                    raise
+
+                if size > 1:
+                    logging.warning("Request for %s problems timed out", size)
+                    self._page_sizer.timeout(size)
+                    continue
+
+                # Can't split a single problem any further, so just retry it
+                timeouts += 1
+                if timeouts >= MAX_TIMEOUTS:
+                    raise
+                time.sleep(backoff_delay(timeouts - 1, 1, 60, exc))
+                continue
+
+            self._page_sizer.success()
+            problems.extend(data)
+            skip += size
+            timeouts = 0
+
+        return problems
+
+    @retry(
+        times=5,
+        exceptions=TRANSIENT_EXCEPTIONS,
+        delay=1,
+        retry_if=lambda exc: _is_transient(exc) and not _is_timeout(exc),
+    )
+    def _fetch_problems_chunk(
+        self, skip: int, limit: int, list_id: str, selection: Sequence[str]
+    ) -> List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]:
+        """
+        Single request for `limit` problems starting from `skip`. Timeouts are
+        not retried here: they are handled by splitting the range into smaller
+        requests in _fetch_problems_range().
+        """
         graphql_request = leetcode.models.graphql_query.GraphqlQuery(
-            query="""
-            query problemsetQuestionList($categorySlug: String, $limit: Int, $skip: Int, $filters: QuestionListFilterInput) {
-              problemsetQuestionList: questionList(
-                categorySlug: $categorySlug
-                limit: $limit
-                skip: $skip
-                filters: $filters
-              ) {
-                questions: data {
-                    questionFrontendId
-                    title
-                    titleSlug
-                    categoryTitle
-                    freqBar
-                    content
-                    isPaidOnly
-                    difficulty
-                    likes
-                    dislikes
-                    topicTags {
-                      name
-                      slug
-                    }
-                    stats
-                    hints
-                    companyTagStats
-                }
-              }
-            }
-            """,
+            query=problemset_query(tuple(selection)),
             variables=leetcode.models.graphql_query_problemset_question_list_variables.GraphqlQueryProblemsetQuestionListVariables(
                 category_slug="",
-                limit=page_size,
-                skip=offset + page * page_size,
+                limit=limit,
+                skip=skip,
                 filters=leetcode.models.graphql_query_problemset_question_list_variables_filter_input.GraphqlQueryProblemsetQuestionListVariablesFilterInput(
-                    list_id=self._list_id
+                    list_id=list_id
                 ),
             ),
             operation_name="problemsetQuestionList",
         )
 
-        time.sleep(2)  # Leetcode has a rate limiter
-        data = api_instance.graphql_post(
-            body=graphql_request
+        self._throttle()
+        data = self._send(
+            lambda api_instance: api_instance.graphql_post(
+                body=graphql_request, _request_timeout=REQUEST_TIMEOUT
+            )
         ).data.problemset_question_list.questions
 
         return data
 
-    def _get_problems_data(
+    def _page_layout(self, problem_count: int) -> Tuple[int, int, int, int]:
+        """
+        First and last problem to fetch, the page size and the number of pages
+        """
+        start = self._start
+        stop = min(self._stop, problem_count)
+        page_size = min(self._page_size, stop - start + 1)
+        return start, stop, page_size, math.ceil((stop - start + 1) / page_size)
+
+    def _iter_problems_pages(
         self,
-    ) -> List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]:
-        problem_count = self._get_problems_count()
+    ) -> Iterator[List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]]:
+        """
+        Fetch problems page by page and yield the pages in order.
+
+        Pages are fetched concurrently, but at most `concurrency` pages are
+        fetched ahead of the one the caller is processing, so memory use
+        doesn't depend on the number of problems.
+        """
+        if len(self._list_ids) > 1:
+            if self._members is None:
+                self._members = self._get_members()
+                self._member_slugs = list(self._members)
+            problem_count = len(self._member_slugs)
+        else:
+            problem_count = self._get_problems_count()
 
         if self._start > problem_count:
             raise ValueError(
                 "Start ({self._start}) is greater than problems count ({problem_count})"
             )
 
-        start = self._start
-        stop = min(self._stop, problem_count)
+        start, stop, page_size, page_count = self._page_layout(problem_count)
 
-        page_size = min(self._page_size, stop - start + 1)
+        logging.info("Fetching %s problems %s per page", stop - start + 1, page_size)
+
+        pages = iter(range(page_count))
+
+        journal = (
+            PageJournal(
+                self._checkpoint_dir,
+                self._list_ids,
+                start,
+                stop,
+                page_size,
+                self._page_selection,
+                problem_count,
+            )
+            if self._checkpoint_dir is not None
+            else None
+        )
+
+        with ThreadPoolExecutor(max_workers=self._concurrency) as executor, tqdm(
+            total=page_count, unit="problem", unit_scale=page_size
+        ) as progress:
+            pending: Deque[
+                Future[
+                    List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]
+                ]
+            ] = collections.deque(
+                executor.submit(
+                    self._get_checkpointed_page, start, page_size, page, journal
+                )
+                for page in itertools.islice(pages, self._concurrency)
+            )
+
+            while pending:
+                data = pending.popleft().result()
+
+                page = next(pages, None)
+                if page is not None:
+                    pending.append(
+                        executor.submit(
+                            self._get_checkpointed_page,
+                            start,
+                            page_size,
+                            page,
+                            journal,
+                        )
+                    )
+
+                progress.update()
+                yield data
+
+        # Every page has been processed, nothing to resume anymore
+        if journal is not None:
+            journal.clear()
 
+    def _get_problems_data(
+        self,
+    ) -> List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]:
         problems: List[
             leetcode.models.graphql_question_detail.GraphqlQuestionDetail
         ] = []
 
-        logging.info("Fetching %s problems %s per page", stop - start + 1, page_size)
-
-        for page in tqdm(
-            range(math.ceil((stop - start + 1) / page_size)),
-            unit="problem",
-            unit_scale=page_size,
-        ):
-            data = self._get_problems_data_page(start, page_size, page)
+        for data in self._iter_problems_pages():
             problems.extend(data)
 
         return problems
 
+    def _produce_pages(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        queue: "asyncio.Queue[Any]",
+        stopped: threading.Event,
+        hash_snapshot: bool = False,
+    ) -> None:
+        """
+        Runs in a worker thread: fetches pages, converts them to records and
+        puts them into the queue. Blocks while the queue is full.
+        """
+
+        def put(item: Any) -> None:
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        snapshot: Optional[ColumnarSnapshot] = None
+        digest = hashlib.sha256() if hash_snapshot else None
+        try:
+            snapshot = self._new_snapshot()
+            for data in self._iter_problems_pages():
+                if stopped.is_set():
+                    return
+                records = [self._to_record(problem) for problem in data]
+                if snapshot is not None:
+                    snapshot.add(records)
+                if digest is not None:
+                    digest.update(json.dumps(records).encode("utf8"))
+                put(records)
+            # Only a complete fetch is saved
+            if snapshot is not None:
+                snapshot.close()
+            if digest is not None:
+                self._snapshot_hash = digest.hexdigest()
+        except Exception as exc:  # pylint: disable=broad-except
+            put(exc)
+        else:
+            put(None)
+        finally:
+            if snapshot is not None:
+                snapshot.discard()
+
+    async def stream_problems_handles(
+        self, queue_size: int = DEFAULT_QUEUE_SIZE, hash_snapshot: bool = False
+    ) -> AsyncIterator[List[str]]:
+        """
+        Fetch problems and yield handles page by page, as soon as each page
+        arrives.
+
+        Unlike all_problems_handles(), this doesn't keep all the problems in
+        memory. At most `queue_size` fetched pages wait to be processed, and
+        the data of a page can be read with the accessors only until the next
+        page is requested.
+
+        With `hash_snapshot`, the listed problems are hashed as they arrive,
+        see snapshot_hash().
+        """
+        loop = asyncio.get_running_loop()
+        queue: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=queue_size)
+        stopped = threading.Event()
+        self._snapshot_hash = None
+        producer = loop.run_in_executor(
+            None, self._produce_pages, loop, queue, stopped, hash_snapshot
+        )
+
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+
+                self._window = {record.slug: record for record in item}
+                for record in item:
+                    self._index.add(record)
+                yield list(self._window)
+        finally:
+            self._window = {}
+            stopped.set()
+            # Unblock the producer if it's waiting for space in the queue
+            while not producer.done():
+                while not queue.empty():
+                    queue.get_nowait()
+                await asyncio.sleep(0.01)
+
+    def snapshot_hash(self) -> str:
+        """
+        Hash of the listed problems of the last complete
+        stream_problems_handles() with `hash_snapshot`, e.g. to tell whether
+        anything built from them changed.
+
+        Pages are hashed as they are streamed, so nothing is fetched twice.
+        Details of a two-phase fetch are not included, they are cached until
+        the listed problem changes.
+        """
+        if self._snapshot_hash is None:
+            raise ValueError("No complete stream of the problems has been hashed")
+        return self._snapshot_hash
+
+    def stored_snapshot_hash(self) -> Optional[str]:
+        """
+        Hash of the listed problems, the same as snapshot_hash() after they
+        are streamed, computed from the disk cache without any request.
+
+        None if some of the problems aren't in the disk cache or have
+        expired there (or there is no disk cache): they have to be streamed
+        to be hashed then.
+        """
+        disk_cache = self._disk_cache
+        if disk_cache is None:
+            return None
+
+        if len(self._list_ids) > 1:
+            if self._members is None:
+                lists = []
+                for list_id in self._list_ids:
+                    cached = disk_cache.get(f"members:{list_id}")
+                    if cached is None:
+                        return None
+                    lists.append(json.loads(cached))
+                self._members = self._merge_members(lists)
+                self._member_slugs = list(self._members)
+            problem_count = len(self._member_slugs)
+        else:
+            cached = disk_cache.get(f"count:{self._list_id}")
+            if cached is None:
+                return None
+            problem_count = int(cached)
+
+        if self._start > problem_count:
+            return None
+
+        start, _, page_size, page_count = self._page_layout(problem_count)
+        digest = hashlib.sha256()
+        for page in range(page_count):
+            skip = start + page * page_size
+            if self._members is not None:
+                keys = [
+                    self._problem_key(slug)
+                    for slug in self._member_slugs[skip : skip + page_size]
+                ]
+            else:
+                keys = [self._page_key(skip, page_size)]
+
+            data = []
+            for key in keys:
+                cached = disk_cache.get(key)
+                if cached is None:
+                    return None
+                data.extend(_load_questions(cached))
+
+            # Hashed the same way as the streamed pages in _produce_pages()
+            records = [self._to_record(problem) for problem in data]
+            digest.update(json.dumps(records).encode("utf8"))
+
+        return digest.hexdigest()
+
     async def all_problems_handles(self) -> List[str]:
         """
         Get all problem handles known.
@@ -274,44 +1254,343 @@ class LeetcodeData:
         """
         return list(self._cache.keys())
 
-    def _get_problem_data(
-        self, problem_slug: str
-    ) -> leetcode.models.graphql_question_detail.GraphqlQuestionDetail:
+    async def select(
+        self, expression: str, problem_slugs: Optional[Iterable[str]] = None
+    ) -> List[str]:
         """
-        TODO: Legacy method. Needed in the old architecture. Can be replaced
-        with direct cache calls later.
+        Handles of the problems matching the filter expression, for example
+        `company:google AND difficulty:medium AND NOT paid`.
+
+        Filters can use `topic:`, `company:`, `difficulty:` and `list:`
+        fields, the `paid` flag, AND, OR, NOT and parentheses.
+
+        If `problem_slugs` is given, only these problems are filtered (e.g.
+        the page that is being streamed), otherwise all the problems are.
+        """
+        if problem_slugs is None:
+            problem_slugs = self._cache.keys()
+
+        return self._index.select(expression, problem_slugs)
+
+    def _detail_key(self, problem_slug: str) -> str:
+        return f"question:{problem_slug}:{','.join(self._selection)}"
+
+    def _cached_details(
+        self, listed: Sequence[ProblemRecord]
+    ) -> List[Optional[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]]:
+        """
+        Cached details of the listed problems, None for the missing ones.
+        Details are cached together with a marker of the listed fields they
+        were fetched for, and fetched again when the marker changes, e.g.
+        when the problem got new tags. Since changes are detected this way,
+        the details are kept for at least DETAIL_TTL, longer than the pages.
+        """
+        disk_cache = self._disk_cache
+        if disk_cache is None:
+            return [None] * len(listed)
+
+        questions = []
+        for record in listed:
+            marker = _detail_marker(record)
+            cached = disk_cache.get(self._detail_key(record.slug), self._detail_ttl)
+            questions.append(
+                _load_questions(cached[len(marker) + 1 :])[0]
+                if cached is not None and cached.startswith(marker + "\n")
+                else None
+            )
+
+        return questions
+
+    def _fetch_details_range(
+        self, listed: Sequence[ProblemRecord]
+    ) -> List[Optional[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]]:
+        """
+        Fetch details of the listed problems and cache them per problem,
+        None for the problems the API has no details for
+        """
+        questions = self._fetch_questions(
+            [record.slug for record in listed], self._selection
+        )
+
+        disk_cache = self._disk_cache
+        if disk_cache is not None:
+            for record, question in zip(listed, questions):
+                if question is None:
+                    continue
+                disk_cache.set(
+                    self._detail_key(record.slug),
+                    _detail_marker(record) + "\n" + _dump_questions([question]),
+                )
+
+        return questions
+
+    def _fetch_questions(
+        self, problem_slugs: Sequence[str], selection: Sequence[str]
+    ) -> List[Optional[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]]:
+        """
+        Fetch the selected fields of the problems, as many at once as the
+        current adaptive batch size allows.
+
+        Like pages, batches are halved when a request times out or the API
+        refuses the batch, and grow again after successful requests. A
+        problem the API has no data for even on its own (e.g. it was removed
+        since it was listed) is logged and skipped, with None in its place.
+        """
+        questions: List[
+            Optional[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]
+        ] = []
+        start = 0
+        timeouts = 0
+
+        while start < len(problem_slugs):
+            size = min(self._batch_sizer.size, len(problem_slugs) - start)
+            batch = problem_slugs[start : start + size]
+
+            try:
+                data = self._fetch_details_batch(batch, selection)
+            except _BatchError:
+                if size == 1:
+                    logging.warning("Skipping %s", batch[0], exc_info=True)
+                    questions.append(None)
+                    start += 1
+                    continue
+                logging.warning("Batch of %s problems failed", size, exc_info=True)
+                self._batch_sizer.timeout(size)
+                continue
+            except TRANSIENT_EXCEPTIONS as exc:
+                if not _is_timeout(exc):
+                    raise
+
+                if size > 1:
+                    logging.warning("Request for %s problems timed out", size)
+                    self._batch_sizer.timeout(size)
+                    continue
+
+                timeouts += 1
+                if timeouts >= MAX_TIMEOUTS:
+                    raise
+                time.sleep(backoff_delay(timeouts - 1, 1, 60, exc))
+                continue
+
+            self._batch_sizer.success()
+            questions.extend(data)
+            start += size
+            timeouts = 0
+
+        return questions
+
+    @retry(
+        times=5,
+        exceptions=TRANSIENT_EXCEPTIONS,
+        delay=1,
+        retry_if=lambda exc: _is_transient(exc) and not _is_timeout(exc),
+    )
+    def _fetch_details_batch(
+        self, problem_slugs: Sequence[str], selection: Sequence[str]
+    ) -> List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]:
+        """
+        Single request for the selected fields of the problems, one aliased
+        `question` query per problem
+        """
+        graphql_request = leetcode.models.graphql_query.GraphqlQuery(
+            query=questions_query(tuple(selection), len(problem_slugs)),
+            variables={f"s{i}": slug for i, slug in enumerate(problem_slugs)},
+            operation_name="questionData",
+        )
+
+        self._throttle()
+        response = self._send(
+            lambda api_instance: _graphql_post_raw(api_instance, graphql_request)
+        )
+
+        data = response.get("data") or {}
+        questions = [data.get(f"q{i}") for i in range(len(problem_slugs))]
+        missing = [
+            slug for slug, question in zip(problem_slugs, questions) if not question
+        ]
+        if missing:
+            raise _BatchError(
+                f"No details for {', '.join(missing)}: {response.get('errors')}"
+            )
+
+        return _load_questions(json.dumps(questions))
+
+    async def fetch_details(self, problem_slugs: Iterable[str]) -> None:
+        """
+        Second phase of a two-phase fetch: complete the records of the
+        problems (of the page being streamed, or of all the problems) with
+        their details.
+
+        Details of many problems are fetched with a single request. Up to
+        `concurrency` requests are sent at the same time. Does nothing if the
+        pages already have everything.
+        """
+        if self._page_selection == self._selection:
+            return
+
+        stores = {
+            slug: self._store(slug)
+            for slug in dict.fromkeys(problem_slugs)
+            if slug not in self._detailed
+        }
+        listed = [store[slug] for slug, store in stores.items()]
+        if not listed:
+            return
+
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=self._concurrency) as executor:
+            questions = await loop.run_in_executor(
+                executor, self._cached_details, listed
+            )
+            missing = [
+                record
+                for record, question in zip(listed, questions)
+                if question is None
+            ]
+
+            size = self._batch_sizer.size
+            batches = [missing[i : i + size] for i in range(0, len(missing), size)]
+            fetched = await asyncio.gather(
+                *(
+                    loop.run_in_executor(executor, self._fetch_details_range, batch)
+                    for batch in batches
+                )
+            )
+
+        details = {
+            record.slug: question
+            for record, question in zip(listed, questions)
+            if question is not None
+        }
+        details.update(
+            (record.slug, question)
+            for batch, batch_questions in zip(batches, fetched)
+            for record, question in zip(batch, batch_questions)
+            if question is not None
+        )
+
+        for listed_record in listed:
+            if listed_record.slug not in details:
+                # Skipped by _fetch_questions(), the problem keeps what was
+                # listed and its details are fetched again next time
+                continue
+            # Counters change all the time, they are taken from the listing
+            record = self._to_record(details[listed_record.slug])._replace(
+                **{name: getattr(listed_record, name) for name in _COUNTER_FIELDS}
+            )
+            # Back into the store the listed record was read from
+            stores[record.slug][record.slug] = record
+            self._detailed.add(record.slug)
+
+    def _store(self, problem_slug: str) -> Dict[str, ProblemRecord]:
+        """
+        Where the record of the problem is kept: the page being streamed, or
+        all the problems
         """
+        if problem_slug in self._window:
+            return self._window
+
         cache = self._cache
         if problem_slug in cache:
-            return cache[problem_slug]
+            return cache
 
         raise ValueError(f"Problem {problem_slug} is not in cache")
 
-    async def _get_description(self, problem_slug: str) -> str:
+    def _get_problem_data(self, problem_slug: str) -> ProblemRecord:
         """
-        Problem description
+        Record of the problem
         """
-        data = self._get_problem_data(problem_slug)
-        return data.content or "No content"
+        return self._store(problem_slug)[problem_slug]
+
+    def _get_records(self, problem_slugs: Iterable[str]) -> List[ProblemRecord]:
+        window = self._window
+        cache: Optional[Dict[str, ProblemRecord]] = None
+        records = []
+
+        for slug in problem_slugs:
+            record = window.get(slug)
+            if record is None:
+                if cache is None:
+                    cache = self._cache
+                record = cache.get(slug)
+                if record is None:
+                    raise ValueError(f"Problem {slug} is not in cache")
+            records.append(record)
+
+        return records
+
+    @overload
+    async def records(self, problem_slugs: Iterable[str]) -> List[ProblemRecord]: ...
+
+    @overload
+    async def records(
+        self, problem_slugs: Iterable[str], fields: Sequence[str]
+    ) -> List[Tuple[Any, ...]]: ...
+
+    async def records(
+        self, problem_slugs: Iterable[str], fields: Optional[Sequence[str]] = None
+    ) -> Union[List[ProblemRecord], List[Tuple[Any, ...]]]:
+        """
+        Records of many problems at once (e.g. of the page being streamed),
+        in the order of `problem_slugs`.
+
+        Without `fields` these are whole ProblemRecords, otherwise tuples of
+        the ProblemRecord fields named in `fields`. This is the way to read
+        problems in bulk: the records are looked up in a single pass and all
+        their values are computed when the problems are fetched.
+        """
+        records = self._get_records(problem_slugs)
+        if fields is None:
+            return records
+
+        indices = _field_indices(fields)
+        return [tuple(record[index] for index in indices) for record in records]
+
+    async def columns(
+        self, problem_slugs: Iterable[str], fields: Sequence[str]
+    ) -> Dict[str, List[Any]]:
+        """
+        The ProblemRecord fields named in `fields` of many problems at once,
+        as a list of values per field in the order of `problem_slugs`
+        """
+        records = self._get_records(problem_slugs)
+        return {
+            field: [record[index] for record in records]
+            for field, index in zip(fields, _field_indices(fields))
+        }
+
+    async def record(self, problem_slug: str) -> ProblemRecord:
+        """
+        Everything known about the problem as a single compact record, e.g.
+        to process it in another process
+        """
+        return self._get_problem_data(problem_slug)
+
+    async def content_hash(self, problem_slug: str) -> str:
+        """
+        Hash of all the data fetched for the problem. It changes whenever any
+        of the problem's fields changes.
+        """
+        return content_hash(*self._get_problem_data(problem_slug))
 
-    async def _stats(self, problem_slug: str) -> Dict[str, str]:
+    async def _get_description(self, problem_slug: str) -> str:
         """
-        Various stats about problem. Such as number of accepted solutions, etc.
+        Problem description
         """
         data = self._get_problem_data(problem_slug)
-        return json.loads(data.stats)
+        return data.content or "No content"
 
     async def submissions_total(self, problem_slug: str) -> int:
         """
         Total number of submissions of the problem
         """
-        return int((await self._stats(problem_slug))["totalSubmissionRaw"])
+        return self._get_problem_data(problem_slug).submissions_total
 
     async def submissions_accepted(self, problem_slug: str) -> int:
         """
         Number of accepted submissions of the problem
         """
-        return int((await self._stats(problem_slug))["totalAcceptedRaw"])
+        return self._get_problem_data(problem_slug).submissions_accepted
 
     async def description(self, problem_slug: str) -> str:
         """
@@ -325,39 +1604,29 @@ class LeetcodeData:
         directly in Anki
         """
         data = self._get_problem_data(problem_slug)
-        diff = data.difficulty
 
-        if diff == "Easy":
-            return "<font color='green'>Easy</font>"
+        if data.difficulty_html is None:
+            raise ValueError(f"Incorrect difficulty: {data.difficulty}")
 
-        if diff == "Medium":
-            return "<font color='orange'>Medium</font>"
+        return data.difficulty_html
 
-        if diff == "Hard":
-            return "<font color='red'>Hard</font>"
-
-        raise ValueError(f"Incorrect difficulty: {diff}")
-
-    async def paid(self, problem_slug: str) -> str:
+    async def paid(self, problem_slug: str) -> bool:
         """
         Problem's "available for paid subsribers" status
         """
-        data = self._get_problem_data(problem_slug)
-        return data.is_paid_only
+        return self._get_problem_data(problem_slug).paid
 
     async def problem_id(self, problem_slug: str) -> str:
         """
         Numerical id of the problem
         """
-        data = self._get_problem_data(problem_slug)
-        return data.question_frontend_id
+        return self._get_problem_data(problem_slug).problem_id
 
     async def likes(self, problem_slug: str) -> int:
         """
         Number of likes for the problem
         """
-        data = self._get_problem_data(problem_slug)
-        likes = data.likes
+        likes = self._get_problem_data(problem_slug).likes
 
         if not isinstance(likes, int):
             raise ValueError(f"Likes should be int: {likes}")
@@ -368,8 +1637,7 @@ class LeetcodeData:
         """
         Number of dislikes for the problem
         """
-        data = self._get_problem_data(problem_slug)
-        dislikes = data.dislikes
+        dislikes = self._get_problem_data(problem_slug).dislikes
 
         if not isinstance(dislikes, int):
             raise ValueError(f"Dislikes should be int: {dislikes}")
@@ -386,45 +1654,28 @@ class LeetcodeData:
         - LeetCode::company::
         - LeetCode::difficulty::
         """
-        data = self._get_problem_data(problem_slug)
-        tags = list(map(lambda x: f"LeetCode::topic::{x.slug}", data.topic_tags))
-
-        company_stats = await self.company_stats(problem_slug)
-        companies = [entry["slug"] for entry in company_stats]
-        tags.extend([
-            f"LeetCode::company::{company}"
-            for company in companies
-        ])
-
-        tags.append(f"LeetCode::difficulty::{data.difficulty.lower()}")
-        return tags
-    
+        return list(self._get_problem_data(problem_slug).tags)
+
     async def total_times_encountered(self, problem_slug: str) -> int:
-        company_stats = await self.company_stats(problem_slug)
-        return sum(x["timesEncountered"] for x in company_stats) if company_stats else 0
-    
+        return self._get_problem_data(problem_slug).total_times_encountered
+
     async def company_stats(self, problem_slug: str) -> List[Dict[str, Any]]:
-        data = self._get_problem_data(problem_slug)
-        company_stats = list(json.loads(data.company_tag_stats).values())[0]
-        return company_stats
-    
+        return list(self._get_problem_data(problem_slug).company_stats)
+
     async def freq_bar(self, problem_slug: str) -> float:
         """
         Returns percentage for frequency bar
         """
-        data = self._get_problem_data(problem_slug)
-        return data.freq_bar or 0
+        return self._get_problem_data(problem_slug).freq_bar
 
-    async def title(self, problem_slug: str) -> float:
+    async def title(self, problem_slug: str) -> str:
         """
         Returns problem title
         """
-        data = self._get_problem_data(problem_slug)
-        return data.title
+        return self._get_problem_data(problem_slug).title
 
-    async def category(self, problem_slug: str) -> float:
+    async def category(self, problem_slug: str) -> Optional[str]:
         """
         Returns problem category title
         """
-        data = self._get_problem_data(problem_slug)
-        return data.category_title
+        return self._get_problem_data(problem_slug).category
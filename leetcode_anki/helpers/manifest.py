@@ -0,0 +1,137 @@
+# pylint: disable=missing-module-docstring
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Optional, Set
+
+from leetcode_anki.helpers.cache import atomic_write
+
+BUILD_CACHE_DIR = os.path.join("cache", "builds")
+
+_CHUNK_SIZE = 1 << 20
+
+
+def content_hash(*parts: Any) -> str:
+    """
+    Stable hash of JSON-serializable values
+    """
+    data = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf8")).hexdigest()
+
+
+class BuildManifest:
+    """
+    Content hashes of the notes written by the previous build, per slug.
+
+    The manifest also remembers the hash of the note model, since a changed
+    template or field list invalidates every note built with the old one.
+    """
+
+    def __init__(self, path: str, model_hash: str) -> None:
+        self._path = path
+        self._model_hash = model_hash
+        self._previous: Dict[str, str] = {}
+        self._current: Dict[str, str] = {}
+
+        try:
+            with open(path, "r", encoding="utf8") as manifest_file:
+                manifest = json.load(manifest_file)
+        except FileNotFoundError:
+            logging.info("No build manifest found in %s, building all notes", path)
+            return
+
+        if manifest.get("model") != model_hash:
+            logging.info("Note model changed, building all notes")
+            return
+
+        self._previous = manifest.get("notes", {})
+
+    def changed(self, slug: str, digest: str) -> bool:
+        """
+        Record the new hash of the note and return whether the note was added
+        or changed since the previous build
+        """
+        self._current[slug] = digest
+        return self._previous.get(slug) != digest
+
+    def removed(self) -> Set[str]:
+        """
+        Slugs that were in the previous build, but not in this one
+        """
+        return self._previous.keys() - self._current.keys()
+
+    def save(self) -> None:
+        atomic_write(
+            self._path,
+            json.dumps({"model": self._model_hash, "notes": self._current}),
+        )
+
+
+def file_hash(path: str) -> Optional[str]:
+    """
+    Hash of the content of the file, None if there's no such file
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as hashed_file:
+            for chunk in iter(lambda: hashed_file.read(_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """
+    Hash of the inputs of the last build of the output files, and hashes of
+    the files it wrote.
+
+    A build with the same inputs would write the same files again, so it
+    can be skipped as long as the files are still there unchanged. The
+    cache entry is named after the output paths, so builds of different
+    files don't evict each other.
+    """
+
+    def __init__(self, directory: str, *outputs: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self._outputs = outputs
+        self._path = os.path.join(
+            directory,
+            content_hash(*(os.path.abspath(output) for output in outputs))[:32]
+            + ".json",
+        )
+
+    def hit(self, key: str) -> bool:
+        """
+        Whether the outputs were built from the inputs with this hash
+        """
+        try:
+            with open(self._path, "r", encoding="utf8") as entry_file:
+                entry = json.load(entry_file)
+        except (FileNotFoundError, ValueError):
+            return False
+
+        if entry.get("key") != key:
+            return False
+
+        files = entry.get("files", {})
+        return all(
+            files.get(output) is not None and file_hash(output) == files[output]
+            for output in self._outputs
+        )
+
+    def save(self, key: str) -> None:
+        """
+        Record that the outputs, as they are now, were built from the inputs
+        with this hash
+        """
+        atomic_write(
+            self._path,
+            json.dumps(
+                {
+                    "key": key,
+                    "files": {output: file_hash(output) for output in self._outputs},
+                }
+            ),
+        )
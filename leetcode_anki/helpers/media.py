@@ -0,0 +1,242 @@
+# pylint: disable=missing-module-docstring
+import asyncio
+import hashlib
+import html
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import requests
+import requests.adapters
+
+from leetcode_anki.helpers.cache import atomic_write
+from leetcode_anki.helpers.ratelimit import TokenBucket
+from leetcode_anki.helpers.records import ProblemRecord
+
+MEDIA_DIR = "media"
+# Relative image URLs in descriptions are relative to the site
+BASE_URL = "https://leetcode.com/"
+DEFAULT_MEDIA_CONCURRENCY = 8
+# Images come from a CDN, which allows much more than the API
+DEFAULT_MEDIA_RATE = 20.0
+# (connect, read) timeouts for downloading an image in seconds
+REQUEST_TIMEOUT = (10, 60)
+
+# Files mapping the hash of an image URL to the name of the image in the store
+_INDEX_DIR = "index"
+_IMAGE_EXTENSIONS = {".gif", ".jpeg", ".jpg", ".png", ".svg", ".webp", ".bmp"}
+_IMG_SRC = re.compile(
+    r"""(<img\b[^>]*?\bsrc\s*=\s*)(?:"([^"]*)"|'([^']*)'|([^\s>"']+))""",
+    re.IGNORECASE,
+)
+
+
+def _absolute_url(src: str) -> Optional[str]:
+    url = urllib.parse.urljoin(BASE_URL, html.unescape(src).strip())
+    if urllib.parse.urlsplit(url).scheme not in ("http", "https"):
+        return None
+    return url
+
+
+def image_urls(content: Optional[str]) -> List[str]:
+    """
+    Absolute URLs of the images in the description HTML, in order and
+    without duplicates
+    """
+    if not content:
+        return []
+
+    urls = (
+        _absolute_url(next(src for src in match.groups()[1:] if src is not None))
+        for match in _IMG_SRC.finditer(content)
+    )
+    return list(dict.fromkeys(url for url in urls if url is not None))
+
+
+def rewrite_sources(content: str, names: Dict[str, str]) -> str:
+    """
+    Point `src` of the images found in `names` (URL to media file name) to
+    the media files. Other images are left as they are.
+    """
+
+    def replace(match: "re.Match[str]") -> str:
+        src = next(src for src in match.groups()[1:] if src is not None)
+        url = _absolute_url(src)
+        name = names.get(url) if url is not None else None
+        if name is None:
+            return match.group(0)
+        return f'{match.group(1)}"{html.escape(name)}"'
+
+    return _IMG_SRC.sub(replace, content)
+
+
+def _extension(url: str, content_type: Optional[str]) -> str:
+    extension = posixpath.splitext(urllib.parse.urlsplit(url).path)[1].lower()
+    if extension in _IMAGE_EXTENSIONS:
+        return extension
+
+    if content_type:
+        guessed = mimetypes.guess_extension(content_type.split(";")[0].strip())
+        if guessed:
+            return guessed
+
+    return ""
+
+
+class MediaStore:
+    """
+    Content-addressed store of the images from problem descriptions.
+
+    Every image is stored once under the SHA-256 of its content, and a small
+    index file per URL remembers which image the URL points to. So an image is
+    downloaded only the first time it's seen, across runs, and images with
+    the same content at different URLs are stored (and packaged) once.
+
+    Missing images are downloaded concurrently by `concurrency` threads
+    sharing a connection pool, at most `rate` requests per second. Images
+    that can't be downloaded are skipped (cards keep loading them from the
+    web). With `offline=True` nothing is downloaded and only the stored
+    images are used.
+    """
+
+    def __init__(
+        self,
+        directory: str = MEDIA_DIR,
+        concurrency: int = DEFAULT_MEDIA_CONCURRENCY,
+        rate: float = DEFAULT_MEDIA_RATE,
+        offline: bool = False,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError(f"Concurrency must be at least 1: {concurrency}")
+
+        self._directory = directory
+        os.makedirs(os.path.join(directory, _INDEX_DIR), exist_ok=True)
+        self._offline = offline
+        self._rate_limiter = TokenBucket(rate, burst=concurrency)
+        # URL to the name of the stored image, or None if it isn't available
+        self._names: Dict[str, Optional[str]] = {}
+
+        self._session: Optional[requests.Session] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if not offline:
+            self._session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=concurrency, pool_maxsize=concurrency
+            )
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+            self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def path(self, name: str) -> str:
+        """
+        Path of the stored image
+        """
+        return os.path.join(self._directory, name)
+
+    def _index_path(self, url: str) -> str:
+        digest = hashlib.sha256(url.encode("utf8")).hexdigest()
+        return os.path.join(self._directory, _INDEX_DIR, digest)
+
+    def _lookup(self, url: str) -> Optional[str]:
+        try:
+            with open(self._index_path(url), "r", encoding="utf8") as index_file:
+                name = index_file.read().strip()
+        except FileNotFoundError:
+            return None
+
+        return name if name and os.path.isfile(self.path(name)) else None
+
+    def _download(self, url: str) -> Optional[str]:
+        session = self._session
+        assert session is not None
+
+        self._rate_limiter.acquire()
+        try:
+            response = session.get(url, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+        except requests.RequestException:
+            logging.warning("Can't download %s, keeping the link", url, exc_info=True)
+            return None
+
+        data = response.content
+        name = hashlib.sha256(data).hexdigest() + _extension(
+            url, response.headers.get("Content-Type")
+        )
+        if not os.path.isfile(self.path(name)):
+            atomic_write(self.path(name), data)
+        atomic_write(self._index_path(url), name)
+
+        return name
+
+    def _get(self, url: str) -> Optional[str]:
+        name = self._lookup(url)
+        if name is None and not self._offline:
+            name = self._download(url)
+        return name
+
+    async def fetch(self, urls: Iterable[str]) -> Dict[str, str]:
+        """
+        Names of the stored images by URL, downloading the missing ones.
+        URLs of images that aren't available are left out.
+        """
+        unique_urls = list(dict.fromkeys(urls))
+        missing = [url for url in unique_urls if url not in self._names]
+
+        if missing:
+            loop = asyncio.get_running_loop()
+            names = await asyncio.gather(
+                *(
+                    loop.run_in_executor(self._executor, self._get, url)
+                    for url in missing
+                )
+            )
+            self._names.update(zip(missing, names))
+
+        return {
+            url: name
+            for url, name in ((url, self._names[url]) for url in unique_urls)
+            if name is not None
+        }
+
+    async def localize(
+        self, records: Sequence[ProblemRecord]
+    ) -> Tuple[List[ProblemRecord], List[str]]:
+        """
+        The problems with their images pointing to the stored images, and
+        the names of the stored images they use
+        """
+        record_urls = [image_urls(record.content) for record in records]
+        names = await self.fetch(url for urls in record_urls for url in urls)
+
+        localized = [
+            (
+                record._replace(content=rewrite_sources(record.content or "", names))
+                if any(url in names for url in urls)
+                else record
+            )
+            for record, urls in zip(records, record_urls)
+        ]
+        used = dict.fromkeys(
+            names[url] for urls in record_urls for url in urls if url in names
+        )
+        return localized, list(used)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def __enter__(self) -> "MediaStore":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
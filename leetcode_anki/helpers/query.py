@@ -0,0 +1,143 @@
+# pylint: disable=missing-module-docstring
+import functools
+from typing import Dict, FrozenSet, Iterable, Mapping, Tuple, Union
+
+# Selection of every problem field the client knows about, in query order
+QUESTION_FIELDS: Dict[str, str] = {
+    "questionFrontendId": "questionFrontendId",
+    "title": "title",
+    "titleSlug": "titleSlug",
+    "categoryTitle": "categoryTitle",
+    "freqBar": "freqBar",
+    "content": "content",
+    "isPaidOnly": "isPaidOnly",
+    "difficulty": "difficulty",
+    "likes": "likes",
+    "dislikes": "dislikes",
+    "topicTags": "topicTags {\n  name\n  slug\n}",
+    "stats": "stats",
+    "hints": "hints",
+    "companyTagStats": "companyTagStats",
+}
+ALL_FIELDS: Tuple[str, ...] = tuple(QUESTION_FIELDS)
+
+# Always fetched: they identify the problem, make the note tags and are
+# what filter expressions match on
+REQUIRED_FIELDS = frozenset(
+    (
+        "titleSlug",
+        "questionFrontendId",
+        "isPaidOnly",
+        "difficulty",
+        "topicTags",
+        "companyTagStats",
+    )
+)
+
+# The bulk of a problem: with a two-phase fetch these are only requested
+# problem by problem, for the problems that go into the deck
+DETAIL_FIELDS = frozenset(("content", "hints"))
+
+# Problem fields each field of the note model is made of
+MODEL_FIELDS: Dict[str, FrozenSet[str]] = {
+    "Slug": frozenset(("titleSlug",)),
+    "Id": frozenset(("questionFrontendId",)),
+    "Title": frozenset(("title",)),
+    "Topic": frozenset(("categoryTitle",)),
+    "Content": frozenset(("content",)),
+    "Difficulty": frozenset(("difficulty",)),
+    "Paid": frozenset(("isPaidOnly",)),
+    "Likes": frozenset(("likes",)),
+    "Dislikes": frozenset(("dislikes",)),
+    "SubmissionsTotal": frozenset(("stats",)),
+    "SubmissionsAccepted": frozenset(("stats",)),
+    "SumissionAcceptRate": frozenset(("stats",)),
+    "Frequency": frozenset(("freqBar",)),
+    "Total Times Encountered": frozenset(("companyTagStats",)),
+    "Company Stats": frozenset(("companyTagStats",)),
+    "Hints": frozenset(("hints",)),
+}
+
+
+def selection_for_model(
+    model_fields: Iterable[Union[str, Mapping[str, str]]],
+    output_description: bool = True,
+) -> Tuple[str, ...]:
+    """
+    Problem fields needed for a note model, given its fields (names or
+    genanki field dicts). The description is the largest part of a problem,
+    so it's left out unless it goes into the notes.
+    """
+    selection = set(REQUIRED_FIELDS)
+    for field in model_fields:
+        name = field if isinstance(field, str) else field["name"]
+        if name not in MODEL_FIELDS:
+            raise ValueError(f"Unknown note field: {name}")
+        selection.update(MODEL_FIELDS[name])
+
+    if not output_description:
+        selection.discard("content")
+
+    return normalize_selection(selection)
+
+
+def normalize_selection(fields: Iterable[str]) -> Tuple[str, ...]:
+    """
+    Selection in the canonical order, so the same fields always make the same
+    query (and the same cache keys)
+    """
+    selection = set(fields)
+    unknown = selection - set(QUESTION_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown problem fields: {', '.join(sorted(unknown))}")
+
+    return tuple(field for field in QUESTION_FIELDS if field in selection)
+
+
+def _selection_set(selection: Tuple[str, ...]) -> str:
+    return "\n".join(
+        "                    " + line
+        for field in normalize_selection(selection)
+        for line in QUESTION_FIELDS[field].split("\n")
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def problemset_query(selection: Tuple[str, ...] = ALL_FIELDS) -> str:
+    """
+    `problemsetQuestionList` query returning only the selected problem fields
+    """
+    fields = _selection_set(selection)
+    return f"""
+            query problemsetQuestionList($categorySlug: String, $limit: Int, $skip: Int, $filters: QuestionListFilterInput) {{
+              problemsetQuestionList: questionList(
+                categorySlug: $categorySlug
+                limit: $limit
+                skip: $skip
+                filters: $filters
+              ) {{
+                questions: data {{
+{fields}
+                }}
+              }}
+            }}
+            """
+
+
+@functools.lru_cache(maxsize=None)
+def questions_query(selection: Tuple[str, ...] = ALL_FIELDS, count: int = 1) -> str:
+    """
+    `questionData` query returning the selected fields of `count` problems at
+    once. The problems are aliased `q0`, `q1`, ... and their slugs are the
+    variables `s0`, `s1`, ...
+    """
+    fields = _selection_set(selection)
+    variables = ", ".join(f"$s{i}: String!" for i in range(count))
+    questions = "\n".join(f"""              q{i}: question(titleSlug: $s{i}) {{
+{fields}
+              }}""" for i in range(count))
+    return f"""
+            query questionData({variables}) {{
+{questions}
+            }}
+            """
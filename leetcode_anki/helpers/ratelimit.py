@@ -0,0 +1,57 @@
+# pylint: disable=missing-module-docstring
+import threading
+import time
+
+DEFAULT_RATE = 0.5
+DEFAULT_BURST = 1
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Tokens are added at `rate` tokens per second up to `burst` tokens. Every
+    request takes one token. If there are no tokens left, the caller reserves
+    the next one and sleeps until it becomes available, so concurrent callers
+    are served in the order they came and the overall rate never goes over
+    the limit.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST) -> None:
+        if rate <= 0:
+            raise ValueError(f"Rate must be greater than 0: {rate}")
+
+        if burst < 1:
+            raise ValueError(f"Burst must be at least 1: {burst}")
+
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take a token and return how many seconds the caller has to wait before
+        using it
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                float(self._burst), self._tokens + (now - self._updated) * self._rate
+            )
+            self._updated = now
+            self._tokens -= 1
+
+            if self._tokens >= 0:
+                return 0.0
+
+            return -self._tokens / self._rate
+
+    def acquire(self) -> None:
+        """
+        Block until a token is available
+        """
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
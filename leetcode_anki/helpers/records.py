@@ -0,0 +1,110 @@
+# pylint: disable=missing-module-docstring
+import json
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+
+import leetcode.models.graphql_question_detail  # type: ignore
+
+DIFFICULTY_HTML = {
+    "Easy": "<font color='green'>Easy</font>",
+    "Medium": "<font color='orange'>Medium</font>",
+    "Hard": "<font color='red'>Hard</font>",
+}
+# Name of the list of all problems (the empty list id) in tags and filters
+ALL_PROBLEMS_LIST = "all"
+
+
+class ProblemRecord(NamedTuple):
+    """
+    Everything known about a single problem, parsed once when it's fetched.
+
+    JSON strings from the API (stats, company stats) are decoded and the
+    derived values (tags, difficulty HTML, etc.) are computed up front, so
+    reading them doesn't do any work.
+    """
+
+    slug: str
+    problem_id: str
+    title: str
+    category: Optional[str]
+    content: Optional[str]
+    difficulty: str
+    difficulty_html: Optional[str]
+    paid: bool
+    likes: int
+    dislikes: int
+    submissions_total: int
+    submissions_accepted: int
+    freq_bar: float
+    topic_tags: Tuple[str, ...]
+    company_stats: Tuple[Dict[str, Any], ...]
+    total_times_encountered: int
+    tags: Tuple[str, ...]
+    hints: Tuple[str, ...]
+    # Lists the problem was fetched from, when several lists are fetched
+    lists: Tuple[str, ...] = ()
+
+
+def _company_stats(company_tag_stats: Optional[str]) -> Tuple[Dict[str, Any], ...]:
+    """
+    Company stats are grouped by time period. Only the first group is used.
+    """
+    if not company_tag_stats:
+        return ()
+
+    groups = list(json.loads(company_tag_stats).values())
+    if not groups or not groups[0]:
+        return ()
+
+    return tuple(groups[0])
+
+
+def to_record(
+    question: leetcode.models.graphql_question_detail.GraphqlQuestionDetail,
+) -> ProblemRecord:
+    """
+    Convert question details returned by the API to a compact record
+    """
+    stats = json.loads(question.stats) if question.stats else {}
+    topic_tags = tuple(tag.slug for tag in question.topic_tags or [])
+    company_stats = _company_stats(question.company_tag_stats)
+    difficulty = question.difficulty
+
+    # Tag groups for the Hierarchical Tags addon
+    tags = [f"LeetCode::topic::{tag}" for tag in topic_tags]
+    tags.extend(f"LeetCode::company::{entry['slug']}" for entry in company_stats)
+    tags.append(f"LeetCode::difficulty::{difficulty.lower()}")
+
+    return ProblemRecord(
+        slug=question.title_slug,
+        problem_id=question.question_frontend_id,
+        title=question.title,
+        category=question.category_title,
+        content=question.content,
+        difficulty=difficulty,
+        difficulty_html=DIFFICULTY_HTML.get(difficulty),
+        paid=question.is_paid_only,
+        likes=question.likes,
+        dislikes=question.dislikes,
+        submissions_total=int(stats.get("totalSubmissionRaw", 0)),
+        submissions_accepted=int(stats.get("totalAcceptedRaw", 0)),
+        freq_bar=question.freq_bar or 0,
+        topic_tags=topic_tags,
+        company_stats=company_stats,
+        total_times_encountered=sum(
+            entry["timesEncountered"] for entry in company_stats
+        ),
+        tags=tuple(tags),
+        hints=tuple(question.hints or ()),
+    )
+
+
+def with_lists(record: ProblemRecord, list_ids: Iterable[str]) -> ProblemRecord:
+    """
+    Record of a problem belonging to the lists, tagged with the lists. The
+    empty list id (all problems) is named ALL_PROBLEMS_LIST.
+    """
+    lists = tuple(list_id or ALL_PROBLEMS_LIST for list_id in list_ids)
+    return record._replace(
+        lists=lists,
+        tags=record.tags + tuple(f"LeetCode::list::{name}" for name in lists),
+    )
@@ -0,0 +1,152 @@
+# pylint: disable=missing-module-docstring
+import hashlib
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, NamedTuple, Optional, Type
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+_CONTENT_TYPES = {
+    ".apkg": "application/octet-stream",
+    ".json": "application/json",
+    ".ndjson": "application/x-ndjson",
+    ".gz": "application/gzip",
+    ".zst": "application/zstd",
+}
+
+
+class _File(NamedTuple):
+    data: bytes
+    etag: str
+    content_type: str
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches the entity tag
+    """
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    # Weak comparison, as required for If-None-Match
+    return "*" in candidates or etag in (
+        candidate[2:] if candidate.startswith("W/") else candidate
+        for candidate in candidates
+    )
+
+
+class DeckServer:
+    """
+    Local HTTP server serving the latest published files, e.g. the deck and
+    its JSON export, at /<file name>.
+
+    publish() takes a snapshot of a file, so a file being rebuilt is never
+    served half-written, and the snapshot is served until the next publish.
+    Every response carries an ETag (the hash of the content), and a request
+    with a matching If-None-Match gets 304 Not Modified without the body, so
+    clients download a file only when it has changed.
+
+    Usable as a context manager: the server runs in a background thread
+    while the block executes.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+        self._host = host
+        self._files: Dict[str, _File] = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self._host}:{self._httpd.server_port}"
+
+    def publish(self, path: str) -> bool:
+        """
+        Serve the current content of the file, return whether it changed
+        """
+        with open(path, "rb") as published_file:
+            data = published_file.read()
+
+        name = os.path.basename(path)
+        etag = f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+        with self._lock:
+            previous = self._files.get(name)
+            if previous is not None and previous.etag == etag:
+                return False
+            self._files[name] = _File(
+                data,
+                etag,
+                _CONTENT_TYPES.get(
+                    os.path.splitext(name)[1], "application/octet-stream"
+                ),
+            )
+
+        logging.info("Serving %s at %s/%s", path, self.url, name)
+        return True
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "DeckServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    def _get(self, name: str) -> Optional[_File]:
+        with self._lock:
+            return self._files.get(name)
+
+    def _handler(self) -> Type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                self._respond(body=True)
+
+            def do_HEAD(self) -> None:  # pylint: disable=invalid-name
+                self._respond(body=False)
+
+            def _respond(self, body: bool) -> None:
+                served = server._get(  # pylint: disable=protected-access
+                    self.path.split("?", 1)[0].lstrip("/")
+                )
+                if served is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                if _etag_matches(self.headers.get("If-None-Match", ""), served.etag):
+                    self.send_response(304)
+                    self.send_header("ETag", served.etag)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header("ETag", served.etag)
+                # Clients may keep the file, but have to check it's current
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Content-Type", served.content_type)
+                self.send_header("Content-Length", str(len(served.data)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(served.data)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        return Handler
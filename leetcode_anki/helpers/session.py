@@ -0,0 +1,98 @@
+# pylint: disable=missing-module-docstring
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Optional, Tuple
+
+import requests
+import urllib3  # type: ignore
+
+from leetcode_anki.helpers.cache import atomic_write
+
+LEETCODE_URL = "https://leetcode.com/"
+# CSRF tokens are kept in their own directory next to the API cache entries
+CSRF_CACHE_DIR = "csrf"
+# A cached CSRF token is used at most this long (in seconds), even if its
+# cookie expires later
+CSRF_TOKEN_TTL = 7 * 24 * 60 * 60
+# (connect, read) timeouts for getting the CSRF token in seconds
+REQUEST_TIMEOUT = (10, 60)
+# Compressions the HTTP client can decode, e.g. "gzip,deflate,br" if a
+# brotli package is installed
+ACCEPT_ENCODING: str = urllib3.util.request.ACCEPT_ENCODING
+
+
+def fetch_csrf_token(session_id: str) -> Tuple[str, Optional[float]]:
+    """
+    CSRF token of the session and the time its cookie expires (None for a
+    session cookie)
+    """
+    response = requests.get(
+        LEETCODE_URL,
+        cookies={"LEETCODE_SESSION": session_id},
+        headers={"Accept-Encoding": ACCEPT_ENCODING},
+        timeout=REQUEST_TIMEOUT,
+    )
+    for cookie in response.cookies:
+        if cookie.name == "csrftoken" and cookie.value:
+            return cookie.value, cookie.expires
+
+    raise ValueError(f"No CSRF token in the response from {LEETCODE_URL}")
+
+
+def _token_path(session_id: str, cache_dir: str) -> str:
+    """
+    Where the CSRF token of the session is cached, named after the hash of
+    the session id
+    """
+    digest = hashlib.sha256(session_id.encode("utf8")).hexdigest()
+    return os.path.join(cache_dir, CSRF_CACHE_DIR, digest + ".json")
+
+
+def get_csrf_token(
+    session_id: str, cache_dir: Optional[str] = None, ttl: float = CSRF_TOKEN_TTL
+) -> str:
+    """
+    CSRF token of the session, fetched from leetcode.com only if there's no
+    valid token cached in `cache_dir`.
+
+    Tokens are cached by the hash of the session id, so a new session gets a
+    new token. A cached token is used until its cookie expires, but at most
+    for `ttl` seconds.
+    """
+    path: Optional[str] = None
+    if cache_dir is not None:
+        path = _token_path(session_id, cache_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        try:
+            with open(path, "r", encoding="utf8") as token_file:
+                cached = json.load(token_file)
+            if time.time() < cached["expires"]:
+                return str(cached["token"])
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+    token, cookie_expires = fetch_csrf_token(session_id)
+    logging.debug("Got a new CSRF token")
+
+    if path is not None:
+        expires = time.time() + ttl
+        if cookie_expires is not None:
+            expires = min(expires, cookie_expires)
+        atomic_write(path, json.dumps({"token": token, "expires": expires}))
+
+    return token
+
+
+def forget_csrf_token(session_id: str, cache_dir: str) -> None:
+    """
+    Remove the cached CSRF token of the session, e.g. after the API refused
+    it, so get_csrf_token() fetches a new one
+    """
+    try:
+        os.unlink(_token_path(session_id, cache_dir))
+    except FileNotFoundError:
+        pass
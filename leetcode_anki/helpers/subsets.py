@@ -0,0 +1,218 @@
+# pylint: disable=missing-module-docstring
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import requests
+
+from leetcode_anki.helpers.cache import DEFAULT_TTL, atomic_write
+
+SUBSET_TAG_PREFIX = "LeetCode::subset::"
+ALL_SUBSET_TAG = SUBSET_TAG_PREFIX + "all"
+# Subset caches live in their own directory next to the API cache entries
+SUBSETS_CACHE_DIR = "subsets"
+# (connect, read) timeouts for downloading a remote subset in seconds
+REQUEST_TIMEOUT = (10, 60)
+GRIND75_URL = "https://www.techinterviewhandbook.org/grind75?mode=all&grouping=none&order=all_rounded"
+# Number of problems in the base (unsuspended) part of the Grind 75 list
+GRIND75_BASE_SIZE = 75
+
+
+def unique(slugs: Iterable[str]) -> List[str]:
+    """
+    Slugs in their original order with duplicates removed
+    """
+    return list(dict.fromkeys(slugs))
+
+
+def extract_slugs(text: str, pattern: str) -> List[str]:
+    """
+    Slugs matched by the pattern in the page, in page order without
+    duplicates
+    """
+    return unique(re.findall(pattern, text))
+
+
+def load_slug_file(path: str) -> List[str]:
+    """
+    Read an ordered list of slugs, one per line. Blank lines and lines
+    starting with `#` are ignored.
+    """
+    with open(path, "r", encoding="utf8") as slug_file:
+        return unique(
+            line.strip()
+            for line in slug_file
+            if line.strip() and not line.lstrip().startswith("#")
+        )
+
+
+def _cache_path(url: str, cache_dir: str) -> str:
+    """
+    Where the slugs of the page at `url` are stored, named after the hash of
+    the URL
+    """
+    digest = hashlib.sha256(url.encode("utf8")).hexdigest()
+    return os.path.join(cache_dir, SUBSETS_CACHE_DIR, digest + ".json")
+
+
+def stored_remote_slugs(url: str, cache_dir: str) -> Optional[List[str]]:
+    """
+    Slugs of the page at `url` as stored in `cache_dir` by
+    fetch_remote_slugs(), however old, without any request. None if they
+    were never stored.
+    """
+    try:
+        with open(_cache_path(url, cache_dir), "r", encoding="utf8") as cache_file:
+            return list(json.load(cache_file)["slugs"])
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
+
+
+def fetch_remote_slugs(
+    url: str,
+    pattern: str,
+    cache_dir: Optional[str] = None,
+    max_age: float = DEFAULT_TTL,
+) -> List[str]:
+    """
+    Slugs extracted from the page at `url` with the regex `pattern` (its
+    first group is the slug), in the order of the page.
+
+    If `cache_dir` is set, the extracted slugs are stored there with the
+    ETag and Last-Modified headers of the page. Within `max_age` seconds the
+    stored slugs are used without any request, after that the page is
+    requested conditionally and only downloaded and parsed again if it has
+    changed. If the page can't be fetched, stale slugs are used.
+    """
+    path: Optional[str] = None
+    cached: Optional[Dict[str, object]] = None
+    age = float("inf")
+
+    if cache_dir is not None:
+        path = _cache_path(url, cache_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        try:
+            with open(path, "r", encoding="utf8") as cache_file:
+                cached = json.load(cache_file)
+            age = time.time() - os.path.getmtime(path)
+        except (FileNotFoundError, ValueError):
+            cached = None
+            age = float("inf")
+
+        if cached is not None and age <= max_age:
+            return list(cached["slugs"])  # type: ignore
+
+    headers = {}
+    if cached is not None:
+        if cached.get("etag"):
+            headers["If-None-Match"] = str(cached["etag"])
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = str(cached["last_modified"])
+
+    try:
+        response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code != 304:
+            response.raise_for_status()
+    except requests.RequestException:
+        if cached is None:
+            raise
+        logging.warning("Can't fetch %s, using the stored list", url, exc_info=True)
+        return list(cached["slugs"])  # type: ignore
+
+    if response.status_code == 304 and cached is not None and path is not None:
+        logging.info("%s hasn't changed", url)
+        os.utime(path)
+        return list(cached["slugs"])  # type: ignore
+
+    slugs = extract_slugs(response.text, pattern)
+
+    if path is not None:
+        atomic_write(
+            path,
+            json.dumps(
+                {
+                    "url": url,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "slugs": slugs,
+                }
+            ),
+        )
+
+    return slugs
+
+
+class SubsetRegistry:
+    """
+    Ordered subsets of problems, e.g. the Grind 75 list.
+
+    Subsets are ranked in the order they are added, and problems within a
+    subset keep their order, so every problem gets a single rank across all
+    the subsets. A problem belongs to the first subset it was added to.
+
+    Cards of problems outside of all subsets and of subsets added with
+    `suspend=True` are suspended.
+    """
+
+    def __init__(self) -> None:
+        self._index: Dict[str, Tuple[str, int]] = {}
+        self._suspended: Set[str] = set()
+        self.names: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, slug: object) -> bool:
+        return slug in self._index
+
+    def add(self, name: str, slugs: Iterable[str], suspend: bool = False) -> None:
+        """
+        Add a subset ranked after all the subsets added before
+        """
+        if name in self.names:
+            raise ValueError(f"Subset {name} has already been added")
+
+        self.names.append(name)
+        if suspend:
+            self._suspended.add(name)
+
+        index = self._index
+        for slug in slugs:
+            if slug not in index:
+                index[slug] = (name, len(index))
+
+    def snapshot(self) -> Dict[str, object]:
+        """
+        Everything the registry holds as JSON-serializable values, e.g. to
+        hash it
+        """
+        return {
+            "names": self.names,
+            "suspended": sorted(self._suspended),
+            "index": self._index,
+        }
+
+    def get(self, slug: str) -> Optional[Tuple[str, int]]:
+        """
+        (subset, rank) of the problem or None if it isn't in any subset
+        """
+        return self._index.get(slug)
+
+    def rank(self, slug: str) -> Optional[int]:
+        entry = self._index.get(slug)
+        return entry[1] if entry is not None else None
+
+    def tags(self, slug: str) -> List[str]:
+        entry = self._index.get(slug)
+        if entry is None:
+            return [ALL_SUBSET_TAG]
+        return sorted([ALL_SUBSET_TAG, SUBSET_TAG_PREFIX + entry[0]])
+
+    def suspended(self, slug: str) -> bool:
+        entry = self._index.get(slug)
+        return entry is None or entry[0] in self._suspended
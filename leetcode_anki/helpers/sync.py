@@ -0,0 +1,439 @@
+# pylint: disable=missing-module-docstring
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import genanki  # type: ignore
+
+DEFAULT_BATCH_SIZE = 1000
+# Tags starting with this prefix are generated, all the other tags of a note
+# were added by the user and are kept
+GENERATED_TAG_PREFIX = "LeetCode::"
+
+_INSERT_NOTE_SQL = "INSERT INTO notes VALUES(?,?,?,?,?,?,?,?,?,?,?)"
+_INSERT_CARD_SQL = "INSERT INTO cards VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)"
+_UPDATE_NOTE_SQL = (
+    "UPDATE notes SET mod = ?, usn = -1, tags = ?, flds = ?, sfld = ?, csum = ? "
+    "WHERE id = ?"
+)
+
+
+def _checksum(field: str) -> int:
+    """
+    Checksum of the first field, which Anki uses to find duplicates
+    """
+    return int(hashlib.sha1(field.encode("utf8")).hexdigest()[:8], 16)
+
+
+def _format_tags(tags: Iterable[str]) -> str:
+    """
+    Tags as stored by Anki: sorted and separated (and surrounded) by spaces
+    """
+    ordered = sorted(set(tags), key=str.lower)
+    return " " + " ".join(ordered) + " " if ordered else ""
+
+
+def _unicase(first: str, second: str) -> int:
+    """
+    Case-insensitive collation Anki defines for the tags table
+    """
+    first, second = first.casefold(), second.casefold()
+    return (first > second) - (first < second)
+
+
+def _copy_collection(source: str, target: str) -> None:
+    """
+    Copy the collection with the SQLite backup API, which unlike copying the
+    file includes the changes still in the write-ahead log (Anki 2.1.28+
+    keeps collections in WAL mode)
+    """
+    source_connection = sqlite3.connect(source)
+    try:
+        target_connection = sqlite3.connect(target)
+        try:
+            source_connection.backup(target_connection)
+        finally:
+            target_connection.close()
+    finally:
+        source_connection.close()
+
+
+def _digest(fields: str, tags: str) -> bytes:
+    """
+    Digest of the note contents, independent of the order of the tags
+    """
+    data = f"{fields}\0{_format_tags(tags.split())}"
+    return hashlib.sha1(data.encode("utf8")).digest()
+
+
+class CollectionSync:
+    """
+    Updates notes of an existing Anki collection (`collection.anki2`) in
+    place, instead of importing a whole package.
+
+    Notes are matched by their GUID. A note is only updated if its fields or
+    tags changed, and new notes are added with new cards. Cards of existing
+    notes are never touched, so review history, scheduling and suspension
+    are preserved. Tags added by the user (without the LeetCode:: prefix)
+    are kept as well. Notes that are no longer generated are left alone.
+
+    The collection must already contain the note type and the deck, i.e. the
+    deck must have been imported from a package once. Anki must not be
+    running while the collection is changed.
+
+    Media files are copied into the media folder of the collection right
+    away (they are named after their content, so existing files are never
+    replaced).
+
+    If `output` is set, the collection is copied there and only the copy is
+    changed. Everything is written in a single transaction committed by
+    close(), discard() rolls it back. Used as a context manager, the changes
+    are committed on success and rolled back on an exception.
+    """
+
+    def __init__(
+        self,
+        collection: str,
+        model: genanki.Model,
+        output: Optional[str] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        if batch_size < 1:
+            raise ValueError(f"Batch size must be at least 1: {batch_size}")
+
+        if not os.path.isfile(collection):
+            raise ValueError(f"Collection not found: {collection}")
+
+        self._model = model
+        self._batch_size = batch_size
+        self._output: Optional[str] = None
+        self._path = collection
+        # Anki keeps media next to the collection, collection.anki2 has them
+        # in collection.media
+        self._media_dir = os.path.splitext(output or collection)[0] + ".media"
+        if output is not None:
+            self._output = output
+            self._path = output + ".tmp"
+            _copy_collection(collection, self._path)
+
+        self._connection: Optional[sqlite3.Connection] = sqlite3.connect(
+            self._path, isolation_level=None, timeout=1
+        )
+        self._connection.create_collation("unicase", _unicase)
+        self._timestamp = int(time.time())
+        self._inserted_notes: List[Tuple[Any, ...]] = []
+        self._inserted_cards: List[Tuple[Any, ...]] = []
+        self._updated_notes: List[Tuple[Any, ...]] = []
+        # Generated tags of the written notes, registered in the collection
+        # by close()
+        self._tags: Set[str] = set()
+        self.notes_added = 0
+        self.notes_updated = 0
+        self.notes_unchanged = 0
+
+        try:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._check_model()
+            self._deck_id = self._find_deck()
+            self._notes = self._load_notes()
+            self._note_ids = self._id_generator("notes")
+            self._card_ids = self._id_generator("cards")
+        except BaseException:
+            self.discard()
+            raise
+
+    @property
+    def notes_written(self) -> int:
+        """
+        Number of notes added or updated so far
+        """
+        return self.notes_added + self.notes_updated
+
+    def _execute(self, sql: str, parameters: Tuple[Any, ...] = ()) -> sqlite3.Cursor:
+        connection = self._connection
+        if connection is None:
+            raise ValueError("The collection has already been closed")
+        return connection.execute(sql, parameters)
+
+    def _check_model(self) -> None:
+        """
+        Make sure the collection has the note type with the same fields.
+        Collections of Anki 2.1.28+ keep note types in a table, older ones in
+        a JSON column.
+        """
+        model_id = self._model.model_id
+        try:
+            exists = self._execute(
+                "SELECT 1 FROM notetypes WHERE id = ?", (model_id,)
+            ).fetchone()
+            field_count = self._execute(
+                "SELECT count() FROM fields WHERE ntid = ?", (model_id,)
+            ).fetchone()[0]
+        except sqlite3.OperationalError:
+            (models_json,) = self._execute("SELECT models FROM col").fetchone()
+            model = json.loads(models_json).get(str(model_id))
+            exists = model is not None
+            field_count = len(model["flds"]) if model else 0
+
+        if not exists:
+            raise ValueError(
+                f"Note type {model_id} not found in {self._path}, import the deck "
+                "into the collection once before syncing"
+            )
+
+        if field_count != len(self._model.fields):
+            raise ValueError(
+                f"Note type {model_id} in {self._path} has {field_count} fields "
+                f"instead of {len(self._model.fields)}, import the deck again"
+            )
+
+    def _find_deck(self) -> int:
+        """
+        Deck of the cards of the note type. Anki may assign a new id to the
+        deck on import, so it's found through the existing cards.
+        """
+        row = self._execute(
+            "SELECT cards.did FROM cards JOIN notes ON notes.id = cards.nid "
+            "WHERE notes.mid = ? GROUP BY cards.did ORDER BY count() DESC LIMIT 1",
+            (self._model.model_id,),
+        ).fetchone()
+        if row is None:
+            raise ValueError(
+                f"No cards of note type {self._model.model_id} in {self._path}, "
+                "import the deck into the collection once before syncing"
+            )
+        return row[0]
+
+    def _load_notes(self) -> Dict[str, Tuple[int, int, bytes, str]]:
+        """
+        (id, note type, digest of fields and tags, user tags) of every note
+        by GUID. Only digests are kept, not the fields.
+        """
+        notes = {}
+        for note_id, guid, model_id, tags, fields in self._execute(
+            "SELECT id, guid, mid, tags, flds FROM notes"
+        ):
+            user_tags = " ".join(
+                tag for tag in tags.split() if not tag.startswith(GENERATED_TAG_PREFIX)
+            )
+            notes[guid] = (note_id, model_id, _digest(fields, tags), user_tags)
+        return notes
+
+    def _id_generator(self, table: str) -> Iterator[int]:
+        """
+        New ids are milliseconds like Anki's own, but always greater than
+        the existing ones
+        """
+        (max_id,) = self._execute(f"SELECT max(id) FROM {table}").fetchone()
+        next_id = max(int(time.time() * 1000), (max_id or 0) + 1)
+        while True:
+            yield next_id
+            next_id += 1
+
+    def add(self, note: genanki.Note) -> None:
+        """
+        Add the note if it's new or update it if its fields or tags changed
+        """
+        if len(note.fields) != len(self._model.fields):
+            raise ValueError(
+                f"Number of fields in the model ({len(self._model.fields)}) doesn't "
+                f"match the number of fields in the note ({len(note.fields)})"
+            )
+
+        guid = note.guid
+        fields = "\x1f".join(note.fields)
+        existing = self._notes.get(guid)
+
+        if existing is None:
+            tags = _format_tags(note.tags)
+            note_id = self._insert(note, guid, fields, tags)
+            self._notes[guid] = (
+                note_id,
+                self._model.model_id,
+                _digest(fields, tags),
+                "",
+            )
+        else:
+            note_id, model_id, digest, user_tags = existing
+            if model_id != self._model.model_id:
+                logging.warning(
+                    "Note %s has a different note type in the collection, skipping",
+                    note.fields[0],
+                )
+                return
+
+            tags = _format_tags(list(note.tags) + user_tags.split())
+            if _digest(fields, tags) == digest:
+                self.notes_unchanged += 1
+                return
+
+            self._updated_notes.append(
+                (
+                    self._timestamp,
+                    tags,
+                    fields,
+                    note.sort_field,
+                    _checksum(note.fields[0]),
+                    note_id,
+                )
+            )
+            self._notes[guid] = (note_id, model_id, _digest(fields, tags), user_tags)
+            self.notes_updated += 1
+
+        self._tags.update(note.tags)
+
+        if len(self._inserted_notes) + len(self._updated_notes) >= self._batch_size:
+            self._flush()
+
+    def add_media(self, path: str) -> None:
+        """
+        Copy the media file into the media folder of the collection
+        """
+        os.makedirs(self._media_dir, exist_ok=True)
+        target = os.path.join(self._media_dir, os.path.basename(path))
+        if not os.path.exists(target):
+            shutil.copyfile(path, target)
+
+    def _insert(self, note: genanki.Note, guid: str, fields: str, tags: str) -> int:
+        """
+        Queue the note and its cards for insertion, returns the id of the note
+        """
+        note_id = next(self._note_ids)
+        self._inserted_notes.append(
+            (
+                note_id,
+                guid,
+                self._model.model_id,
+                self._timestamp,
+                -1,  # usn, not synced to AnkiWeb yet
+                tags,
+                fields,
+                note.sort_field,
+                _checksum(note.fields[0]),
+                0,  # flags
+                "",  # data
+            )
+        )
+        for card in note.cards:
+            self._inserted_cards.append(
+                (
+                    next(self._card_ids),
+                    note_id,
+                    self._deck_id,
+                    card.ord,
+                    self._timestamp,
+                    -1,  # usn
+                    0,  # type, new
+                    -1 if card.suspend else 0,  # queue
+                    note.due,
+                    0,  # ivl
+                    0,  # factor
+                    0,  # reps
+                    0,  # lapses
+                    0,  # left
+                    0,  # odue
+                    0,  # odid
+                    0,  # flags
+                    "",  # data
+                )
+            )
+        self.notes_added += 1
+        return note_id
+
+    def _register_tags(self) -> None:
+        """
+        Add the tags of the written notes to the tags of the collection,
+        which Anki lists in the browser. Collections of Anki 2.1.28+ keep
+        them in a table, together with the parents of hierarchical tags,
+        older ones in a JSON column.
+        """
+        columns = [row[1] for row in self._execute("PRAGMA table_info(tags)")]
+        if columns:
+            tags = {
+                "::".join(parts[:end])
+                for parts in (tag.split("::") for tag in self._tags)
+                for end in range(1, len(parts) + 1)
+            }
+            if "collapsed" in columns:
+                sql = (
+                    "INSERT OR IGNORE INTO tags (tag, usn, collapsed) VALUES (?, -1, 0)"
+                )
+            else:
+                sql = "INSERT OR IGNORE INTO tags (tag, usn) VALUES (?, -1)"
+            for tag in sorted(tags):
+                self._execute(sql, (tag,))
+        else:
+            (tags_json,) = self._execute("SELECT tags FROM col").fetchone()
+            registered = json.loads(tags_json or "{}")
+            for tag in self._tags:
+                registered.setdefault(tag, -1)
+            self._execute("UPDATE col SET tags = ?", (json.dumps(registered),))
+
+    def _flush(self) -> None:
+        connection = self._connection
+        if connection is None:
+            raise ValueError("The collection has already been closed")
+
+        connection.executemany(_INSERT_NOTE_SQL, self._inserted_notes)
+        connection.executemany(_INSERT_CARD_SQL, self._inserted_cards)
+        connection.executemany(_UPDATE_NOTE_SQL, self._updated_notes)
+        self._inserted_notes.clear()
+        self._inserted_cards.clear()
+        self._updated_notes.clear()
+
+    def close(self) -> None:
+        """
+        Commit the changes
+        """
+        self._flush()
+        if self.notes_written:
+            self._register_tags()
+            # Tell Anki the collection changed since the last sync
+            self._execute("UPDATE col SET mod = ?", (int(time.time() * 1000),))
+
+        connection = self._connection
+        assert connection is not None
+        connection.execute("COMMIT")
+        connection.close()
+        self._connection = None
+
+        if self._output is not None:
+            os.replace(self._path, self._output)
+
+        logging.info(
+            "%s notes added, %s updated, %s unchanged in %s",
+            self.notes_added,
+            self.notes_updated,
+            self.notes_unchanged,
+            self._output or self._path,
+        )
+
+    def discard(self) -> None:
+        """
+        Roll back all the changes
+        """
+        if self._connection is not None:
+            if self._connection.in_transaction:
+                self._connection.execute("ROLLBACK")
+            self._connection.close()
+            self._connection = None
+
+        if self._output is not None and os.path.exists(self._path):
+            os.unlink(self._path)
+
+    def __enter__(self) -> "CollectionSync":
+        return self
+
+    def __exit__(self, exc_type: Any, *args: Any) -> None:
+        if self._connection is None:
+            return
+
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
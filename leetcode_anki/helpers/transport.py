@@ -0,0 +1,212 @@
+# pylint: disable=missing-module-docstring
+import gzip
+import hashlib
+import json
+import logging
+import os
+import urllib.parse
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import leetcode.rest  # type: ignore
+
+from leetcode_anki.helpers.cache import atomic_write
+
+_SUFFIX = ".json.gz"
+# Response headers carrying the session or the CSRF token, which must not end
+# up in snapshots that are shared or committed
+_CREDENTIAL_HEADERS = frozenset(
+    {"set-cookie", "cookie", "authorization", "proxy-authorization", "x-csrftoken"}
+)
+
+
+class RecordedResponse:
+    """
+    HTTP response loaded from a snapshot. Quacks like
+    `leetcode.rest.RESTResponse`, so the API client can deserialize it the
+    same way as a live response.
+    """
+
+    def __init__(
+        self, status: int, reason: str, headers: Dict[str, str], data: str
+    ) -> None:
+        self.status = status
+        self.reason = reason
+        self.data = data
+        self._headers = headers
+
+    def getheaders(self) -> Dict[str, str]:
+        return self._headers
+
+    def getheader(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self._headers.get(name, default)
+
+
+class SnapshotStore:
+    """
+    Directory of recorded HTTP responses, one gzipped JSON file per request.
+
+    Requests are identified by the method, the URL path and query, and the
+    request body, so a snapshot recorded against one host can be replayed
+    against any other.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    @staticmethod
+    def request_key(method: str, url: str, body: Any = None) -> str:
+        parts = urllib.parse.urlsplit(url)
+        data = json.dumps(
+            [method.upper(), parts.path, parts.query, body],
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(data.encode("utf8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(
+        self, method: str, url: str, body: Any = None
+    ) -> Optional[RecordedResponse]:
+        """
+        Recorded response to the request or None if it wasn't recorded
+        """
+        try:
+            with gzip.open(
+                self._path(self.request_key(method, url, body)), "rt", encoding="utf8"
+            ) as snapshot_file:
+                entry = json.load(snapshot_file)
+        except FileNotFoundError:
+            return None
+
+        return RecordedResponse(
+            entry["status"], entry["reason"], entry["headers"], entry["data"]
+        )
+
+    def put(  # pylint: disable=too-many-arguments
+        self,
+        method: str,
+        url: str,
+        body: Any,
+        status: int,
+        reason: str,
+        headers: Dict[str, str],
+        data: Union[str, bytes],
+    ) -> None:
+        """
+        Record the response to the request, without its credential headers
+        """
+        entry = {
+            "method": method.upper(),
+            "url": url,
+            "status": status,
+            "reason": reason,
+            "headers": {
+                name: value
+                for name, value in headers.items()
+                if name.lower() not in _CREDENTIAL_HEADERS
+            },
+            "data": data.decode("utf8") if isinstance(data, bytes) else data,
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write(
+            self._path(self.request_key(method, url, body)),
+            gzip.compress(json.dumps(entry).encode("utf8")),
+        )
+
+
+class _SnapshotRESTClient(leetcode.rest.RESTClientObject):
+    """
+    Base for REST clients of the API client working with snapshots.
+
+    `leetcode.rest.RESTClientObject` sends every request (GET, POST, etc.)
+    through `request()`, so overriding it is enough. The pool manager of the
+    parent class isn't needed, so its constructor isn't called.
+    """
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, store: SnapshotStore) -> None:
+        self.store = store
+
+    @staticmethod
+    def _snapshot_url(url: str, query_params: Optional[List[Tuple[str, Any]]]) -> str:
+        if not query_params:
+            return url
+        return url + "?" + urllib.parse.urlencode(query_params)
+
+
+class RecordingRESTClient(_SnapshotRESTClient):
+    """
+    Sends requests with the wrapped client and records every successful
+    response to the store
+    """
+
+    def __init__(
+        self, rest_client: leetcode.rest.RESTClientObject, store: SnapshotStore
+    ) -> None:
+        super().__init__(store)
+        self._rest_client = rest_client
+
+    def request(  # pylint: disable=too-many-arguments
+        self,
+        method: str,
+        url: str,
+        query_params: Optional[List[Tuple[str, Any]]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        post_params: Optional[List[Tuple[str, Any]]] = None,
+        body: Any = None,
+        _preload_content: bool = True,
+        _request_timeout: Any = None,
+    ) -> Any:
+        response = self._rest_client.request(
+            method,
+            url,
+            query_params=query_params,
+            headers=headers,
+            post_params=post_params,
+            body=body,
+            _preload_content=_preload_content,
+            _request_timeout=_request_timeout,
+        )
+
+        if _preload_content:
+            self.store.put(
+                method,
+                self._snapshot_url(url, query_params),
+                body,
+                response.status,
+                response.reason,
+                response.getheaders(),
+                response.data,
+            )
+
+        return response
+
+
+class ReplayRESTClient(_SnapshotRESTClient):
+    """
+    Serves responses from the store without touching the network
+    """
+
+    def request(  # pylint: disable=too-many-arguments
+        self,
+        method: str,
+        url: str,
+        query_params: Optional[List[Tuple[str, Any]]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        post_params: Optional[List[Tuple[str, Any]]] = None,
+        body: Any = None,
+        _preload_content: bool = True,
+        _request_timeout: Any = None,
+    ) -> Any:
+        url = self._snapshot_url(url, query_params)
+        response = self.store.get(method, url, body)
+        if response is None:
+            raise ValueError(
+                f"No recorded response for {method} {url} in {self.store.directory}, "
+                "record the snapshot again"
+            )
+
+        logging.debug("Replaying %s %s", method, url)
+        return response
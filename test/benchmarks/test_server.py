@@ -0,0 +1,295 @@
+from pathlib import Path
+from typing import Any, List
+from unittest import mock
+
+import pytest
+
+import benchmarks.run
+import benchmarks.server
+import leetcode_anki.helpers.columnar
+import leetcode_anki.helpers.leetcode
+
+
+def test_synthetic_question() -> None:
+    question = benchmarks.server.synthetic_question(41)
+
+    assert question["titleSlug"] == "problem-42"
+    assert question == benchmarks.server.synthetic_question(41)
+
+
+def test_respond() -> None:
+    server = benchmarks.server.FakeLeetcodeServer(10)
+    response = server.respond({"variables": {"skip": 8, "limit": 5}})
+
+    questions_list = response["data"]["problemsetQuestionList"]
+    assert questions_list["totalNum"] == 10
+    assert [q["questionFrontendId"] for q in questions_list["questions"]] == [
+        "9",
+        "10",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_fetch_from_server() -> None:
+    with benchmarks.server.FakeLeetcodeServer(25) as server, mock.patch.object(
+        leetcode_anki.helpers.leetcode,
+        "_get_leetcode_api_client",
+        lambda *args: benchmarks.run._api_client(server.url),
+    ):
+        leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(
+            0, 24, page_size=10, rate=1000
+        )
+
+        assert len(await leetcode_data.all_problems_handles()) == 25
+        assert await leetcode_data.title("problem-7") == "Problem 7"
+        # Count and three pages
+        assert server.requests == 4
+
+
+@pytest.mark.asyncio
+async def test_fetch_selection() -> None:
+    with benchmarks.server.FakeLeetcodeServer(5) as server, mock.patch.object(
+        leetcode_anki.helpers.leetcode,
+        "_get_leetcode_api_client",
+        lambda *args: benchmarks.run._api_client(server.url),
+    ):
+        leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(
+            0, 4, rate=1000, selection=("titleSlug", "difficulty")
+        )
+
+        assert len(await leetcode_data.all_problems_handles()) == 5
+        record = await leetcode_data.record("problem-3")
+        assert record.difficulty in benchmarks.server.DIFFICULTIES
+        assert record.content is None
+
+
+@pytest.mark.asyncio
+async def test_two_phase_fetch(tmp_path: Path) -> None:
+    with benchmarks.server.FakeLeetcodeServer(25) as server, mock.patch.object(
+        leetcode_anki.helpers.leetcode,
+        "_get_leetcode_api_client",
+        lambda *args: benchmarks.run._api_client(server.url),
+    ):
+        for _ in range(2):
+            leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(
+                0,
+                24,
+                page_size=25,
+                rate=1000,
+                cache_dir=str(tmp_path),
+                cache_ttl=0 if _ else 3600,
+                two_phase=True,
+            )
+            async for task_handles in leetcode_data.stream_problems_handles():
+                assert (await leetcode_data.record("problem-3")).content is None
+                await leetcode_data.fetch_details(["problem-3", "problem-5"])
+
+                record = await leetcode_data.record("problem-3")
+                assert (
+                    record.content == benchmarks.server.synthetic_question(2)["content"]
+                )
+                assert record.likes == benchmarks.server.synthetic_question(2)["likes"]
+
+        # Count, page and a batch of details, then only count and page: the
+        # details are cached as long as the listed problems don't change
+        assert server.requests == 5
+
+
+@pytest.mark.asyncio
+async def test_two_phase_fetch_removed_problem() -> None:
+    with benchmarks.server.FakeLeetcodeServer(
+        25, removed=[3]
+    ) as server, mock.patch.object(
+        leetcode_anki.helpers.leetcode,
+        "_get_leetcode_api_client",
+        lambda *args: benchmarks.run._api_client(server.url),
+    ):
+        leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(
+            0, 24, rate=1000, two_phase=True, batch_size=8
+        )
+        slugs = await leetcode_data.all_problems_handles()
+        await leetcode_data.fetch_details(slugs[:6])
+
+        # The batch is narrowed down to the removed problem, which keeps
+        # what was listed, and the rest of the batch gets its details
+        record = await leetcode_data.record("problem-4")
+        assert record.content is None
+        assert record.likes == benchmarks.server.synthetic_question(3)["likes"]
+        for slug in slugs[:6]:
+            if slug != "problem-4":
+                assert (await leetcode_data.record(slug)).content
+
+
+@pytest.mark.asyncio
+async def test_batch_size_adapts() -> None:
+    fetch_details_batch = (
+        leetcode_anki.helpers.leetcode.LeetcodeData._fetch_details_batch
+    )
+    batches = []
+
+    def fetch_small_batches(self: Any, problem_slugs: List[str], *args: Any) -> Any:
+        batches.append(len(problem_slugs))
+        if len(problem_slugs) > 2:
+            raise leetcode_anki.helpers.leetcode._BatchError("Too complex")
+        return fetch_details_batch(self, problem_slugs, *args)
+
+    with benchmarks.server.FakeLeetcodeServer(25) as server, mock.patch.object(
+        leetcode_anki.helpers.leetcode,
+        "_get_leetcode_api_client",
+        lambda *args: benchmarks.run._api_client(server.url),
+    ), mock.patch.object(
+        leetcode_anki.helpers.leetcode.LeetcodeData,
+        "_fetch_details_batch",
+        fetch_small_batches,
+    ):
+        leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(
+            0, 24, rate=1000, two_phase=True, batch_size=8, concurrency=1
+        )
+        slugs = await leetcode_data.all_problems_handles()
+        await leetcode_data.fetch_details(slugs[:6])
+
+        # Halved after every failure, grown again after successes
+        assert batches[:3] == [6, 3, 1]
+        assert sum(size for size in batches if size <= 2) == 6
+        assert max(batches[3:]) == 2
+        for slug in slugs[:6]:
+            assert (await leetcode_data.record(slug)).content
+
+
+@pytest.mark.asyncio
+async def test_fetch_lists(tmp_path: Path) -> None:
+    lists = {"a": [0, 1, 2, 3], "b": [2, 3, 4], "c": [3, 5]}
+    with benchmarks.server.FakeLeetcodeServer(
+        10, lists=lists
+    ) as server, mock.patch.object(
+        leetcode_anki.helpers.leetcode,
+        "_get_leetcode_api_client",
+        lambda *args: benchmarks.run._api_client(server.url),
+    ):
+        for _ in range(2):
+            leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(
+                0, 10000, rate=1000, list_id=["a", "b", "c"], cache_dir=str(tmp_path)
+            )
+
+            assert await leetcode_data.all_problems_handles() == [
+                f"problem-{number + 1}" for number in range(6)
+            ]
+            record = await leetcode_data.record("problem-4")
+            assert record.lists == ("a", "b", "c")
+            assert "LeetCode::list::c" in record.tags
+            assert (await leetcode_data.record("problem-1")).lists == ("a",)
+            assert record.content == benchmarks.server.synthetic_question(3)["content"]
+            assert await leetcode_data.select("list:b AND NOT list:a") == ["problem-5"]
+
+        # Count and membership of every list, then a single batch of the
+        # six unique problems. The second run is served from the cache.
+        assert server.requests == 7
+
+
+@pytest.mark.asyncio
+async def test_fetch_lists_removed_problem() -> None:
+    lists = {"a": [0, 1, 2, 3], "b": [2, 3, 4]}
+    with benchmarks.server.FakeLeetcodeServer(
+        10, lists=lists, removed=[2]
+    ) as server, mock.patch.object(
+        leetcode_anki.helpers.leetcode,
+        "_get_leetcode_api_client",
+        lambda *args: benchmarks.run._api_client(server.url),
+    ):
+        leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(
+            0, 10000, rate=1000, list_id=["a", "b"]
+        )
+
+        # The removed problem is left out, the other ones of its batch are
+        # still fetched
+        assert await leetcode_data.all_problems_handles() == [
+            "problem-1",
+            "problem-2",
+            "problem-4",
+            "problem-5",
+        ]
+        assert (await leetcode_data.record("problem-4")).lists == ("a", "b")
+
+
+@pytest.mark.asyncio
+async def test_snapshot_hash() -> None:
+    with benchmarks.server.FakeLeetcodeServer(25) as server, mock.patch.object(
+        leetcode_anki.helpers.leetcode,
+        "_get_leetcode_api_client",
+        lambda *args: benchmarks.run._api_client(server.url),
+    ):
+        hashes = []
+        for stop in (24, 24, 19):
+            leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(
+                0, stop, page_size=10, rate=1000
+            )
+            with pytest.raises(ValueError):
+                leetcode_data.snapshot_hash()
+            async for _ in leetcode_data.stream_problems_handles(hash_snapshot=True):
+                pass
+            hashes.append(leetcode_data.snapshot_hash())
+
+        assert hashes[0] == hashes[1] != hashes[2]
+        # Count and a page per ten problems for every stream, nothing is
+        # fetched twice
+        assert server.requests == 4 + 4 + 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("list_id", ["", ["a", "b"]])
+async def test_stored_snapshot_hash(tmp_path: Path, list_id: Any) -> None:
+    with benchmarks.server.FakeLeetcodeServer(25) as server, mock.patch.object(
+        leetcode_anki.helpers.leetcode,
+        "_get_leetcode_api_client",
+        lambda *args: benchmarks.run._api_client(server.url),
+    ):
+        hashes = []
+        for _ in range(2):
+            leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(
+                0, 24, page_size=10, rate=1000, list_id=list_id, cache_dir=str(tmp_path)
+            )
+            hashes.append(leetcode_data.stored_snapshot_hash())
+            async for _ in leetcode_data.stream_problems_handles(hash_snapshot=True):
+                pass
+            hashes.append(leetcode_data.snapshot_hash())
+        requests = server.requests
+
+        # Nothing is stored before the first fetch, then the stored problems
+        # hash the same as the streamed ones, without any request
+        assert hashes[0] is None
+        assert hashes[1] == hashes[2] == hashes[3]
+        assert server.requests == requests
+
+        leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(
+            0, 24, page_size=5, rate=1000, list_id=list_id, cache_dir=str(tmp_path)
+        )
+        if isinstance(list_id, list):
+            # Problems are cached one by one, whatever the page size
+            assert leetcode_data.stored_snapshot_hash() is not None
+        else:
+            assert leetcode_data.stored_snapshot_hash() is None
+
+
+@pytest.mark.asyncio
+async def test_columnar_snapshots(tmp_path: Path) -> None:
+    pytest.importorskip("pyarrow")
+
+    with benchmarks.server.FakeLeetcodeServer(25) as server, mock.patch.object(
+        leetcode_anki.helpers.leetcode,
+        "_get_leetcode_api_client",
+        lambda *args: benchmarks.run._api_client(server.url),
+    ):
+        leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(
+            0, 24, page_size=10, rate=1000, columnar_dir=str(tmp_path)
+        )
+        assert len(await leetcode_data.all_problems_handles()) == 25
+
+        leetcode_data.refresh()
+        slugs = []
+        async for page in leetcode_data.stream_problems_handles():
+            slugs.extend(page)
+
+    store = leetcode_anki.helpers.columnar.ColumnarStore(str(tmp_path))
+    assert len(store.snapshots()) == 2
+    problems = store.history(leetcode_anki.helpers.columnar.PROBLEMS_TABLE)
+    assert problems.column("slug").to_pylist() == slugs * 2
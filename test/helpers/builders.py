@@ -0,0 +1,44 @@
+import json
+
+import leetcode.models.graphql_question_detail  # type: ignore
+import leetcode.models.graphql_question_topic_tag  # type: ignore
+
+import leetcode_anki.helpers.records
+
+COMPANY_TAG_STATS = {
+    "1": [
+        {"slug": "google", "timesEncountered": 3},
+        {"slug": "amazon", "timesEncountered": 2},
+    ],
+    "2": [{"slug": "facebook", "timesEncountered": 100}],
+}
+
+
+def question(
+    **kwargs: object,
+) -> leetcode.models.graphql_question_detail.GraphqlQuestionDetail:
+    fields = dict(
+        question_frontend_id="1",
+        title="Two Sum",
+        title_slug="two-sum",
+        category_title="Algorithms",
+        content="<p>test</p>",
+        is_paid_only=False,
+        difficulty="Easy",
+        likes=10,
+        dislikes=2,
+        freq_bar=None,
+        topic_tags=[
+            leetcode.models.graphql_question_topic_tag.GraphqlQuestionTopicTag(
+                name="Array", slug="array"
+            )
+        ],
+        stats='{"totalSubmissionRaw": 20, "totalAcceptedRaw": "10"}',
+        company_tag_stats=json.dumps(COMPANY_TAG_STATS),
+    )
+    fields.update(kwargs)
+    return leetcode.models.graphql_question_detail.GraphqlQuestionDetail(**fields)
+
+
+def record(**kwargs: object) -> leetcode_anki.helpers.records.ProblemRecord:
+    return leetcode_anki.helpers.records.to_record(question(**kwargs))
@@ -0,0 +1,110 @@
+import json
+import sqlite3
+import zipfile
+from pathlib import Path
+from typing import Any, List, Tuple
+
+import genanki  # type: ignore
+import pytest
+
+import leetcode_anki.helpers.apkg
+
+MODEL = genanki.Model(
+    1234,
+    "Test model",
+    fields=[{"name": "Front"}, {"name": "Back"}],
+    templates=[{"name": "Card", "qfmt": "{{Front}}", "afmt": "{{Back}}"}],
+)
+TIMESTAMP = 1700000000.0
+
+
+def notes() -> List[genanki.Note]:
+    result = []
+    for i in range(5):
+        note = genanki.Note(
+            model=MODEL, fields=[f"front {i}", f"back {i}"], tags=["a", f"t{i}"]
+        )
+        note.due = 5 - i
+        if i % 2:
+            for card in note.cards:
+                card.suspend = True
+        result.append(note)
+    return result
+
+
+def read_collection(path: Path, tmp_path: Path) -> Tuple[List[Any], ...]:
+    with zipfile.ZipFile(path) as package:
+        package.extract("collection.anki2", tmp_path / path.stem)
+
+    connection = sqlite3.connect(tmp_path / path.stem / "collection.anki2")
+    try:
+        return tuple(
+            connection.execute(f"SELECT * FROM {table} ORDER BY id").fetchall()
+            for table in ("col", "notes", "cards")
+        )
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize("compression_level", [0, 6])
+def test_same_as_genanki(tmp_path: Path, compression_level: int) -> None:
+    deck = genanki.Deck(42, "Test")
+    for note in notes():
+        deck.add_note(note)
+    genanki.Package(deck).write_to_file(tmp_path / "genanki.apkg", TIMESTAMP)
+
+    with leetcode_anki.helpers.apkg.ApkgWriter(
+        str(tmp_path / "writer.apkg"),
+        genanki.Deck(42, "Test"),
+        [MODEL],
+        timestamp=TIMESTAMP,
+        batch_size=2,
+        compression_level=compression_level,
+    ) as writer:
+        for note in notes():
+            writer.add(note)
+
+    assert writer.notes_written == 5
+    assert read_collection(tmp_path / "writer.apkg", tmp_path) == read_collection(
+        tmp_path / "genanki.apkg", tmp_path
+    )
+
+
+def test_discard_on_error(tmp_path: Path) -> None:
+    output_file = tmp_path / "deck.apkg"
+
+    with pytest.raises(RuntimeError):
+        with leetcode_anki.helpers.apkg.ApkgWriter(
+            str(output_file), genanki.Deck(42, "Test"), [MODEL]
+        ) as writer:
+            writer.add(notes()[0])
+            raise RuntimeError
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_wrong_fields(tmp_path: Path) -> None:
+    with leetcode_anki.helpers.apkg.ApkgWriter(
+        str(tmp_path / "deck.apkg"), genanki.Deck(42, "Test"), [MODEL]
+    ) as writer:
+        with pytest.raises(ValueError):
+            writer.add(genanki.Note(model=MODEL, fields=["front"]))
+        writer.discard()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_media(tmp_path: Path) -> None:
+    image = tmp_path / "0123.png"
+    image.write_bytes(b"image")
+
+    with leetcode_anki.helpers.apkg.ApkgWriter(
+        str(tmp_path / "deck.apkg"), genanki.Deck(42, "Test"), [MODEL]
+    ) as writer:
+        writer.add(notes()[0])
+        writer.add_media(str(image))
+        writer.add_media(str(image))
+
+    with zipfile.ZipFile(tmp_path / "deck.apkg") as package:
+        assert json.loads(package.read("media")) == {"0": "0123.png"}
+        assert package.read("0") == b"image"
@@ -0,0 +1,45 @@
+import os
+import pathlib
+import time
+
+import leetcode_anki.helpers.cache
+
+
+class TestDiskCache:
+    def test_get_missing(self, tmp_path: pathlib.Path) -> None:
+        cache = leetcode_anki.helpers.cache.DiskCache(str(tmp_path))
+
+        assert cache.get("test") is None
+
+    def test_set_get(self, tmp_path: pathlib.Path) -> None:
+        cache = leetcode_anki.helpers.cache.DiskCache(str(tmp_path))
+        cache.set("test", "value")
+
+        assert cache.get("test") == "value"
+        assert leetcode_anki.helpers.cache.DiskCache(str(tmp_path)).get("test") == (
+            "value"
+        )
+        assert [p.suffix for p in tmp_path.iterdir()] == [".json"]
+
+    def test_ttl(self, tmp_path: pathlib.Path) -> None:
+        cache = leetcode_anki.helpers.cache.DiskCache(str(tmp_path), ttl=60)
+        cache.set("test", "value")
+
+        (path,) = tmp_path.iterdir()
+        old = time.time() - 120
+        os.utime(path, (old, old))
+
+        assert cache.get("test") is None
+        assert cache.get("test", ttl=180) == "value"
+
+    def test_eviction(self, tmp_path: pathlib.Path) -> None:
+        cache = leetcode_anki.helpers.cache.DiskCache(str(tmp_path), max_size=25)
+
+        for i in range(3):
+            cache.set(f"test{i}", "x" * 10)
+            mtime = time.time() - 10 + i
+            os.utime(cache._path(f"test{i}"), (mtime, mtime))
+
+        assert cache.get("test0") is None
+        assert cache.get("test1") == "x" * 10
+        assert cache.get("test2") == "x" * 10
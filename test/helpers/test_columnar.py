@@ -0,0 +1,106 @@
+import datetime
+import importlib.util
+import sys
+from pathlib import Path
+from test.helpers.test_leetcode import QUESTION_DETAIL
+from typing import List
+
+import pytest
+
+import leetcode_anki.helpers.columnar
+import leetcode_anki.helpers.records
+
+requires_pyarrow = pytest.mark.skipif(
+    importlib.util.find_spec("pyarrow") is None, reason="pyarrow is not installed"
+)
+
+
+def records() -> List[leetcode_anki.helpers.records.ProblemRecord]:
+    record = leetcode_anki.helpers.records.to_record(QUESTION_DETAIL)
+    return [
+        record._replace(
+            slug="a",
+            company_stats=(
+                {"slug": "google", "timesEncountered": 3},
+                {"slug": "amazon", "timesEncountered": 1},
+            ),
+        ),
+        record._replace(slug="b", category=None),
+    ]
+
+
+@requires_pyarrow
+def test_snapshot(tmp_path: Path) -> None:
+    taken_at = datetime.datetime(2024, 5, 6, 7, 8, 9, tzinfo=datetime.timezone.utc)
+    with leetcode_anki.helpers.columnar.ColumnarSnapshot(
+        str(tmp_path), taken_at
+    ) as snapshot:
+        snapshot.add(records()[:1])
+        snapshot.add(records()[1:])
+
+    assert snapshot.problems_written == 2
+    store = leetcode_anki.helpers.columnar.ColumnarStore(str(tmp_path))
+    (name,) = store.snapshots()
+    assert store.taken_at(name) == taken_at
+
+    problems = store.read(leetcode_anki.helpers.columnar.PROBLEMS_TABLE)
+    assert problems.column("slug").to_pylist() == ["a", "b"]
+    assert problems.column("category").to_pylist() == [
+        QUESTION_DETAIL.category_title,
+        None,
+    ]
+    assert problems.column("topic_tags").to_pylist() == [["test-tag"]] * 2
+    assert "content" not in problems.column_names
+
+    company_stats = store.read(leetcode_anki.helpers.columnar.COMPANY_STATS_TABLE)
+    assert company_stats.to_pylist() == [
+        {"slug": "a", "company": "google", "times_encountered": 3},
+        {"slug": "a", "company": "amazon", "times_encountered": 1},
+    ]
+
+
+@requires_pyarrow
+def test_discard(tmp_path: Path) -> None:
+    with pytest.raises(RuntimeError):
+        with leetcode_anki.helpers.columnar.ColumnarSnapshot(str(tmp_path)) as snapshot:
+            snapshot.add(records())
+            raise RuntimeError()
+
+    assert list(tmp_path.iterdir()) == []
+    store = leetcode_anki.helpers.columnar.ColumnarStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        store.read(leetcode_anki.helpers.columnar.PROBLEMS_TABLE)
+
+
+@requires_pyarrow
+def test_history(tmp_path: Path) -> None:
+    days = [
+        datetime.datetime(2024, 1, day, tzinfo=datetime.timezone.utc) for day in (2, 1)
+    ]
+    for day, likes in zip(days, (20, 10)):
+        with leetcode_anki.helpers.columnar.ColumnarSnapshot(
+            str(tmp_path), day
+        ) as snapshot:
+            snapshot.add(record._replace(likes=likes) for record in records())
+
+    store = leetcode_anki.helpers.columnar.ColumnarStore(str(tmp_path))
+    # The latest snapshot by default
+    assert store.read(leetcode_anki.helpers.columnar.PROBLEMS_TABLE).column(
+        "likes"
+    ).to_pylist() == [20, 20]
+
+    history = store.history(leetcode_anki.helpers.columnar.PROBLEMS_TABLE)
+    assert history.column("taken_at").to_pylist() == [days[1]] * 2 + [days[0]] * 2
+    assert history.column("likes").to_pylist() == [10, 10, 20, 20]
+    assert (
+        store.history(leetcode_anki.helpers.columnar.COMPANY_STATS_TABLE).num_rows == 4
+    )
+
+
+def test_without_pyarrow(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+
+    with pytest.raises(ValueError, match="pyarrow"):
+        leetcode_anki.helpers.columnar.ColumnarSnapshot(str(tmp_path))
+
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,121 @@
+import gzip
+import json
+import sys
+from pathlib import Path
+from test.helpers.test_apkg import notes
+from test.helpers.test_leetcode import QUESTION_DETAIL
+from typing import Callable, List
+
+import pytest
+
+import leetcode_anki.helpers.export
+import leetcode_anki.helpers.records
+
+
+def test_export(tmp_path: Path) -> None:
+    path = tmp_path / "deck.json"
+
+    with leetcode_anki.helpers.export.JsonExport(str(path)) as export:
+        for note in notes():
+            export.add(note)
+
+    exported = json.loads(path.read_text())
+    assert export.notes_written == len(exported) == 5
+    assert exported[1] == {
+        "guid": notes()[1].guid,
+        "fields": {"Front": "front 1", "Back": "back 1"},
+        "tags": ["a", "t1"],
+        "due": 4,
+        "suspended": True,
+    }
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_empty(tmp_path: Path) -> None:
+    path = tmp_path / "deck.json"
+
+    with leetcode_anki.helpers.export.JsonExport(str(path)):
+        pass
+
+    assert json.loads(path.read_text()) == []
+
+
+def test_discard(tmp_path: Path) -> None:
+    path = tmp_path / "deck.json"
+    path.write_text("[]")
+
+    with pytest.raises(RuntimeError):
+        with leetcode_anki.helpers.export.JsonExport(str(path)) as export:
+            export.add(notes()[0])
+            raise RuntimeError()
+
+    assert path.read_text() == "[]"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def records() -> List[leetcode_anki.helpers.records.ProblemRecord]:
+    record = leetcode_anki.helpers.records.to_record(QUESTION_DETAIL)
+    return [record._replace(slug=f"test-{i}", problem_id=str(i)) for i in range(3)]
+
+
+@pytest.mark.parametrize(
+    "name, read",
+    [
+        ("problems.ndjson", lambda path: path.read_text()),
+        (
+            "problems.ndjson.gz",
+            lambda path: gzip.decompress(path.read_bytes()).decode(),
+        ),
+    ],
+)
+def test_problem_export(tmp_path: Path, name: str, read: Callable[[Path], str]) -> None:
+    path = tmp_path / name
+
+    with leetcode_anki.helpers.export.ProblemExport(str(path)) as export:
+        for record in records():
+            export.add(record, record.tags + ("extra",))
+
+    lines = read(path).splitlines()
+    assert export.problems_written == len(lines) == 3
+    problem = json.loads(lines[1])
+    assert problem["slug"] == "test-1"
+    assert problem["problem_id"] == "1"
+    assert problem["difficulty"] == "Hard"
+    assert problem["tags"][-1] == "extra"
+    assert "difficulty_html" not in problem
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_problem_export_gzip_reproducible(tmp_path: Path) -> None:
+    contents = []
+    for name in ("a.ndjson.gz", "b.ndjson.gz"):
+        with leetcode_anki.helpers.export.ProblemExport(str(tmp_path / name)) as export:
+            for record in records():
+                export.add(record, record.tags)
+        contents.append((tmp_path / name).read_bytes())
+
+    assert contents[0] == contents[1]
+
+
+def test_problem_export_discard(tmp_path: Path) -> None:
+    path = tmp_path / "problems.ndjson.gz"
+
+    with pytest.raises(RuntimeError):
+        with leetcode_anki.helpers.export.ProblemExport(str(path)) as export:
+            export.add(records()[0], ())
+            raise RuntimeError()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_problem_export_without_zstandard(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setitem(sys.modules, "zstandard", None)
+
+    with pytest.raises(ValueError, match="zstandard"):
+        leetcode_anki.helpers.export.ProblemExport(
+            str(tmp_path / "problems.ndjson.zst")
+        )
+
+    assert list(tmp_path.iterdir()) == []
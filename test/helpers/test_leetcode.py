@@ -1,4 +1,5 @@
-from typing import Dict, List, Optional
+from pathlib import Path
+from typing import Any, Dict, List, Optional
 from unittest import mock
 
 import leetcode.models.graphql_data  # type: ignore
@@ -11,9 +12,12 @@ import leetcode.models.graphql_response  # type: ignore
 import leetcode.models.problems  # type: ignore
 import leetcode.models.stat  # type: ignore
 import leetcode.models.stat_status_pair  # type: ignore
+import leetcode.rest  # type: ignore
 import pytest
+import urllib3  # type: ignore
 
 import leetcode_anki.helpers.leetcode
+import leetcode_anki.helpers.records
 
 QUESTION_DETAIL = leetcode.models.graphql_question_detail.GraphqlQuestionDetail(
     freq_bar=1.1,
@@ -67,6 +71,29 @@ QUESTION_DETAIL = leetcode.models.graphql_question_detail.GraphqlQuestionDetail(
     env_info="{}",
 )
 
+# Only the fields requested by the problemset page query
+PAGE_QUESTION_DETAIL = leetcode.models.graphql_question_detail.GraphqlQuestionDetail(
+    question_frontend_id="1",
+    title="test title",
+    title_slug="test",
+    category_title="Algorithms",
+    freq_bar=1.1,
+    content="test content",
+    is_paid_only=False,
+    difficulty="Hard",
+    likes=1,
+    dislikes=1,
+    topic_tags=[
+        leetcode.models.graphql_question_topic_tag.GraphqlQuestionTopicTag(
+            name="test tag",
+            slug="test-tag",
+        )
+    ],
+    stats='{"totalSubmissionRaw": 1, "totalAcceptedRaw": 1}',
+    hints=["test hint 1", "test hint 2"],
+    company_tag_stats="{}",
+)
+
 
 def dummy_return_question_detail_dict(
     question_detail: leetcode.models.graphql_question_detail.GraphqlQuestionDetail,
@@ -75,7 +102,10 @@ def dummy_return_question_detail_dict(
 
 
 @mock.patch("os.environ", mock.MagicMock(return_value={"LEETCODE_SESSION_ID": "test"}))
-@mock.patch("leetcode.auth", mock.MagicMock())
+@mock.patch(
+    "leetcode_anki.helpers.session.fetch_csrf_token",
+    mock.Mock(return_value=("test", None)),
+)
 class TestLeetcode:
     # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
     #  `pytest.mark.asyncio`.
@@ -102,6 +132,66 @@ class TestLeetcode:
 
         assert func.call_count == 3
 
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_retry_coroutine(self) -> None:
+        decorator = leetcode_anki.helpers.leetcode.retry(
+            times=3, exceptions=(RuntimeError,), delay=0.01
+        )
+        func = mock.AsyncMock(side_effect=[RuntimeError, "test"])
+
+        with mock.patch("asyncio.sleep", mock.AsyncMock()) as sleep:
+            assert (await decorator(func)()) == "test"
+
+        assert func.await_count == 2
+        sleep.assert_awaited_once()
+
+    @mock.patch("time.sleep")
+    def test_retry_backoff(self, sleep: mock.Mock) -> None:
+        decorator = leetcode_anki.helpers.leetcode.retry(
+            times=4, exceptions=(RuntimeError,), delay=1, max_delay=3
+        )
+        func = mock.Mock(side_effect=[RuntimeError, RuntimeError, RuntimeError, "test"])
+
+        assert decorator(func)() == "test"
+
+        delays = [call.args[0] for call in sleep.call_args_list]
+        assert 0.5 <= delays[0] <= 1
+        assert 1 <= delays[1] <= 2
+        assert 1.5 <= delays[2] <= 3
+
+    @mock.patch("time.sleep")
+    def test_retry_after(self, sleep: mock.Mock) -> None:
+        decorator = leetcode_anki.helpers.leetcode.retry(
+            times=2,
+            exceptions=(leetcode.rest.ApiException,),
+            delay=0.01,
+            retry_if=leetcode_anki.helpers.leetcode._is_transient,
+        )
+        exc = leetcode.rest.ApiException(status=429)
+        exc.headers = {"Retry-After": "30"}
+        func = mock.Mock(side_effect=[exc, "test"])
+
+        assert decorator(func)() == "test"
+        sleep.assert_called_once_with(30.0)
+
+    @mock.patch("time.sleep")
+    def test_retry_not_transient(self, sleep: mock.Mock) -> None:
+        decorator = leetcode_anki.helpers.leetcode.retry(
+            times=3,
+            exceptions=(leetcode.rest.ApiException,),
+            delay=0.01,
+            retry_if=leetcode_anki.helpers.leetcode._is_transient,
+        )
+        func = mock.Mock(side_effect=leetcode.rest.ApiException(status=403))
+
+        with pytest.raises(leetcode.rest.ApiException):
+            decorator(func)()
+
+        assert func.call_count == 1
+        sleep.assert_not_called()
+
 
 @mock.patch("leetcode_anki.helpers.leetcode._get_leetcode_api_client", mock.Mock())
 class TestLeetcodeData:
@@ -146,7 +236,9 @@ class TestLeetcodeData:
         mock.Mock(return_value=[QUESTION_DETAIL]),
     )
     async def test_init(self) -> None:
-        self._leetcode_data._cache["test"] = QUESTION_DETAIL
+        self._leetcode_data._cache["test"] = leetcode_anki.helpers.records.to_record(
+            QUESTION_DETAIL
+        )
 
     # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
     #  `pytest.mark.asyncio`.
@@ -156,7 +248,9 @@ class TestLeetcodeData:
         mock.Mock(return_value=[QUESTION_DETAIL]),
     )
     async def test_get_description(self) -> None:
-        self._leetcode_data._cache["test"] = QUESTION_DETAIL
+        self._leetcode_data._cache["test"] = leetcode_anki.helpers.records.to_record(
+            QUESTION_DETAIL
+        )
         assert (await self._leetcode_data.description("test")) == "test content"
 
     # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
@@ -167,7 +261,9 @@ class TestLeetcodeData:
         mock.Mock(return_value=[QUESTION_DETAIL]),
     )
     async def test_submissions(self) -> None:
-        self._leetcode_data._cache["test"] = QUESTION_DETAIL
+        self._leetcode_data._cache["test"] = leetcode_anki.helpers.records.to_record(
+            QUESTION_DETAIL
+        )
         assert (await self._leetcode_data.description("test")) == "test content"
         assert (await self._leetcode_data.submissions_total("test")) == 1
         assert (await self._leetcode_data.submissions_accepted("test")) == 1
@@ -180,9 +276,10 @@ class TestLeetcodeData:
         mock.Mock(return_value=[QUESTION_DETAIL]),
     )
     async def test_difficulty_easy(self) -> None:
-        self._leetcode_data._cache["test"] = QUESTION_DETAIL
-
         QUESTION_DETAIL.difficulty = "Easy"
+        self._leetcode_data._cache["test"] = leetcode_anki.helpers.records.to_record(
+            QUESTION_DETAIL
+        )
         assert "Easy" in (await self._leetcode_data.difficulty("test"))
 
     # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
@@ -193,9 +290,10 @@ class TestLeetcodeData:
         mock.Mock(return_value=[QUESTION_DETAIL]),
     )
     async def test_difficulty_medium(self) -> None:
-        self._leetcode_data._cache["test"] = QUESTION_DETAIL
-
         QUESTION_DETAIL.difficulty = "Medium"
+        self._leetcode_data._cache["test"] = leetcode_anki.helpers.records.to_record(
+            QUESTION_DETAIL
+        )
         assert "Medium" in (await self._leetcode_data.difficulty("test"))
 
     # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
@@ -206,9 +304,10 @@ class TestLeetcodeData:
         mock.Mock(return_value=[QUESTION_DETAIL]),
     )
     async def test_difficulty_hard(self) -> None:
-        self._leetcode_data._cache["test"] = QUESTION_DETAIL
-
         QUESTION_DETAIL.difficulty = "Hard"
+        self._leetcode_data._cache["test"] = leetcode_anki.helpers.records.to_record(
+            QUESTION_DETAIL
+        )
         assert "Hard" in (await self._leetcode_data.difficulty("test"))
 
     # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
@@ -219,7 +318,9 @@ class TestLeetcodeData:
         mock.Mock(return_value=[QUESTION_DETAIL]),
     )
     async def test_paid(self) -> None:
-        self._leetcode_data._cache["test"] = QUESTION_DETAIL
+        self._leetcode_data._cache["test"] = leetcode_anki.helpers.records.to_record(
+            QUESTION_DETAIL
+        )
 
         assert (await self._leetcode_data.paid("test")) is False
 
@@ -231,7 +332,9 @@ class TestLeetcodeData:
         mock.Mock(return_value=[QUESTION_DETAIL]),
     )
     async def test_problem_id(self) -> None:
-        self._leetcode_data._cache["test"] = QUESTION_DETAIL
+        self._leetcode_data._cache["test"] = leetcode_anki.helpers.records.to_record(
+            QUESTION_DETAIL
+        )
 
         assert (await self._leetcode_data.problem_id("test")) == "1"
 
@@ -243,7 +346,9 @@ class TestLeetcodeData:
         mock.Mock(return_value=[QUESTION_DETAIL]),
     )
     async def test_likes(self) -> None:
-        self._leetcode_data._cache["test"] = QUESTION_DETAIL
+        self._leetcode_data._cache["test"] = leetcode_anki.helpers.records.to_record(
+            QUESTION_DETAIL
+        )
 
         assert (await self._leetcode_data.likes("test")) == 1
 
@@ -255,7 +360,9 @@ class TestLeetcodeData:
         mock.Mock(return_value=[QUESTION_DETAIL]),
     )
     async def test_dislikes(self) -> None:
-        self._leetcode_data._cache["test"] = QUESTION_DETAIL
+        self._leetcode_data._cache["test"] = leetcode_anki.helpers.records.to_record(
+            QUESTION_DETAIL
+        )
 
         assert (await self._leetcode_data.dislikes("test")) == 1
 
@@ -267,11 +374,13 @@ class TestLeetcodeData:
         mock.Mock(return_value=[QUESTION_DETAIL]),
     )
     async def test_tags(self) -> None:
-        self._leetcode_data._cache["test"] = QUESTION_DETAIL
+        self._leetcode_data._cache["test"] = leetcode_anki.helpers.records.to_record(
+            QUESTION_DETAIL
+        )
 
         assert (await self._leetcode_data.tags("test")) == [
-            "test-tag",
-            "difficulty-hard-tag",
+            "LeetCode::topic::test-tag",
+            "LeetCode::difficulty::hard",
         ]
 
     # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
@@ -282,7 +391,9 @@ class TestLeetcodeData:
         mock.Mock(return_value=[QUESTION_DETAIL]),
     )
     async def test_freq_bar(self) -> None:
-        self._leetcode_data._cache["test"] = QUESTION_DETAIL
+        self._leetcode_data._cache["test"] = leetcode_anki.helpers.records.to_record(
+            QUESTION_DETAIL
+        )
 
         assert (await self._leetcode_data.freq_bar("test")) == 1.1
 
@@ -294,7 +405,49 @@ class TestLeetcodeData:
         mock.Mock(return_value=[QUESTION_DETAIL]),
     )
     async def test_get_problem_data(self) -> None:
-        assert self._leetcode_data._cache["test"] == QUESTION_DETAIL
+        assert self._leetcode_data._cache[
+            "test"
+        ] == leetcode_anki.helpers.records.to_record(QUESTION_DETAIL)
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    @mock.patch(
+        "leetcode_anki.helpers.leetcode.LeetcodeData._get_problems_data",
+        mock.Mock(return_value=[QUESTION_DETAIL]),
+    )
+    async def test_records(self) -> None:
+        self._leetcode_data._cache["other"] = leetcode_anki.helpers.records.to_record(
+            QUESTION_DETAIL
+        )._replace(slug="other", title="other title", likes=5)
+        slugs = ["test", "other", "test"]
+
+        records = await self._leetcode_data.records(slugs)
+        assert [record.slug for record in records] == slugs
+        assert records[0] == await self._leetcode_data.record("test")
+
+        assert await self._leetcode_data.records(slugs[:2], ["title", "likes"]) == [
+            ("test title", 1),
+            ("other title", 5),
+        ]
+        assert await self._leetcode_data.columns(slugs[:2], ["title", "likes"]) == {
+            "title": ["test title", "other title"],
+            "likes": [1, 5],
+        }
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    @mock.patch(
+        "leetcode_anki.helpers.leetcode.LeetcodeData._get_problems_data",
+        mock.Mock(return_value=[QUESTION_DETAIL]),
+    )
+    async def test_records_errors(self) -> None:
+        with pytest.raises(ValueError, match="not in cache"):
+            await self._leetcode_data.records(["test", "unknown"])
+
+        with pytest.raises(ValueError, match="Unknown record fields: name"):
+            await self._leetcode_data.columns(["test"], ["title", "name"])
 
     @mock.patch("time.sleep", mock.Mock())
     # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
@@ -338,3 +491,181 @@ class TestLeetcodeData:
         mock_get_problems_data_page.side_effect = dummy
 
         assert len(self._leetcode_data._get_problems_data()) == 234
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    @mock.patch("time.sleep", mock.Mock())
+    async def test_get_problems_data_page_disk_cache(self, tmp_path: Path) -> None:
+        data = leetcode.models.graphql_data.GraphqlData(
+            problemset_question_list=leetcode.models.graphql_problemset_question_list.GraphqlProblemsetQuestionList(
+                questions=[PAGE_QUESTION_DETAIL], total_num=1
+            )
+        )
+        response = leetcode.models.graphql_response.GraphqlResponse(data=data)
+
+        leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(
+            0, 10000, cache_dir=str(tmp_path)
+        )
+        leetcode_data._api_instance.graphql_post.return_value = response
+        assert leetcode_data._get_problems_data_page(0, 10, 0) == [PAGE_QUESTION_DETAIL]
+
+        leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(
+            0, 10000, cache_dir=str(tmp_path)
+        )
+        leetcode_data._api_instance.graphql_post.side_effect = RuntimeError
+        assert leetcode_data._get_problems_data_page(0, 10, 0) == [PAGE_QUESTION_DETAIL]
+
+    @pytest.mark.parametrize("status", [401, 403])
+    @mock.patch("leetcode_anki.helpers.leetcode.forget_csrf_token")
+    @mock.patch.dict("os.environ", {"LEETCODE_SESSION_ID": "session"})
+    def test_refused_csrf_token(
+        self, forget_csrf_token: mock.Mock, status: int, tmp_path: Path
+    ) -> None:
+        data = leetcode.models.graphql_data.GraphqlData(
+            problemset_question_list=leetcode.models.graphql_problemset_question_list.GraphqlProblemsetQuestionList(
+                questions=[PAGE_QUESTION_DETAIL], total_num=1
+            )
+        )
+        refused, authenticated = mock.Mock(), mock.Mock()
+        refused.graphql_post.side_effect = leetcode.rest.ApiException(status=status)
+        authenticated.graphql_post.return_value = (
+            leetcode.models.graphql_response.GraphqlResponse(data=data)
+        )
+
+        with mock.patch(
+            "leetcode_anki.helpers.leetcode._get_leetcode_api_client",
+            mock.Mock(side_effect=[refused, authenticated]),
+        ):
+            leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(
+                0, 10000, cache_dir=str(tmp_path)
+            )
+            assert leetcode_data._get_problems_count() == 1
+
+        forget_csrf_token.assert_called_once_with("session", str(tmp_path))
+        refused.graphql_post.assert_called_once()
+
+    @mock.patch("leetcode_anki.helpers.leetcode.forget_csrf_token")
+    def test_refused_csrf_token_again(self, forget_csrf_token: mock.Mock) -> None:
+        api_instance = mock.Mock()
+        api_instance.graphql_post.side_effect = leetcode.rest.ApiException(status=403)
+
+        with mock.patch(
+            "leetcode_anki.helpers.leetcode._get_leetcode_api_client",
+            mock.Mock(return_value=api_instance),
+        ):
+            leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(0, 10000)
+            with pytest.raises(leetcode.rest.ApiException):
+                leetcode_data._get_problems_count()
+
+        # A new token is fetched once, then the error is not retried
+        assert api_instance.graphql_post.call_count == 2
+        forget_csrf_token.assert_not_called()
+
+    def test_fetch_problems_range_split(self) -> None:
+        leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(
+            0, 10000, page_size=8
+        )
+
+        def fetch(
+            skip: int, limit: int, *args: Any
+        ) -> List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]:
+            if limit > 2:
+                raise urllib3.exceptions.ReadTimeoutError(mock.Mock(), "", "timeout")
+            return [PAGE_QUESTION_DETAIL] * limit
+
+        with mock.patch.object(
+            leetcode_data, "_fetch_problems_chunk", mock.Mock(side_effect=fetch)
+        ) as fetch_mock:
+            assert len(leetcode_data._fetch_problems_range(0, 8)) == 8
+
+        assert [call.args[:2] for call in fetch_mock.call_args_list] == [
+            (0, 8),
+            (0, 4),
+            (0, 2),
+            (2, 2),
+            (4, 2),
+            (6, 2),
+        ]
+        assert leetcode_data._page_sizer.size == 4
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    @mock.patch(
+        "leetcode_anki.helpers.leetcode.LeetcodeData._get_problems_count",
+        mock.Mock(return_value=5),
+    )
+    @mock.patch("leetcode_anki.helpers.leetcode.LeetcodeData._get_problems_data_page")
+    async def test_stream_problems_handles(
+        self, mock_get_problems_data_page: mock.Mock
+    ) -> None:
+        def dummy(
+            offset: int, page_size: int, page: int
+        ) -> List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]:
+            return [
+                leetcode.models.graphql_question_detail.GraphqlQuestionDetail(
+                    title_slug=f"test{i}",
+                    difficulty="Easy",
+                    likes=i,
+                    dislikes=0,
+                    stats="{}",
+                )
+                for i in range(page * page_size, min(5, (page + 1) * page_size))
+            ]
+
+        mock_get_problems_data_page.side_effect = dummy
+        leetcode_data = leetcode_anki.helpers.leetcode.LeetcodeData(
+            0, 10000, page_size=2
+        )
+
+        pages = []
+        async for handles in leetcode_data.stream_problems_handles(queue_size=1):
+            pages.append(handles)
+            assert (await leetcode_data.likes(handles[0])) == int(handles[0][-1])
+
+        assert pages == [["test0", "test1"], ["test2", "test3"], ["test4"]]
+        assert leetcode_data._window == {}
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    @mock.patch(
+        "leetcode_anki.helpers.leetcode.LeetcodeData._get_problems_count",
+        mock.Mock(return_value=5),
+    )
+    @mock.patch("leetcode_anki.helpers.leetcode.LeetcodeData._get_problems_data_page")
+    async def test_resume_interrupted_fetch(
+        self, mock_get_problems_data_page: mock.Mock, tmp_path: Path
+    ) -> None:
+        fetched = []
+
+        def dummy(
+            offset: int, page_size: int, page: int
+        ) -> List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]:
+            fetched.append(page)
+            if page == 2 and fetched.count(2) == 1:
+                raise RuntimeError("Interrupted")
+            return [
+                leetcode.models.graphql_question_detail.GraphqlQuestionDetail(
+                    title_slug=f"test{i}", difficulty="Easy", stats="{}"
+                )
+                for i in range(page * page_size, min(5, (page + 1) * page_size))
+            ]
+
+        mock_get_problems_data_page.side_effect = dummy
+
+        def leetcode_data() -> leetcode_anki.helpers.leetcode.LeetcodeData:
+            return leetcode_anki.helpers.leetcode.LeetcodeData(
+                0, 10000, page_size=2, concurrency=1, checkpoint_dir=str(tmp_path)
+            )
+
+        with pytest.raises(RuntimeError):
+            async for _ in leetcode_data().stream_problems_handles():
+                pass
+
+        assert len(await leetcode_data().all_problems_handles()) == 5
+        # Pages 0 and 1 come from the journal of the first fetch
+        assert fetched == [0, 1, 2, 2]
+        # The journal is gone after the complete fetch
+        assert list(tmp_path.iterdir()) == []
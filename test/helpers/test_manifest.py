@@ -0,0 +1,81 @@
+import pathlib
+
+import leetcode_anki.helpers.manifest
+
+
+class TestBuildManifest:
+    def test_content_hash(self) -> None:
+        content_hash = leetcode_anki.helpers.manifest.content_hash
+
+        assert content_hash({"a": 1, "b": 2}) == content_hash({"b": 2, "a": 1})
+        assert content_hash({"a": 1}) != content_hash({"a": 2})
+
+    def test_first_build(self, tmp_path: pathlib.Path) -> None:
+        manifest = leetcode_anki.helpers.manifest.BuildManifest(
+            str(tmp_path / "manifest.json"), "model"
+        )
+
+        assert manifest.changed("test", "hash")
+
+    def test_incremental_build(self, tmp_path: pathlib.Path) -> None:
+        path = str(tmp_path / "manifest.json")
+
+        manifest = leetcode_anki.helpers.manifest.BuildManifest(path, "model")
+        manifest.changed("same", "hash")
+        manifest.changed("changed", "old")
+        manifest.changed("removed", "hash")
+        manifest.save()
+
+        manifest = leetcode_anki.helpers.manifest.BuildManifest(path, "model")
+        assert not manifest.changed("same", "hash")
+        assert manifest.changed("changed", "new")
+        assert manifest.changed("added", "hash")
+        assert manifest.removed() == {"removed"}
+
+    def test_model_changed(self, tmp_path: pathlib.Path) -> None:
+        path = str(tmp_path / "manifest.json")
+
+        manifest = leetcode_anki.helpers.manifest.BuildManifest(path, "model")
+        manifest.changed("test", "hash")
+        manifest.save()
+
+        manifest = leetcode_anki.helpers.manifest.BuildManifest(path, "new model")
+        assert manifest.changed("test", "hash")
+
+
+class TestBuildCache:
+    def test_hit(self, tmp_path: pathlib.Path) -> None:
+        output = tmp_path / "deck.apkg"
+        output.write_bytes(b"deck")
+        directory = str(tmp_path / "builds")
+
+        cache = leetcode_anki.helpers.manifest.BuildCache(directory, str(output))
+        assert not cache.hit("key")
+        cache.save("key")
+
+        cache = leetcode_anki.helpers.manifest.BuildCache(directory, str(output))
+        assert cache.hit("key")
+        assert not cache.hit("other key")
+
+    def test_output_changed(self, tmp_path: pathlib.Path) -> None:
+        output = tmp_path / "deck.apkg"
+        output.write_bytes(b"deck")
+        cache = leetcode_anki.helpers.manifest.BuildCache(str(tmp_path), str(output))
+        cache.save("key")
+
+        output.write_bytes(b"other deck")
+        assert not cache.hit("key")
+
+        output.unlink()
+        assert not cache.hit("key")
+
+    def test_other_outputs(self, tmp_path: pathlib.Path) -> None:
+        deck = tmp_path / "deck.apkg"
+        deck.write_bytes(b"deck")
+        export = tmp_path / "deck.json"
+        export.write_text("[]")
+        leetcode_anki.helpers.manifest.BuildCache(str(tmp_path), str(deck)).save("key")
+
+        assert not leetcode_anki.helpers.manifest.BuildCache(
+            str(tmp_path), str(deck), str(export)
+        ).hit("key")
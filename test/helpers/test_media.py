@@ -0,0 +1,114 @@
+import asyncio
+from pathlib import Path
+from test.helpers.builders import record
+from typing import Dict, List
+from unittest import mock
+
+import requests
+
+import leetcode_anki.helpers.media
+
+PNG = b"\x89PNG image"
+CONTENT = (
+    '<p>Example</p><img alt="" src="https://assets.leetcode.com/uploads/a.png" />'
+    "<img src='/static/b.png'><img src=\"data:image/png;base64,AAAA\">"
+)
+
+
+def response(status: int, content: bytes = b"", **headers: str) -> mock.Mock:
+    result = mock.Mock(status_code=status, content=content, headers=headers)
+    if status >= 400:
+        result.raise_for_status.side_effect = requests.HTTPError(str(status))
+    return result
+
+
+def fetch(
+    store: leetcode_anki.helpers.media.MediaStore, urls: List[str]
+) -> Dict[str, str]:
+    async def run() -> Dict[str, str]:
+        with store:
+            return await store.fetch(urls)
+
+    return asyncio.run(run())
+
+
+def test_image_urls() -> None:
+    assert leetcode_anki.helpers.media.image_urls(CONTENT) == [
+        "https://assets.leetcode.com/uploads/a.png",
+        "https://leetcode.com/static/b.png",
+    ]
+    assert leetcode_anki.helpers.media.image_urls(None) == []
+
+
+def test_rewrite_sources() -> None:
+    content = leetcode_anki.helpers.media.rewrite_sources(
+        CONTENT, {"https://leetcode.com/static/b.png": "0123.png"}
+    )
+
+    assert content == (
+        '<p>Example</p><img alt="" src="https://assets.leetcode.com/uploads/a.png" />'
+        '<img src="0123.png"><img src="data:image/png;base64,AAAA">'
+    )
+
+
+class TestMediaStore:
+    @mock.patch("requests.Session.get")
+    def test_content_addressed(self, get: mock.Mock, tmp_path: Path) -> None:
+        get.return_value = response(200, PNG)
+        store = leetcode_anki.helpers.media.MediaStore(str(tmp_path))
+
+        names = fetch(store, ["https://x.com/a.png", "https://x.com/b.png"])
+
+        assert len(set(names.values())) == 1
+        name = names["https://x.com/a.png"]
+        assert name.endswith(".png")
+        assert (tmp_path / name).read_bytes() == PNG
+
+    @mock.patch("requests.Session.get")
+    def test_downloaded_once(self, get: mock.Mock, tmp_path: Path) -> None:
+        get.return_value = response(200, PNG, **{"Content-Type": "image/png"})
+        fetch(
+            leetcode_anki.helpers.media.MediaStore(str(tmp_path)), ["https://x.com/a"]
+        )
+
+        names = fetch(
+            leetcode_anki.helpers.media.MediaStore(str(tmp_path)), ["https://x.com/a"]
+        )
+
+        assert names["https://x.com/a"].endswith(".png")
+        get.assert_called_once()
+
+    @mock.patch("requests.Session.get")
+    def test_failed_download(self, get: mock.Mock, tmp_path: Path) -> None:
+        get.return_value = response(404)
+
+        assert (
+            fetch(
+                leetcode_anki.helpers.media.MediaStore(str(tmp_path)),
+                ["https://x.com/a.png"],
+            )
+            == {}
+        )
+
+    @mock.patch("requests.Session.get")
+    def test_offline(self, get: mock.Mock, tmp_path: Path) -> None:
+        store = leetcode_anki.helpers.media.MediaStore(str(tmp_path), offline=True)
+
+        assert fetch(store, ["https://x.com/a.png"]) == {}
+        get.assert_not_called()
+
+    @mock.patch("requests.Session.get")
+    def test_localize(self, get: mock.Mock, tmp_path: Path) -> None:
+        get.return_value = response(200, PNG)
+        records = [record(content=CONTENT), record(content="<p>No images</p>")]
+
+        async def run() -> tuple:
+            with leetcode_anki.helpers.media.MediaStore(str(tmp_path)) as store:
+                return await store.localize(records)
+
+        localized, names = asyncio.run(run())
+
+        assert len(names) == 1
+        assert f'src="{names[0]}"' in (localized[0].content or "")
+        assert "data:image/png" in (localized[0].content or "")
+        assert localized[1] is records[1]
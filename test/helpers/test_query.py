@@ -0,0 +1,44 @@
+import pytest
+
+import leetcode_anki.helpers.query
+
+MODEL_FIELDS = [{"name": "Slug"}, {"name": "Content"}, {"name": "Likes"}]
+
+
+def test_selection_for_model() -> None:
+    assert leetcode_anki.helpers.query.selection_for_model(MODEL_FIELDS) == (
+        "questionFrontendId",
+        "titleSlug",
+        "content",
+        "isPaidOnly",
+        "difficulty",
+        "likes",
+        "topicTags",
+        "companyTagStats",
+    )
+
+
+def test_selection_without_description() -> None:
+    selection = leetcode_anki.helpers.query.selection_for_model(
+        MODEL_FIELDS, output_description=False
+    )
+
+    assert "content" not in selection
+    assert "likes" in selection
+
+
+def test_unknown_field() -> None:
+    with pytest.raises(ValueError):
+        leetcode_anki.helpers.query.selection_for_model(["Solution"])
+
+    with pytest.raises(ValueError):
+        leetcode_anki.helpers.query.normalize_selection(["solution"])
+
+
+def test_problemset_query() -> None:
+    query = leetcode_anki.helpers.query.problemset_query(("titleSlug", "topicTags"))
+
+    assert "titleSlug" in query
+    assert "topicTags {" in query
+    assert "content" not in query
+    assert "content" in leetcode_anki.helpers.query.problemset_query()
@@ -0,0 +1,42 @@
+from unittest import mock
+
+import pytest
+
+import leetcode_anki.helpers.ratelimit
+
+
+class TestTokenBucket:
+    @mock.patch("time.monotonic", mock.Mock(return_value=100.0))
+    def test_reserve(self) -> None:
+        bucket = leetcode_anki.helpers.ratelimit.TokenBucket(rate=2, burst=2)
+
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(0.5)
+        assert bucket.reserve() == pytest.approx(1.0)
+
+    def test_refill(self) -> None:
+        with mock.patch("time.monotonic", mock.Mock(return_value=100.0)):
+            bucket = leetcode_anki.helpers.ratelimit.TokenBucket(rate=1, burst=1)
+            assert bucket.reserve() == 0
+
+        with mock.patch("time.monotonic", mock.Mock(return_value=110.0)):
+            assert bucket.reserve() == 0
+            assert bucket.reserve() == pytest.approx(1.0)
+
+    @mock.patch("time.sleep")
+    def test_acquire(self, sleep: mock.Mock) -> None:
+        bucket = leetcode_anki.helpers.ratelimit.TokenBucket(rate=0.001, burst=1)
+
+        bucket.acquire()
+        sleep.assert_not_called()
+
+        bucket.acquire()
+        sleep.assert_called_once()
+
+    def test_invalid(self) -> None:
+        with pytest.raises(ValueError):
+            leetcode_anki.helpers.ratelimit.TokenBucket(rate=0)
+
+        with pytest.raises(ValueError):
+            leetcode_anki.helpers.ratelimit.TokenBucket(burst=0)
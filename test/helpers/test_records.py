@@ -0,0 +1,53 @@
+from test.helpers.builders import COMPANY_TAG_STATS, question
+
+import pytest
+
+import leetcode_anki.helpers.records
+
+
+class TestToRecord:
+    def test_fields(self) -> None:
+        record = leetcode_anki.helpers.records.to_record(question())
+
+        assert record.slug == "two-sum"
+        assert record.difficulty_html == "<font color='green'>Easy</font>"
+        assert record.submissions_total == 20
+        assert record.submissions_accepted == 10
+        assert record.freq_bar == 0
+        assert record.topic_tags == ("array",)
+        assert record.hints == ()
+
+    def test_company_stats(self) -> None:
+        record = leetcode_anki.helpers.records.to_record(question())
+
+        assert record.company_stats == tuple(COMPANY_TAG_STATS["1"])
+        assert record.total_times_encountered == 5
+        assert record.tags == (
+            "LeetCode::topic::array",
+            "LeetCode::company::google",
+            "LeetCode::company::amazon",
+            "LeetCode::difficulty::easy",
+        )
+
+    @pytest.mark.parametrize("company_tag_stats", [None, "{}", '{"1": []}'])
+    def test_no_company_stats(self, company_tag_stats: str) -> None:
+        record = leetcode_anki.helpers.records.to_record(
+            question(company_tag_stats=company_tag_stats)
+        )
+
+        assert record.company_stats == ()
+        assert record.total_times_encountered == 0
+
+    def test_unknown_difficulty(self) -> None:
+        record = leetcode_anki.helpers.records.to_record(question(difficulty="Insane"))
+
+        assert record.difficulty_html is None
+
+
+def test_with_lists() -> None:
+    record = leetcode_anki.helpers.records.with_lists(
+        leetcode_anki.helpers.records.to_record(question()), ["7p5x763", ""]
+    )
+
+    assert record.lists == ("7p5x763", "all")
+    assert record.tags[-2:] == ("LeetCode::list::7p5x763", "LeetCode::list::all")
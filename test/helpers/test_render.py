@@ -0,0 +1,90 @@
+import asyncio
+import json
+from test.helpers.builders import record
+
+import pytest
+
+import leetcode_anki.helpers.render
+
+
+class TestNoteFields:
+    def test_fields(self) -> None:
+        fields = leetcode_anki.helpers.render.note_fields(record())
+
+        assert fields[:8] == (
+            "two-sum",
+            "1",
+            "Two Sum",
+            "Algorithms",
+            "<p>test</p>",
+            "<font color='green'>Easy</font>",
+            "no",
+            "10",
+        )
+        assert fields[9:14] == ("20", "10", "50", "0", "5")
+        assert json.loads(fields[14])[0]["slug"] == "google"
+
+    def test_without_description(self) -> None:
+        fields = leetcode_anki.helpers.render.note_fields(
+            record(), output_description=False
+        )
+
+        assert fields[4] == ""
+
+    def test_no_content(self) -> None:
+        fields = leetcode_anki.helpers.render.note_fields(record(content=None))
+
+        assert fields[4] == "No content"
+
+    def test_no_submissions(self) -> None:
+        fields = leetcode_anki.helpers.render.note_fields(
+            record(stats='{"totalSubmissionRaw": 0, "totalAcceptedRaw": 0}')
+        )
+
+        assert fields[11] == "0"
+
+    def test_incorrect_difficulty(self) -> None:
+        with pytest.raises(ValueError):
+            leetcode_anki.helpers.render.note_fields(record(difficulty="Unknown"))
+
+
+class TestNoteRenderer:
+    @staticmethod
+    def render(workers: int, **kwargs: object) -> list:
+        records = [record(title_slug=f"p{i}", title=f"P{i}") for i in range(10)]
+
+        async def render() -> list:
+            with leetcode_anki.helpers.render.NoteRenderer(
+                workers, chunk_size=3, **kwargs  # type: ignore
+            ) as renderer:
+                fields = await renderer.render(records)
+                return [fields, renderer._executor is not None]
+
+        return asyncio.run(render())
+
+    def test_in_process(self) -> None:
+        fields, pool_started = self.render(0)
+
+        assert [f[0] for f in fields] == [f"p{i}" for i in range(10)]
+        assert not pool_started
+
+    def test_process_pool(self) -> None:
+        fields, pool_started = self.render(2, min_batch_size=10)
+
+        assert pool_started
+        assert fields == self.render(0)[0]
+
+    def test_small_batch_in_process(self) -> None:
+        fields, pool_started = self.render(2, min_batch_size=11)
+
+        assert not pool_started
+        assert fields == self.render(0)[0]
+
+    def test_no_pool_without_description(self) -> None:
+        _, pool_started = self.render(2, output_description=False, min_batch_size=1)
+
+        assert not pool_started
+
+    def test_negative_workers(self) -> None:
+        with pytest.raises(ValueError):
+            leetcode_anki.helpers.render.NoteRenderer(-1)
@@ -0,0 +1,79 @@
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+import requests
+
+import leetcode_anki.helpers.serve
+
+
+@pytest.fixture
+def server() -> Iterator[leetcode_anki.helpers.serve.DeckServer]:
+    with leetcode_anki.helpers.serve.DeckServer(port=0) as deck_server:
+        yield deck_server
+
+
+def test_serve(server: leetcode_anki.helpers.serve.DeckServer, tmp_path: Path) -> None:
+    path = tmp_path / "deck.json"
+    path.write_text("[]")
+
+    assert server.publish(str(path))
+    response = requests.get(f"{server.url}/deck.json")
+
+    assert response.status_code == 200
+    assert response.content == b"[]"
+    assert response.headers["Content-Type"] == "application/json"
+    assert response.headers["ETag"]
+
+
+def test_not_modified(
+    server: leetcode_anki.helpers.serve.DeckServer, tmp_path: Path
+) -> None:
+    path = tmp_path / "deck.apkg"
+    path.write_bytes(b"deck")
+    server.publish(str(path))
+    etag = requests.get(f"{server.url}/deck.apkg").headers["ETag"]
+
+    response = requests.get(f"{server.url}/deck.apkg", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # Republishing the same content keeps the ETag
+    assert not server.publish(str(path))
+    path.write_bytes(b"new deck")
+    assert server.publish(str(path))
+
+    response = requests.get(f"{server.url}/deck.apkg", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.content == b"new deck"
+    assert response.headers["ETag"] != etag
+
+
+def test_snapshot(
+    server: leetcode_anki.helpers.serve.DeckServer, tmp_path: Path
+) -> None:
+    path = tmp_path / "deck.apkg"
+    path.write_bytes(b"deck")
+    server.publish(str(path))
+    path.write_bytes(b"half-written")
+
+    assert requests.get(f"{server.url}/deck.apkg").content == b"deck"
+
+
+def test_not_found(server: leetcode_anki.helpers.serve.DeckServer) -> None:
+    assert requests.get(f"{server.url}/deck.apkg").status_code == 404
+
+
+@pytest.mark.parametrize(
+    "header, matches",
+    [
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"x", "abc"', True),
+        ("*", True),
+        ('"x"', False),
+        ("", False),
+    ],
+)
+def test_etag_matches(header: str, matches: bool) -> None:
+    assert leetcode_anki.helpers.serve._etag_matches(header, '"abc"') == matches
@@ -0,0 +1,90 @@
+import time
+from pathlib import Path
+from unittest import mock
+
+import pytest
+import requests
+
+import leetcode_anki.helpers.session
+
+
+def response(*cookies: requests.cookies.Cookie) -> mock.Mock:
+    jar = requests.cookies.RequestsCookieJar()
+    for cookie in cookies:
+        jar.set_cookie(cookie)
+    return mock.Mock(cookies=jar)
+
+
+def csrf_cookie(value: str, expires: float) -> requests.cookies.Cookie:
+    return requests.cookies.create_cookie("csrftoken", value, expires=int(expires))
+
+
+@mock.patch("requests.get")
+def test_fetch_csrf_token(get: mock.Mock) -> None:
+    get.return_value = response(csrf_cookie("token", 2000000000))
+
+    assert leetcode_anki.helpers.session.fetch_csrf_token("session") == (
+        "token",
+        2000000000,
+    )
+    assert get.call_args.kwargs["cookies"] == {"LEETCODE_SESSION": "session"}
+
+
+@mock.patch("requests.get")
+def test_no_csrf_token(get: mock.Mock) -> None:
+    get.return_value = response()
+
+    with pytest.raises(ValueError):
+        leetcode_anki.helpers.session.fetch_csrf_token("session")
+
+
+class TestGetCsrfToken:
+    @mock.patch("requests.get")
+    def test_cached(self, get: mock.Mock, tmp_path: Path) -> None:
+        get.return_value = response(csrf_cookie("token", time.time() + 3600))
+
+        for _ in range(2):
+            token = leetcode_anki.helpers.session.get_csrf_token(
+                "session", str(tmp_path)
+            )
+
+        assert token == "token"
+        get.assert_called_once()
+
+    @mock.patch("requests.get")
+    def test_other_session(self, get: mock.Mock, tmp_path: Path) -> None:
+        get.return_value = response(csrf_cookie("token", time.time() + 3600))
+
+        leetcode_anki.helpers.session.get_csrf_token("session", str(tmp_path))
+        leetcode_anki.helpers.session.get_csrf_token("other", str(tmp_path))
+
+        assert get.call_count == 2
+
+    @mock.patch("requests.get")
+    def test_expired(self, get: mock.Mock, tmp_path: Path) -> None:
+        get.return_value = response(csrf_cookie("token", time.time() + 3600))
+
+        leetcode_anki.helpers.session.get_csrf_token("session", str(tmp_path), ttl=0)
+        leetcode_anki.helpers.session.get_csrf_token("session", str(tmp_path))
+
+        assert get.call_count == 2
+
+    @mock.patch("requests.get")
+    def test_no_cache(self, get: mock.Mock) -> None:
+        get.return_value = response(csrf_cookie("token", time.time() + 3600))
+
+        leetcode_anki.helpers.session.get_csrf_token("session")
+        leetcode_anki.helpers.session.get_csrf_token("session")
+
+        assert get.call_count == 2
+
+    @mock.patch("requests.get")
+    def test_forget(self, get: mock.Mock, tmp_path: Path) -> None:
+        get.return_value = response(csrf_cookie("token", time.time() + 3600))
+
+        leetcode_anki.helpers.session.get_csrf_token("session", str(tmp_path))
+        leetcode_anki.helpers.session.forget_csrf_token("session", str(tmp_path))
+        leetcode_anki.helpers.session.forget_csrf_token("session", str(tmp_path))
+        leetcode_anki.helpers.session.get_csrf_token("session", str(tmp_path))
+
+        assert get.call_count == 2
@@ -0,0 +1,150 @@
+import os
+import time
+from pathlib import Path
+from unittest import mock
+
+import pytest
+import requests
+
+import leetcode_anki.helpers.subsets
+
+URL = "https://example.com/list"
+PATTERN = 'href="/problems/(.*?)"'
+PAGE = '<a href="/problems/two-sum"></a><a href="/problems/lru-cache"></a>'
+
+
+def response(status: int, text: str = "", **headers: str) -> mock.Mock:
+    result = mock.Mock(status_code=status, text=text, headers=headers)
+    if status >= 400:
+        result.raise_for_status.side_effect = requests.HTTPError(str(status))
+    return result
+
+
+def test_load_slug_file(tmp_path: Path) -> None:
+    path = tmp_path / "blind75.txt"
+    path.write_text("# Blind 75\ntwo-sum\n\n  valid-anagram \ntwo-sum\n")
+
+    assert leetcode_anki.helpers.subsets.load_slug_file(str(path)) == [
+        "two-sum",
+        "valid-anagram",
+    ]
+
+
+def test_extract_slugs() -> None:
+    assert leetcode_anki.helpers.subsets.extract_slugs(PAGE + PAGE, PATTERN) == [
+        "two-sum",
+        "lru-cache",
+    ]
+
+
+class TestFetchRemoteSlugs:
+    @mock.patch("requests.get")
+    def test_no_cache(self, get: mock.Mock) -> None:
+        get.return_value = response(200, PAGE + PAGE)
+
+        assert leetcode_anki.helpers.subsets.fetch_remote_slugs(URL, PATTERN) == [
+            "two-sum",
+            "lru-cache",
+        ]
+
+    @mock.patch("requests.get")
+    def test_fresh_cache(self, get: mock.Mock, tmp_path: Path) -> None:
+        get.return_value = response(200, PAGE, ETag='"v1"')
+
+        for _ in range(2):
+            slugs = leetcode_anki.helpers.subsets.fetch_remote_slugs(
+                URL, PATTERN, str(tmp_path)
+            )
+
+        assert slugs == ["two-sum", "lru-cache"]
+        get.assert_called_once()
+
+    @mock.patch("requests.get")
+    def test_stored(self, get: mock.Mock, tmp_path: Path) -> None:
+        get.return_value = response(200, PAGE)
+
+        assert (
+            leetcode_anki.helpers.subsets.stored_remote_slugs(URL, str(tmp_path))
+            is None
+        )
+        leetcode_anki.helpers.subsets.fetch_remote_slugs(
+            URL, PATTERN, str(tmp_path), max_age=0
+        )
+        assert leetcode_anki.helpers.subsets.stored_remote_slugs(
+            URL, str(tmp_path)
+        ) == ["two-sum", "lru-cache"]
+        get.assert_called_once()
+
+    @mock.patch("requests.get")
+    def test_not_modified(self, get: mock.Mock, tmp_path: Path) -> None:
+        get.return_value = response(
+            200, PAGE, ETag='"v1"', **{"Last-Modified": "Mon, 01 Jan 2024"}
+        )
+        leetcode_anki.helpers.subsets.fetch_remote_slugs(URL, PATTERN, str(tmp_path))
+        (cached,) = (tmp_path / "subsets").iterdir()
+        os.utime(cached, (time.time() - 10, time.time() - 10))
+
+        get.return_value = response(304)
+        slugs = leetcode_anki.helpers.subsets.fetch_remote_slugs(
+            URL, PATTERN, str(tmp_path), max_age=1
+        )
+
+        assert slugs == ["two-sum", "lru-cache"]
+        assert get.call_args.kwargs["headers"] == {
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "Mon, 01 Jan 2024",
+        }
+
+    @mock.patch("requests.get")
+    def test_stale_on_error(self, get: mock.Mock, tmp_path: Path) -> None:
+        get.return_value = response(200, PAGE)
+        leetcode_anki.helpers.subsets.fetch_remote_slugs(URL, PATTERN, str(tmp_path))
+
+        get.return_value = response(503)
+        slugs = leetcode_anki.helpers.subsets.fetch_remote_slugs(
+            URL, PATTERN, str(tmp_path), max_age=0
+        )
+
+        assert slugs == ["two-sum", "lru-cache"]
+
+    @mock.patch("requests.get")
+    def test_error(self, get: mock.Mock, tmp_path: Path) -> None:
+        get.return_value = response(503)
+
+        with pytest.raises(requests.HTTPError):
+            leetcode_anki.helpers.subsets.fetch_remote_slugs(
+                URL, PATTERN, str(tmp_path)
+            )
+
+
+class TestSubsetRegistry:
+    def test_rank(self) -> None:
+        registry = leetcode_anki.helpers.subsets.SubsetRegistry()
+        registry.add("base", ["a", "b"])
+        registry.add("extended", ["b", "c"], suspend=True)
+
+        assert len(registry) == 3
+        assert registry.get("b") == ("base", 1)
+        assert registry.rank("c") == 2
+        assert registry.rank("d") is None
+
+    def test_tags_and_suspension(self) -> None:
+        registry = leetcode_anki.helpers.subsets.SubsetRegistry()
+        registry.add("base", ["a"])
+        registry.add("extended", ["b"], suspend=True)
+
+        assert registry.tags("a") == [
+            "LeetCode::subset::all",
+            "LeetCode::subset::base",
+        ]
+        assert registry.tags("c") == ["LeetCode::subset::all"]
+        assert not registry.suspended("a")
+        assert registry.suspended("b")
+        assert registry.suspended("c")
+
+    def test_duplicate_subset(self) -> None:
+        registry = leetcode_anki.helpers.subsets.SubsetRegistry()
+        registry.add("base", ["a"])
+
+        with pytest.raises(ValueError):
+            registry.add("base", ["b"])
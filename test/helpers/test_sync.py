@@ -0,0 +1,224 @@
+import json
+import sqlite3
+import zipfile
+from pathlib import Path
+from typing import List
+
+import genanki  # type: ignore
+import pytest
+
+import leetcode_anki.helpers.apkg
+import leetcode_anki.helpers.sync
+
+MODEL = genanki.Model(
+    1234,
+    "Test model",
+    fields=[{"name": "Slug"}, {"name": "Title"}],
+    templates=[{"name": "Card", "qfmt": "{{Slug}}", "afmt": "{{Title}}"}],
+)
+
+
+class Note(genanki.Note):
+    @property
+    def guid(self) -> str:
+        return genanki.guid_for(self.fields[0])
+
+
+def notes(count: int, renamed: str = "") -> List[genanki.Note]:
+    return [
+        Note(
+            model=MODEL,
+            fields=[f"slug-{i}", "Renamed" if f"slug-{i}" == renamed else f"T{i}"],
+            tags=["LeetCode::difficulty::easy"],
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def collection(tmp_path: Path) -> Path:
+    """
+    Collection with the deck imported and some review history
+    """
+    package = tmp_path / "deck.apkg"
+    with leetcode_anki.helpers.apkg.ApkgWriter(
+        str(package), genanki.Deck(42, "Test"), [MODEL]
+    ) as writer:
+        for note in notes(3):
+            writer.add(note)
+
+    with zipfile.ZipFile(package) as package_file:
+        package_file.extract("collection.anki2", tmp_path)
+
+    path = tmp_path / "collection.anki2"
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute(
+            "UPDATE cards SET queue = 2, ivl = 10, reps = 3 WHERE nid = "
+            "(SELECT id FROM notes WHERE flds LIKE 'slug-1\x1f%')"
+        )
+        connection.execute(
+            "UPDATE notes SET tags = tags || 'marked ' WHERE flds LIKE 'slug-1\x1f%'"
+        )
+    connection.close()
+    return path
+
+
+def query(path: Path, sql: str) -> list:
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(sql).fetchall()
+    finally:
+        connection.close()
+
+
+def test_sync(collection: Path) -> None:
+    with leetcode_anki.helpers.sync.CollectionSync(str(collection), MODEL) as sync:
+        for note in notes(4, renamed="slug-1"):
+            sync.add(note)
+
+    assert (sync.notes_added, sync.notes_updated, sync.notes_unchanged) == (1, 1, 2)
+    assert query(
+        collection,
+        "SELECT n.flds, n.tags, c.queue, c.ivl, c.reps FROM notes n "
+        "JOIN cards c ON c.nid = n.id WHERE n.flds LIKE 'slug-1\x1f%'",
+    ) == [("slug-1\x1fRenamed", " LeetCode::difficulty::easy marked ", 2, 10, 3)]
+    assert query(collection, "SELECT count(), count(DISTINCT did) FROM cards") == [
+        (4, 1)
+    ]
+
+
+def test_sync_unchanged(collection: Path) -> None:
+    with leetcode_anki.helpers.sync.CollectionSync(str(collection), MODEL) as sync:
+        for note in notes(3):
+            sync.add(note)
+
+    assert sync.notes_written == 0
+    assert sync.notes_unchanged == 3
+
+
+def test_sync_output(collection: Path, tmp_path: Path) -> None:
+    output = tmp_path / "synced.anki2"
+    with leetcode_anki.helpers.sync.CollectionSync(
+        str(collection), MODEL, output=str(output)
+    ) as sync:
+        for note in notes(4):
+            sync.add(note)
+
+    assert query(collection, "SELECT count() FROM notes") == [(3,)]
+    assert query(output, "SELECT count() FROM notes") == [(4,)]
+
+
+def test_sync_output_wal(collection: Path, tmp_path: Path) -> None:
+    # Anki keeps the collection in WAL mode, recent changes are only in the
+    # -wal file until it's checkpointed
+    anki = sqlite3.connect(collection)
+    anki.execute("PRAGMA journal_mode = WAL")
+    anki.execute("PRAGMA wal_autocheckpoint = 0")
+    with anki:
+        anki.execute(
+            "UPDATE notes SET tags = tags || 'wal ' WHERE flds LIKE 'slug-2\x1f%'"
+        )
+    assert (tmp_path / "collection.anki2-wal").stat().st_size > 0
+
+    output = tmp_path / "synced.anki2"
+    try:
+        with leetcode_anki.helpers.sync.CollectionSync(
+            str(collection), MODEL, output=str(output)
+        ) as sync:
+            for note in notes(3, renamed="slug-2"):
+                sync.add(note)
+    finally:
+        anki.close()
+
+    assert query(
+        output, "SELECT flds, tags FROM notes WHERE flds LIKE 'slug-2\x1f%'"
+    ) == [("slug-2\x1fRenamed", " LeetCode::difficulty::easy wal ")]
+
+
+def test_sync_added_note_updated(collection: Path) -> None:
+    with leetcode_anki.helpers.sync.CollectionSync(str(collection), MODEL) as sync:
+        sync.add(notes(4)[3])
+        sync.add(notes(4, renamed="slug-3")[3])
+
+    assert (sync.notes_added, sync.notes_updated) == (1, 1)
+    assert query(
+        collection, "SELECT flds FROM notes WHERE flds LIKE 'slug-3\x1f%'"
+    ) == [("slug-3\x1fRenamed",)]
+
+
+def tagged(tag: str) -> genanki.Note:
+    note = notes(4)[3]
+    note.tags.append(tag)
+    return note
+
+
+def test_sync_tags(collection: Path) -> None:
+    with leetcode_anki.helpers.sync.CollectionSync(str(collection), MODEL) as sync:
+        sync.add(tagged("LeetCode::topic::array"))
+
+    (tags_json,) = query(collection, "SELECT tags FROM col")[0]
+    assert set(json.loads(tags_json)) >= {
+        "LeetCode::difficulty::easy",
+        "LeetCode::topic::array",
+    }
+
+
+def test_sync_tags_table(collection: Path) -> None:
+    # Tags table of Anki 2.1.45+ collections
+    connection = sqlite3.connect(collection)
+    connection.create_collation("unicase", leetcode_anki.helpers.sync._unicase)
+    with connection:
+        connection.execute(
+            "CREATE TABLE tags (tag text NOT NULL PRIMARY KEY COLLATE unicase, "
+            "usn integer NOT NULL, collapsed boolean NOT NULL, config blob NULL) "
+            "WITHOUT ROWID"
+        )
+        connection.execute("INSERT INTO tags VALUES ('leetcode', 0, 1, NULL)")
+    connection.close()
+
+    with leetcode_anki.helpers.sync.CollectionSync(str(collection), MODEL) as sync:
+        sync.add(tagged("LeetCode::topic::array"))
+
+    connection = sqlite3.connect(collection)
+    connection.create_collation("unicase", leetcode_anki.helpers.sync._unicase)
+    try:
+        rows = connection.execute("SELECT tag, usn, collapsed FROM tags").fetchall()
+    finally:
+        connection.close()
+    assert sorted(rows) == [
+        ("LeetCode::difficulty", -1, 0),
+        ("LeetCode::difficulty::easy", -1, 0),
+        ("LeetCode::topic", -1, 0),
+        ("LeetCode::topic::array", -1, 0),
+        ("leetcode", 0, 1),
+    ]
+
+
+def test_sync_rollback(collection: Path) -> None:
+    with pytest.raises(RuntimeError):
+        with leetcode_anki.helpers.sync.CollectionSync(
+            str(collection), MODEL, batch_size=1
+        ) as sync:
+            for note in notes(5):
+                sync.add(note)
+            raise RuntimeError
+
+    assert query(collection, "SELECT count() FROM notes") == [(3,)]
+
+
+def test_sync_unknown_model(collection: Path) -> None:
+    model = genanki.Model(5678, "Other", fields=MODEL.fields, templates=MODEL.templates)
+
+    with pytest.raises(ValueError, match="import the deck"):
+        leetcode_anki.helpers.sync.CollectionSync(str(collection), model)
+
+
+def test_sync_media(collection: Path, tmp_path: Path) -> None:
+    image = tmp_path / "0123.png"
+    image.write_bytes(b"image")
+
+    with leetcode_anki.helpers.sync.CollectionSync(str(collection), MODEL) as sync:
+        sync.add_media(str(image))
+
+    assert (tmp_path / "collection.media" / "0123.png").read_bytes() == b"image"
@@ -0,0 +1,112 @@
+import gzip
+from pathlib import Path
+from unittest import mock
+
+import leetcode.rest  # type: ignore
+import pytest
+
+import leetcode_anki.helpers.leetcode
+import leetcode_anki.helpers.transport
+
+URL = "https://leetcode.com/graphql"
+BODY = {"query": "query { test }", "variables": {"skip": 0}}
+
+
+def live_client(data: str = '{"data": {}}') -> mock.Mock:
+    rest_client = mock.Mock()
+    rest_client.request.return_value = leetcode_anki.helpers.transport.RecordedResponse(
+        200, "OK", {"Content-Type": "application/json"}, data
+    )
+    return rest_client
+
+
+class TestSnapshotStore:
+    def test_missing(self, tmp_path: Path) -> None:
+        store = leetcode_anki.helpers.transport.SnapshotStore(str(tmp_path))
+
+        assert store.get("POST", URL, BODY) is None
+
+    def test_put_get(self, tmp_path: Path) -> None:
+        store = leetcode_anki.helpers.transport.SnapshotStore(str(tmp_path))
+        store.put("POST", URL, BODY, 200, "OK", {"X-Test": "1"}, b'{"data": 1}')
+
+        # Any host serves the same snapshot
+        response = store.get("POST", "http://127.0.0.1:8000/graphql", BODY)
+        assert response is not None
+        assert response.status == 200
+        assert response.data == '{"data": 1}'
+        assert response.getheader("X-Test") == "1"
+        assert store.get("POST", URL, {**BODY, "variables": {"skip": 1}}) is None
+
+    def test_put_without_credentials(self, tmp_path: Path) -> None:
+        store = leetcode_anki.helpers.transport.SnapshotStore(str(tmp_path))
+        headers = {
+            "Content-Type": "application/json",
+            "Set-Cookie": "csrftoken=secret; LEETCODE_SESSION=secret",
+            "authorization": "Bearer secret",
+        }
+        store.put("POST", URL, BODY, 200, "OK", headers, b'{"data": 1}')
+
+        response = store.get("POST", URL, BODY)
+        assert response is not None
+        assert response.getheaders() == {"Content-Type": "application/json"}
+        for path in tmp_path.iterdir():
+            assert b"secret" not in gzip.decompress(path.read_bytes())
+
+
+class TestRESTClients:
+    def test_record_replay(self, tmp_path: Path) -> None:
+        store = leetcode_anki.helpers.transport.SnapshotStore(str(tmp_path))
+        rest_client = live_client('{"data": {"test": 1}}')
+
+        recording = leetcode_anki.helpers.transport.RecordingRESTClient(
+            rest_client, store
+        )
+        recorded = recording.POST(URL, body=BODY, _request_timeout=(1, 2))
+        rest_client.request.assert_called_once()
+
+        replay = leetcode_anki.helpers.transport.ReplayRESTClient(store)
+        replayed = replay.POST(URL, body=BODY)
+
+        assert replayed.status == recorded.status
+        assert replayed.data == recorded.data
+
+    def test_replay_missing(self, tmp_path: Path) -> None:
+        replay = leetcode_anki.helpers.transport.ReplayRESTClient(
+            leetcode_anki.helpers.transport.SnapshotStore(str(tmp_path))
+        )
+
+        with pytest.raises(ValueError, match="No recorded response"):
+            replay.POST(URL, body=BODY)
+
+    def test_record_failure(self, tmp_path: Path) -> None:
+        rest_client = mock.Mock()
+        rest_client.request.side_effect = leetcode.rest.ApiException(status=502)
+        recording = leetcode_anki.helpers.transport.RecordingRESTClient(
+            rest_client, leetcode_anki.helpers.transport.SnapshotStore(str(tmp_path))
+        )
+
+        with pytest.raises(leetcode.rest.ApiException):
+            recording.POST(URL, body=BODY)
+
+        assert not list(tmp_path.iterdir())
+
+
+@mock.patch("leetcode_anki.helpers.session.fetch_csrf_token")
+def test_replay_client_offline(fetch_csrf_token: mock.Mock, tmp_path: Path) -> None:
+    api_instance = leetcode_anki.helpers.leetcode._get_leetcode_api_client(
+        replay_dir=str(tmp_path)
+    )
+
+    fetch_csrf_token.assert_not_called()
+    assert isinstance(
+        api_instance.api_client.rest_client,
+        leetcode_anki.helpers.transport.ReplayRESTClient,
+    )
+
+
+def test_record_and_replay_exclusive() -> None:
+    with pytest.raises(ValueError):
+        leetcode_anki.helpers.leetcode.LeetcodeData(
+            0, 1, record_dir="record", replay_dir="replay"
+        )